@@ -0,0 +1,5 @@
+"""
+
+    Benchmarks of the wallet manager, run with `python -m benchmarks`.
+
+"""
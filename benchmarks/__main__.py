@@ -0,0 +1,109 @@
+"""
+
+    Run the benchmarks, and write the results as JSON.
+
+    python -m benchmarks [--output results.json] [--compare baseline.json] [name or group ...]
+
+"""
+import argparse
+import json
+import sys
+
+from benchmarks import (  # noqa: F401 the benchmark modules register their benchmarks
+    bench_command_processor,
+    bench_crypto,
+    bench_key_chain,
+    bench_rpc,
+)
+from benchmarks.harness import (
+    BENCHMARKS,
+    compare_results,
+    DEFAULT_REGRESSION_RATIO,
+    DEFAULT_REPEAT,
+    format_result,
+    load_results,
+    run_benchmarks,
+    select_benchmarks,
+)
+
+
+def main():
+    parser = argparse.ArgumentParser('python -m benchmarks')
+    parser.add_argument(
+        'names',
+        nargs = '*',
+        help = 'benchmark names, name prefixes or groups to run. Default all',
+    )
+
+    parser.add_argument(
+        '-r', '--repeat',
+        type = int,
+        default = DEFAULT_REPEAT,
+        help = f'number of times to time each benchmark. Default {DEFAULT_REPEAT}',
+    )
+
+    parser.add_argument(
+        '--max-count',
+        type = int,
+        help = 'do not run the benchmarks with a key or address count more than this',
+    )
+
+    parser.add_argument(
+        '-o', '--output',
+        help = 'write the results as JSON to this file, "-" for stdout',
+    )
+
+    parser.add_argument(
+        '--compare',
+        help = 'results file of an earlier run, exit with an error if any benchmark is slower',
+    )
+
+    parser.add_argument(
+        '--ratio',
+        type = float,
+        default = DEFAULT_REGRESSION_RATIO,
+        help = f'how many times slower than the compared result is a regression. Default {DEFAULT_REGRESSION_RATIO}',
+    )
+
+    parser.add_argument(
+        '-l', '--list',
+        action = 'store_true',
+        help = 'list the benchmarks',
+    )
+
+    args = parser.parse_args()
+
+    if args.list:
+        for item in BENCHMARKS.values():
+            print(f'{item.group:20} {item.name:35} {item.params}')
+        return
+
+    benchmarks = select_benchmarks(args.names)
+    if not benchmarks:
+        print(f'No benchmarks match {" ".join(args.names)}')
+        sys.exit(1)
+
+    # with the JSON on stdout, show the progress on stderr
+    progress = sys.stderr if args.output == '-' else sys.stdout
+
+    def show_result(result):
+        print(format_result(result), file=progress, flush=True)
+
+    document = run_benchmarks(benchmarks, args.repeat, args.max_count, show_result)
+
+    if args.output == '-':
+        print(json.dumps(document, indent=2))
+    elif args.output:
+        with open(args.output, 'w') as fp:
+            json.dump(document, fp, indent=2)
+
+    if args.compare:
+        regressions = compare_results(document, load_results(args.compare), args.ratio)
+        for key, baseline_mean, mean in regressions:
+            print(f'regression {key}: {baseline_mean * 1000:.3f} ms -> {mean * 1000:.3f} ms', file=progress)
+        if regressions:
+            sys.exit(2)
+
+
+if __name__ == '__main__':
+    main()
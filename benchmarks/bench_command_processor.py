@@ -0,0 +1,45 @@
+"""
+
+    CommandProcessor overhead for commands that only use the local key chain.
+
+"""
+from wallet_manager.command_processor import (
+    CommandProcessor,
+    CommandProcessError,
+)
+
+from benchmarks.bench_key_chain import write_key_chain
+from benchmarks.harness import benchmark
+
+
+KEY_COUNT = 1000
+PROCESS_COUNT = 100
+
+
+def process_benchmark(commands):
+    def setup(context, param):
+        processor = CommandProcessor(write_key_chain(context.folder, '.jsonl', KEY_COUNT))
+
+        def run():
+            for _ in range(PROCESS_COUNT):
+                try:
+                    processor.process(list(commands))
+                except CommandProcessError:
+                    pass
+        return run, PROCESS_COUNT
+    return setup
+
+
+benchmark('command_processor_list', group='command_processor')(process_benchmark(['list', 'local']))
+benchmark('command_processor_count', group='command_processor')(process_benchmark(['count', 'local', '0x00000000000000000000000000000000000001']))
+benchmark('command_processor_invalid', group='command_processor')(process_benchmark(['invalid_command']))
+
+
+@benchmark('command_processor_create', group='command_processor')
+def create(context, param):
+    filename = write_key_chain(context.folder, '.jsonl', KEY_COUNT)
+
+    def run():
+        for _ in range(PROCESS_COUNT):
+            CommandProcessor(filename)
+    return run, PROCESS_COUNT
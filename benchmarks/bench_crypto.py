@@ -0,0 +1,64 @@
+"""
+
+    Keystore encrypt and decrypt throughput.
+
+"""
+import json
+import secrets
+
+from wallet_manager.crypto_pool import (
+    CryptoPool,
+    decrypt_key,
+    encrypt_key,
+)
+
+from benchmarks.harness import (
+    benchmark,
+    SkipBenchmark,
+)
+
+
+KEY_COUNTS = [1, 8]
+PASSWORD = 'benchmark password'
+
+
+def make_key_json_list(count):
+    try:
+        import eth_account # noqa: F401
+    except ImportError:
+        raise SkipBenchmark('eth_account is not installed')
+    return [json.dumps(encrypt_key(secrets.token_bytes(32), PASSWORD)) for _ in range(count)]
+
+
+@benchmark('crypto_encrypt', KEY_COUNTS, 'crypto')
+def encrypt(context, count):
+    make_key_json_list(0)
+    raw_keys = [secrets.token_bytes(32) for _ in range(count)]
+
+    def run():
+        for raw_key in raw_keys:
+            encrypt_key(raw_key, PASSWORD)
+    return run, count
+
+
+@benchmark('crypto_decrypt', KEY_COUNTS, 'crypto')
+def decrypt(context, count):
+    key_json_list = make_key_json_list(count)
+
+    def run():
+        for key_json in key_json_list:
+            decrypt_key(key_json, PASSWORD)
+    return run, count
+
+
+@benchmark('crypto_pool_decrypt', KEY_COUNTS, 'crypto')
+def pool_decrypt(context, count):
+    key_json_list = make_key_json_list(count)
+    crypto_pool = CryptoPool()
+    context.add_cleanup(crypto_pool.close)
+    # start the worker processes before the timing
+    crypto_pool.decrypt(key_json_list[:1] * 2, [PASSWORD] * 2)
+
+    def run():
+        crypto_pool.decrypt(key_json_list, [PASSWORD] * count)
+    return run, count
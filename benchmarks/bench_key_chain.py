@@ -0,0 +1,103 @@
+"""
+
+    KeyChain load, save and read benchmarks.
+
+"""
+import os.path
+import random
+import secrets
+
+from wallet_manager.key_chain import KeyChain
+
+from benchmarks.harness import benchmark
+
+
+KEY_COUNTS = [1000, 10000, 100000]
+READ_COUNT = 1000
+
+
+def make_address(index):
+    return f'0x{index:040x}'
+
+
+def make_key_item(index):
+    # same shape and size as a version 3 keystore
+    return {
+        'address': f'{index:040x}',
+        'crypto': {
+            'cipher': 'aes-128-ctr',
+            'cipherparams': {'iv': secrets.token_hex(16)},
+            'ciphertext': secrets.token_hex(32),
+            'kdf': 'scrypt',
+            'kdfparams': {'dklen': 32, 'n': 262144, 'p': 1, 'r': 8, 'salt': secrets.token_hex(32)},
+            'mac': secrets.token_hex(32),
+        },
+        'id': secrets.token_hex(16),
+        'version': 3,
+    }
+
+
+def write_key_chain(folder, extension, count):
+    filename = os.path.join(folder, f'key_chain{extension}')
+    key_chain = KeyChain(filename)
+    for index in range(count):
+        key_chain.set_key(make_address(index), make_key_item(index))
+    key_chain.save()
+    return filename
+
+
+def load_benchmark(extension, lazy=False):
+    def setup(context, count):
+        filename = write_key_chain(context.folder, extension, count)
+        return lambda: KeyChain(filename, lazy=lazy), 1
+    return setup
+
+
+def save_benchmark(extension):
+    def setup(context, count):
+        key_chain = KeyChain(write_key_chain(context.folder, extension, count))
+        indexes = iter(range(count, count * 2))
+
+        def run():
+            index = next(indexes)
+            key_chain.set_key(make_address(index), make_key_item(index))
+            key_chain.save()
+        return run, 1
+    return setup
+
+
+benchmark('key_chain_load_json', KEY_COUNTS, 'key_chain')(load_benchmark('.json'))
+benchmark('key_chain_load_log', KEY_COUNTS, 'key_chain')(load_benchmark('.jsonl'))
+benchmark('key_chain_load_log_lazy', KEY_COUNTS, 'key_chain')(load_benchmark('.jsonl', lazy=True))
+benchmark('key_chain_save_json', KEY_COUNTS, 'key_chain')(save_benchmark('.json'))
+benchmark('key_chain_save_log', KEY_COUNTS, 'key_chain')(save_benchmark('.jsonl'))
+benchmark('key_chain_save_sqlite', KEY_COUNTS, 'key_chain')(save_benchmark('.db'))
+
+
+def get_benchmark(extension):
+    def setup(context, count):
+        key_chain = KeyChain(write_key_chain(context.folder, extension, count), lazy=True)
+        addresses = [make_address(random.randrange(count)) for _ in range(READ_COUNT)]
+
+        def run():
+            for address in addresses:
+                key_chain.get_key(address)
+        return run, READ_COUNT
+    return setup
+
+
+benchmark('key_chain_get_log_lazy', KEY_COUNTS, 'key_chain')(get_benchmark('.jsonl'))
+benchmark('key_chain_get_sqlite', KEY_COUNTS, 'key_chain')(get_benchmark('.db'))
+
+
+@benchmark('key_chain_page', KEY_COUNTS, 'key_chain')
+def page(context, count):
+    key_chain = KeyChain(write_key_chain(context.folder, '.jsonl', count), lazy=True)
+    # build the index before the timing
+    key_chain.account_index.page(limit=1)
+
+    def run():
+        cursor = make_address(random.randrange(count))
+        key_chain.account_index.page(cursor, 100)
+        key_chain.account_index.count('0x00000000000000000000000000000000000001')
+    return run, 1
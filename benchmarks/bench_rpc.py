@@ -0,0 +1,80 @@
+"""
+
+    WalletManager node calls against an in process stub node.
+
+"""
+from wallet_manager.testing import RPCNode
+from wallet_manager.wallet_manager import WalletManager
+
+from benchmarks.harness import (
+    benchmark,
+    SkipBenchmark,
+)
+
+
+CALL_COUNT = 100
+ADDRESS_COUNTS = [100, 1000]
+TOKEN_ADDRESS = '0x' + 'ab' * 20
+
+
+def make_address(index):
+    # only digits, so web3 accepts the address without a checksum
+    return f'0x{index:040d}'
+
+
+def start_node(context):
+    try:
+        import web3 # noqa: F401
+    except ImportError:
+        raise SkipBenchmark('web3 is not installed')
+    node = RPCNode({
+        'eth_accounts': lambda: [make_address(index) for index in range(CALL_COUNT)],
+        'eth_getBalance': lambda address, block: hex(10 ** 18),
+        'eth_call': lambda transaction, block: '0x' + f'{18:064x}',
+        'eth_blockNumber': lambda: '0x1',
+    }, keep_posts=False)
+    context.add_cleanup(node.close)
+    wallet = WalletManager()
+    context.add_cleanup(wallet.close)
+    return node, wallet
+
+
+@benchmark('rpc_list_accounts', group='rpc')
+def list_accounts(context, param):
+    node, wallet = start_node(context)
+
+    def run():
+        for _ in range(CALL_COUNT):
+            wallet.list_accounts(node.url)
+    return run, CALL_COUNT
+
+
+@benchmark('rpc_balance_ether', group='rpc')
+def balance_ether(context, param):
+    node, wallet = start_node(context)
+
+    def run():
+        for index in range(CALL_COUNT):
+            wallet.balance_ether(make_address(index), node.url)
+    return run, CALL_COUNT
+
+
+@benchmark('rpc_balances_ether_batch', ADDRESS_COUNTS, 'rpc')
+def balances_ether(context, count):
+    node, wallet = start_node(context)
+    addresses = [make_address(index) for index in range(count)]
+
+    def run():
+        wallet.balances_ether(addresses, node.url)
+    return run, count
+
+
+@benchmark('rpc_scan_balances', ADDRESS_COUNTS, 'rpc')
+def scan_balances(context, count):
+    node, wallet = start_node(context)
+    addresses = [make_address(index) for index in range(count)]
+
+    def run():
+        for _ in wallet.scan_balances(addresses, node.url, [TOKEN_ADDRESS]):
+            pass
+    return run, count
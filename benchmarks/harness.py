@@ -0,0 +1,162 @@
+"""
+
+    Register, time and report benchmarks.
+
+"""
+import contextlib
+import json
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+from collections import OrderedDict
+
+
+RESULT_VERSION = 1
+DEFAULT_REPEAT = 5
+DEFAULT_REGRESSION_RATIO = 1.2
+
+BENCHMARKS = OrderedDict()
+
+
+class SkipBenchmark(Exception):
+    pass
+
+
+class BenchmarkContext():
+    """
+    Passed to each benchmark function, with a temporary `folder` for its files.
+    Functions given to `add_cleanup` are called after the benchmark has run.
+    """
+
+    def __init__(self, folder, exit_stack):
+        self.folder = folder
+        self._exit_stack = exit_stack
+
+    def add_cleanup(self, func, *args):
+        self._exit_stack.callback(func, *args)
+
+
+class Benchmark():
+    """
+    A benchmark is a function called with a BenchmarkContext and one of its params.
+    It does any setup, and returns `(run, operations)`: the function to time,
+    and the number of operations done by each call of `run`.
+    """
+
+    def __init__(self, name, func, params, group):
+        self.name = name
+        self.func = func
+        self.params = params
+        self.group = group
+
+    def run(self, param, repeat=DEFAULT_REPEAT):
+        with tempfile.TemporaryDirectory() as folder, contextlib.ExitStack() as exit_stack:
+            try:
+                run, operations = self.func(BenchmarkContext(folder, exit_stack), param)
+            except SkipBenchmark as e:
+                return self._make_result(param, status='skipped', reason=str(e))
+            times = []
+            for _ in range(repeat):
+                start_time = time.perf_counter()
+                run()
+                times.append(time.perf_counter() - start_time)
+        mean = statistics.mean(times)
+        return self._make_result(
+            param,
+            repeat=repeat,
+            operations=operations,
+            min=min(times),
+            mean=mean,
+            median=statistics.median(times),
+            max=max(times),
+            stdev=statistics.stdev(times) if len(times) > 1 else 0.0,
+            ops_per_second=operations / mean if mean else None,
+        )
+
+    def _make_result(self, param, status='ok', **values):
+        result = OrderedDict()
+        result['name'] = self.name
+        result['group'] = self.group
+        result['param'] = param
+        result['status'] = status
+        result.update(values)
+        return result
+
+
+def benchmark(name, params=None, group=None):
+    """
+    Decorator to register a benchmark function, run once for each of `params`.
+    """
+    def register(func):
+        BENCHMARKS[name] = Benchmark(name, func, params or [None], group or name.split('_')[0])
+        return func
+    return register
+
+
+def select_benchmarks(names=None):
+    if not names:
+        return list(BENCHMARKS.values())
+    return [item for item in BENCHMARKS.values() if any(item.name.startswith(name) or item.group == name for name in names)]
+
+
+def run_benchmarks(benchmarks, repeat=DEFAULT_REPEAT, max_param=None, on_result=None):
+    """
+    Returns the result document of all the benchmarks. Params that are numbers more than
+    `max_param` are not run.
+    """
+    results = []
+    for item in benchmarks:
+        for param in item.params:
+            if max_param is not None and isinstance(param, int) and param > max_param:
+                continue
+            result = item.run(param, repeat)
+            results.append(result)
+            if on_result:
+                on_result(result)
+    return {
+        'version': RESULT_VERSION,
+        'time': time.time(),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'results': results,
+    }
+
+
+def result_key(result):
+    return f'{result["name"]}[{result["param"]}]'
+
+
+def format_result(result):
+    key = result_key(result)
+    if result['status'] != 'ok':
+        return f'{key:45} {result["status"]}: {result.get("reason", "")}'
+    return (
+        f'{key:45} mean {result["mean"] * 1000:10.3f} ms  min {result["min"] * 1000:10.3f} ms  '
+        f'{result["ops_per_second"]:12.1f} ops/s'
+    )
+
+
+def compare_results(document, baseline, ratio=DEFAULT_REGRESSION_RATIO):
+    """
+    Returns a list of (key, baseline mean, mean) for each result that is more than `ratio`
+    times slower than the same result in the baseline document.
+    """
+    baseline_means = {
+        result_key(result): result['mean']
+        for result in baseline.get('results', []) if result['status'] == 'ok'
+    }
+    regressions = []
+    for result in document['results']:
+        key = result_key(result)
+        if result['status'] == 'ok' and key in baseline_means:
+            if result['mean'] > baseline_means[key] * ratio:
+                regressions.append((key, baseline_means[key], result['mean']))
+    return regressions
+
+
+def load_results(filename):
+    with open(filename, 'r') as fp:
+        return json.load(fp)
@@ -17,9 +17,13 @@ install_requirements = [
     'starfish-py==0.4.11',
 ]
 
+async_requirements = [
+    'aiohttp',
+]
+
 setup_requirements = ['pytest-runner', ]
 
-test_requirements = [
+test_requirements = async_requirements + [
     'codacy-coverage',
     'coverage',
     'docker',
@@ -55,6 +59,7 @@ setup(
     ],
     description="Wallet Manager for the Ocean Network",
     extras_require={
+        'async': async_requirements,
         'test': test_requirements,
         'dev': dev_requirements + test_requirements,
     },
@@ -10,6 +10,8 @@ import os
 
 from unittest.mock import Mock
 
+from wallet_manager.testing import RPCNode
+
 PARITY_NODE_URL = 'http://localhost:8545'
 KEY_CHAIN_FILENAME = 'test_key_chain.json'
 TEST_ACCOUNT_ADDRESS = '0x068Ed00cF0441e4829D9784fCBe7b9e26D4BD8d0'
@@ -24,3 +26,10 @@ def resources():
     data.test_account.address = TEST_ACCOUNT_ADDRESS
     data.test_account.password = TEST_ACCOUNT_PASSWORD
     return data
+
+
+@pytest.fixture
+def rpc_node():
+    node = RPCNode()
+    yield node
+    node.close()
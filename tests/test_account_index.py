@@ -0,0 +1,121 @@
+"""
+
+Test account_index module
+
+"""
+import pytest
+
+from wallet_manager.account_index import AccountIndex
+from wallet_manager.command_processor import CommandProcessor
+from wallet_manager.hd_wallet import (
+    DEFAULT_HD_NAME,
+    hd_seed_key,
+)
+from wallet_manager.key_chain import KeyChain
+from wallet_manager.storage import sqlite_storage
+from wallet_manager.wallet_manager import WalletManager
+
+TEST_ACCOUNT_COUNT = 1000
+
+
+def make_address(index):
+    return f'0x{index:040X}'
+
+
+def read_all_pages(account_index, limit, pattern=None):
+    addresses = []
+    cursor = None
+    while True:
+        page = account_index.page(cursor, limit, pattern)
+        addresses += page.addresses
+        cursor = page.cursor
+        if cursor is None:
+            return addresses
+
+
+def test_account_index():
+    addresses = [make_address(index) for index in range(TEST_ACCOUNT_COUNT)]
+    account_index = AccountIndex(reversed(addresses))
+    assert(len(account_index) == TEST_ACCOUNT_COUNT)
+    assert(read_all_pages(account_index, 7) == addresses)
+    assert(account_index.page(limit=TEST_ACCOUNT_COUNT).cursor is None)
+
+    # prefix with or without 0x, in any case
+    prefix_addresses = [address for address in addresses if address.lower().startswith('0x00000000000000000000000000000000000001')]
+    assert(read_all_pages(account_index, 10, '00000000000000000000000000000000000001') == prefix_addresses)
+    assert(account_index.count('0x00000000000000000000000000000000000001') == len(prefix_addresses))
+
+    glob_addresses = [address for address in addresses if address.endswith('F')]
+    assert(read_all_pages(account_index, 10, '*f') == glob_addresses)
+    assert(account_index.count('*F') == len(glob_addresses))
+    assert(account_index.count('0x1*') == 0)
+
+    account_index.remove(addresses[1])
+    account_index.add(addresses[1].lower())
+    account_index.add(make_address(TEST_ACCOUNT_COUNT))
+    assert(len(account_index) == TEST_ACCOUNT_COUNT + 1)
+    assert(account_index.page(limit=2).addresses == [addresses[0], addresses[1].lower()])
+
+
+def test_sqlite_account_index(tmp_path, monkeypatch):
+    # read the addresses from the database over many pages
+    monkeypatch.setattr(sqlite_storage, 'ADDRESS_PAGE_SIZE', 64)
+    addresses = [make_address(index) for index in range(TEST_ACCOUNT_COUNT)]
+    key_chain = KeyChain(str(tmp_path / 'key_chain.db'))
+    for address in reversed(addresses):
+        key_chain.set_key(address, {'version': 3})
+    key_chain.set_key(hd_seed_key(DEFAULT_HD_NAME), {'next_index': 0})
+    key_chain.save()
+    account_index = key_chain.account_index
+    # the same results as the index in memory, without the HD seed
+    memory_index = AccountIndex(addresses)
+    assert(len(account_index) == TEST_ACCOUNT_COUNT)
+    assert(read_all_pages(account_index, 7) == addresses)
+    assert(list(account_index.addresses(after=addresses[10].lower())) == addresses[11:])
+    for pattern in ['00000000000000000000000000000000000001', '0x00000000000000000000000000000000000001', '*f', '0x1*', '0x*3?']:
+        assert(read_all_pages(account_index, 10, pattern) == read_all_pages(memory_index, 10, pattern))
+        assert(account_index.count(pattern) == memory_index.count(pattern))
+
+    key_chain.delete_key(addresses[1])
+    assert(account_index.page(limit=2).addresses == [addresses[0], addresses[2]])
+    key_chain.storage.close()
+
+
+@pytest.mark.parametrize('extension', ['jsonl', 'db'])
+def test_key_chain_account_index(tmp_path, extension):
+    key_chain_filename = str(tmp_path / f'key_chain.{extension}')
+    key_chain = KeyChain(key_chain_filename)
+    for index in range(20):
+        key_chain.set_key(make_address(index), {'version': 3})
+    key_chain.save()
+
+    wallet = WalletManager(key_chain_filename)
+    assert(wallet.count_accounts() == 20)
+    page = wallet.list_accounts_page(limit=15)
+    assert(page.addresses == [make_address(index) for index in range(15)])
+    wallet.delete_account(make_address(16), 'password')
+    assert(wallet.list_accounts_page(after=page.cursor).addresses == [make_address(index) for index in range(15, 20) if index != 16])
+
+    processor = CommandProcessor(key_chain_filename)
+    processor.process(['list', 'local'])
+    assert(processor.output == [make_address(index) for index in range(20) if index != 16])
+    processor.process(['list', 'local', '*', '5'])
+    assert(processor.output == [make_address(index) for index in range(5)] + [f'next page after {make_address(4).lower()}'])
+    processor.process(['list', 'local', '*1'])
+    assert(processor.output == [make_address(1), make_address(17)])
+    processor.process(['count', 'local', '0x000000000000000000000000000000000000001'])
+    assert(processor.output == ['3'])
+
+
+def test_host_account_index(rpc_node):
+    pytest.importorskip('web3')
+    addresses = [make_address(index).lower() for index in range(50)]
+    rpc_node.methods['eth_accounts'] = lambda: addresses
+    wallet = WalletManager()
+    assert(wallet.count_accounts(rpc_node.url) == 50)
+    page = wallet.list_accounts_page(rpc_node.url, limit=30)
+    # web3 returns the addresses as checksum addresses
+    assert([address.lower() for address in page.addresses] == addresses[:30])
+    page = wallet.list_accounts_page(rpc_node.url, page.cursor)
+    assert([address.lower() for address in page.addresses] == addresses[30:])
+    wallet.close()
@@ -0,0 +1,101 @@
+"""
+
+Test async_wallet_manager module
+
+"""
+import asyncio
+import secrets
+import threading
+
+import pytest
+
+from wallet_manager.async_wallet_manager import AsyncWalletManager
+
+pytest.importorskip('aiohttp')
+
+TEST_ACCOUNTS = [
+    '0x068Ed00cF0441e4829D9784fCBe7b9e26D4BD8d0',
+    '0x00Bd138aBD70e2F00903268F3Db08f2D25677C9e',
+]
+
+
+def test_async_accounts_local(resources):
+    password = secrets.token_hex(32)
+
+    save_threads = []
+
+    async def run():
+        async with AsyncWalletManager(resources.key_chain_filename) as wallet:
+            key_chain_save = wallet.key_chain.save
+
+            def save():
+                save_threads.append(threading.current_thread())
+                key_chain_save()
+
+            wallet.key_chain.save = save
+            address = await wallet.new_account(password)
+            assert(address in await wallet.list_accounts())
+            page = await wallet.list_accounts_page(limit=1000)
+            assert(address in page.addresses)
+            assert(await wallet.count_accounts() == len(await wallet.list_accounts()))
+            json_data = await wallet.export_account_json(address, password)
+            assert(json_data)
+            raw_key = await wallet.export_account_key(address, password)
+            assert(raw_key)
+            await wallet.delete_account(address, password)
+            assert(address not in await wallet.list_accounts())
+
+    asyncio.run(run())
+    # the saves are not run on the event loop
+    assert(len(save_threads) == 2)
+    assert(threading.main_thread() not in save_threads)
+
+
+def test_async_accounts_host(rpc_node):
+    balances = {
+        TEST_ACCOUNTS[0]: hex(2 * 10 ** 18),
+        TEST_ACCOUNTS[1]: hex(0),
+    }
+    rpc_node.methods['eth_accounts'] = lambda: TEST_ACCOUNTS
+    rpc_node.methods['eth_getBalance'] = lambda address, block: balances[address]
+
+    async def run():
+        async with AsyncWalletManager() as wallet:
+            assert(await wallet.list_accounts(rpc_node.url) == TEST_ACCOUNTS)
+            # many concurrent calls share the same connection pool
+            balance_list = await asyncio.gather(*[
+                wallet.balance_ether(TEST_ACCOUNTS[index % 2], rpc_node.url) for index in range(20)
+            ])
+            assert(balance_list[0] == 2 and balance_list[1] == 0)
+            results = await wallet.balances_ether(TEST_ACCOUNTS, rpc_node.url)
+            assert([item.result for item in results] == [2, 0])
+
+    asyncio.run(run())
+    assert(len(rpc_node.connections) <= 20)
+
+
+def test_async_send_ether_local(resources, rpc_node):
+    password = secrets.token_hex(32)
+    sent = []
+
+    def send_raw_transaction(raw_transaction):
+        sent.append(raw_transaction)
+        return '0x' + f'{len(sent):064x}'
+
+    rpc_node.methods['eth_getTransactionCount'] = lambda address, block: hex(3)
+    rpc_node.methods['eth_gasPrice'] = lambda: hex(10 ** 9)
+    rpc_node.methods['eth_sendRawTransaction'] = send_raw_transaction
+    rpc_node.methods['eth_getTransactionReceipt'] = lambda tx_hash: {'transactionHash': tx_hash, 'status': '0x1'}
+
+    async def run():
+        async with AsyncWalletManager(resources.key_chain_filename) as wallet:
+            address = await wallet.new_account(password)
+            receipts = await asyncio.gather(*[
+                wallet.send_ether(address, password, TEST_ACCOUNTS[0], 1, rpc_node.url, is_local=True)
+                for _ in range(4)
+            ])
+            assert(len(set(receipt['transactionHash'] for receipt in receipts)) == 4)
+            await wallet.delete_account(address, password)
+
+    asyncio.run(run())
+    assert(len(sent) == 4)
@@ -0,0 +1,87 @@
+"""
+
+Test balance_scanner module
+
+"""
+import json
+from decimal import Decimal
+
+from wallet_manager.balance_scanner import (
+    BALANCE_OF_SELECTOR,
+    DECIMALS_SELECTOR,
+)
+from wallet_manager.command_processor import CommandProcessor
+from wallet_manager.output_sink import (
+    CallbackOutput,
+    JSONLinesOutput,
+)
+from wallet_manager.wallet_manager import WalletManager
+
+TOKEN_ADDRESS = '0x' + 'ab' * 20
+TEST_ADDRESS_COUNT = 250
+
+
+def make_address(index):
+    return f'0x{index:040x}'
+
+
+def add_balance_methods(rpc_node):
+    def get_balance(address, block):
+        return hex(int(address, 16) * 10 ** 18)
+
+    def call(transaction, block):
+        if transaction['to'] != TOKEN_ADDRESS:
+            return '0x'
+        data = transaction['data']
+        if data == DECIMALS_SELECTOR:
+            return '0x' + f'{6:064x}'
+        assert(data.startswith(BALANCE_OF_SELECTOR))
+        return '0x' + f'{int(data[10:], 16) * 2 * 10 ** 6:064x}'
+
+    rpc_node.methods['eth_getBalance'] = get_balance
+    rpc_node.methods['eth_call'] = call
+
+
+def test_scan_balances(rpc_node):
+    add_balance_methods(rpc_node)
+    addresses = [make_address(index) for index in range(1, TEST_ADDRESS_COUNT + 1)]
+    wallet = WalletManager()
+    results = list(wallet.scan_balances(iter(addresses), [rpc_node.url], [TOKEN_ADDRESS], batch_size=100, workers=3))
+    assert([result.address for result in results] == addresses)
+    for index, result in enumerate(results, 1):
+        assert(result.error is None)
+        assert(result.ether == Decimal(index))
+        assert(result.tokens[TOKEN_ADDRESS] == Decimal(index * 2))
+    # one request for the token decimals, and one request for each batch of addresses
+    assert(len(rpc_node.posts) == 4)
+
+    bad_token = '0x' + 'cd' * 20
+    results = list(wallet.scan_balances(addresses[:2], rpc_node.url, [bad_token]))
+    assert(results[0].tokens[bad_token] is None)
+    assert(results[0].error)
+    wallet.close()
+
+
+def test_balance_command(rpc_node, tmp_path):
+    add_balance_methods(rpc_node)
+    address_filename = tmp_path / 'addresses.csv'
+    address_filename.write_text('address,label\n' + '\n'.join(f'{make_address(index)},wallet {index}' for index in range(1, 6)))
+
+    items = []
+    output = JSONLinesOutput()
+    output.write_item = lambda item, text=None: items.append(item)
+    processor = CommandProcessor(output=output)
+    processor.process(['balance', f'@{address_filename}', f'{rpc_node.url},{rpc_node.url}/', TOKEN_ADDRESS])
+    assert(len(items) == 10)
+    assert(items[0]['address'] == make_address(1))
+    assert(items[0]['ether'] == Decimal(1))
+    assert(items[0]['tokens'] == {TOKEN_ADDRESS: Decimal(2)})
+    assert(json.loads(json.dumps(items[0], default=str))['network'] == rpc_node.url)
+
+    lines = []
+    processor = CommandProcessor(output=CallbackOutput(lines.append))
+    processor.process(['balance', f'{make_address(3)},{make_address(4)}', rpc_node.url])
+    assert(lines == [
+        f'{make_address(3)} {rpc_node.url} ether: 3',
+        f'{make_address(4)} {rpc_node.url} ether: 4',
+    ])
@@ -0,0 +1,48 @@
+"""
+
+Test batch_runner module
+
+"""
+import pytest
+
+from wallet_manager.batch_runner import (
+    BatchRunner,
+    parse_batch_line,
+)
+from wallet_manager.command_processor import CommandProcessError
+from wallet_manager.key_chain import KeyChain
+from wallet_manager.wallet_manager import WalletManager
+
+
+def test_parse_batch_line():
+    assert(parse_batch_line('  ') is None)
+    assert(parse_batch_line('# comment') is None)
+    assert(parse_batch_line('new "my password" local') == ['new', 'my password', 'local'])
+    assert(parse_batch_line('["new", "secret", "local"]') == ['new', 'secret', 'local'])
+    assert(parse_batch_line('{"commands": ["list", "local"]}') == ['list', 'local'])
+    with pytest.raises(CommandProcessError):
+        parse_batch_line('{"commands": "list"}')
+
+
+@pytest.mark.parametrize('jobs', [1, 4])
+def test_batch_runner(tmp_path, jobs):
+    key_chain_filename = str(tmp_path / 'key_chain.jsonl')
+    addresses = [f'0x{index:040x}' for index in range(20)]
+    key_chain = KeyChain(key_chain_filename)
+    for address in addresses:
+        key_chain.set_key(address, {'address': address[2:], 'version': 3})
+    key_chain.save()
+
+    lines = ['# delete half of the accounts']
+    lines += [f'delete {address} password local' for address in addresses[:10]]
+    lines += ['bad_command', '']
+    wallet = WalletManager(key_chain_filename, lazy=True)
+    runner = BatchRunner(wallet, jobs=jobs)
+    results = list(runner.run(iter(lines)))
+
+    assert([result.line_number for result in results] == list(range(2, 13)))
+    assert([result.output for result in results[:10]] == [[f'delete account {address}'] for address in addresses[:10]])
+    assert(all(result.error is None for result in results[:10]))
+    assert(results[10].error)
+
+    assert(KeyChain(key_chain_filename).address_list == addresses[10:])
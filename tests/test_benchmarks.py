@@ -0,0 +1,35 @@
+"""
+
+Test the benchmarks harness, with the smallest key chain benchmarks
+
+"""
+import copy
+import json
+
+from benchmarks import bench_key_chain # noqa: F401
+from benchmarks.harness import (
+    compare_results,
+    run_benchmarks,
+    select_benchmarks,
+)
+
+
+def test_key_chain_benchmarks():
+    benchmarks = select_benchmarks(['key_chain'])
+    assert(len(benchmarks) > 0)
+    document = run_benchmarks(benchmarks, repeat=2, max_param=1000)
+    results = document['results']
+    assert(len(results) == len(benchmarks))
+    for result in results:
+        assert(result['status'] == 'ok')
+        assert(result['param'] == 1000)
+        assert(result['min'] <= result['mean'] <= result['max'])
+        assert(result['ops_per_second'] > 0)
+    # the results can be saved as JSON
+    assert(json.loads(json.dumps(document))['results'][0]['name'] == results[0]['name'])
+
+    baseline = copy.deepcopy(document)
+    assert(compare_results(document, baseline) == [])
+    baseline['results'][0]['mean'] = results[0]['mean'] / 10
+    regressions = compare_results(document, baseline)
+    assert([key for key, _, _ in regressions] == [f'{results[0]["name"]}[1000]'])
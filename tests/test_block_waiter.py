@@ -0,0 +1,38 @@
+"""
+
+Test block_waiter module
+
+"""
+import pytest
+
+from wallet_manager.block_waiter import BlockWaiter
+from wallet_manager.connection_pool import ConnectionPool
+
+
+def test_block_waiter(rpc_node):
+    chain = {'block_number': 1, 'block_calls': 0}
+
+    def block_number():
+        # a new block on every third call
+        chain['block_calls'] += 1
+        if chain['block_calls'] % 3 == 0:
+            chain['block_number'] += 1
+        return hex(chain['block_number'])
+
+    rpc_node.methods['eth_blockNumber'] = block_number
+    pool = ConnectionPool()
+    waiter = BlockWaiter(pool.get_web3(rpc_node.url), min_interval=0.01, max_interval=0.02)
+
+    checks = []
+
+    def condition():
+        checks.append(chain['block_number'])
+        return chain['block_number'] >= 4 and chain['block_number']
+
+    assert(waiter.wait_until(condition, timeout=5) == 4)
+    # the condition is only checked once per block
+    assert(checks == [1, 2, 3, 4])
+
+    with pytest.raises(TimeoutError):
+        waiter.wait_until(lambda: False, timeout=0.1)
+    pool.close()
@@ -0,0 +1,43 @@
+"""
+
+Test connection_pool module
+
+"""
+import time
+
+from wallet_manager.connection_pool import ConnectionPool
+from wallet_manager.wallet_manager import WalletManager
+
+TEST_ACCOUNTS = [
+    '0x068Ed00cF0441e4829D9784fCBe7b9e26D4BD8d0',
+    '0x00Bd138aBD70e2F00903268F3Db08f2D25677C9e',
+]
+
+
+def test_connection_reuse(rpc_node):
+    rpc_node.methods['eth_accounts'] = lambda: TEST_ACCOUNTS
+    pool = ConnectionPool()
+    web3 = pool.get_web3(rpc_node.url)
+    assert(web3 is pool.get_web3(rpc_node.url))
+
+    wallet = WalletManager(connection_pool=pool)
+    for _ in range(5):
+        assert(wallet.list_accounts(rpc_node.url) == TEST_ACCOUNTS)
+    assert(len(rpc_node.posts) == 5)
+    # all of the requests went over the same keep-alive connection
+    assert(len(rpc_node.connections) == 1)
+
+    wallet.close()
+    assert(pool.urls == [])
+    assert(pool.get_web3(rpc_node.url) is not web3)
+
+
+def test_connection_idle_eviction(rpc_node):
+    pool = ConnectionPool(idle_timeout=0.1)
+    web3 = pool.get_web3(rpc_node.url)
+    assert(pool.urls == [rpc_node.url])
+    time.sleep(0.2)
+    pool.evict_idle()
+    assert(pool.urls == [])
+    assert(pool.get_web3(rpc_node.url) is not web3)
+    pool.close()
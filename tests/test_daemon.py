@@ -0,0 +1,84 @@
+"""
+
+Test daemon module
+
+"""
+import os
+import threading
+
+from wallet_manager.command_processor import CommandProcessor
+from wallet_manager.daemon import (
+    CommandDaemon,
+    DaemonClient,
+    ERROR_TYPE_COMMAND,
+    ERROR_TYPE_KEY_CHAIN,
+    is_daemon_running,
+)
+from wallet_manager.key_chain import KeyChain
+
+
+def test_daemon_process(tmp_path):
+    key_chain_filename = str(tmp_path / 'key_chain.jsonl')
+    socket_filename = str(tmp_path / 'daemon.sock')
+    addresses = [f'0x{index:040x}' for index in range(5)]
+    key_chain = KeyChain(key_chain_filename)
+    for address in addresses:
+        key_chain.set_key(address, {'address': address[2:], 'version': 3})
+    key_chain.save()
+
+    assert(not is_daemon_running(socket_filename))
+    processor = CommandProcessor(key_chain_filename=key_chain_filename)
+    daemon = CommandDaemon(processor, key_chain_filename, socket_filename)
+    thread = threading.Thread(target=daemon.serve_forever, daemon=True)
+    thread.start()
+    try:
+        client = DaemonClient(socket_filename, timeout=10)
+        while not is_daemon_running(socket_filename):
+            thread.join(0.01)
+
+        response = client.process(['list', 'local'], key_chain_filename)
+        assert(response['output'] == addresses)
+
+        # the output of each request only holds the output of that request
+        response = client.process(['delete', addresses[0], 'password', 'local'], key_chain_filename)
+        assert(response['output'] == [f'delete account {addresses[0]}'])
+        response = client.process(['list', 'local'], key_chain_filename)
+        assert(response['output'] == addresses[1:])
+
+        response = client.process(['unknown'], key_chain_filename)
+        assert(response['error_type'] == ERROR_TYPE_COMMAND)
+
+        response = client.process(['list', 'local'], str(tmp_path / 'other_key_chain.json'))
+        assert(response['error_type'] == ERROR_TYPE_KEY_CHAIN)
+    finally:
+        daemon.shutdown()
+        thread.join(5)
+    assert(not is_daemon_running(socket_filename))
+
+
+class RecordProcessor():
+    # records the commands and the folder they are run in
+    def __init__(self):
+        self.output = []
+
+    def process(self, commands):
+        self.output = [os.getcwd()] + commands
+
+
+def test_daemon_client_files(tmp_path):
+    key_chain_filename = str(tmp_path / 'key_chain.json')
+    client_folder = str(tmp_path / 'client')
+    daemon = CommandDaemon(RecordProcessor(), key_chain_filename, str(tmp_path / 'daemon.sock'))
+    daemon_cwd = os.getcwd()
+
+    commands = ['send', 'ether', '0x' + '11' * 20, 'password', 'nile', '--from-file', 'pay.csv', '--checkpoint', '/data/pay.checkpoint']
+    response = daemon.process_request({'commands': commands, 'key_chain': key_chain_filename, 'cwd': client_folder})
+    # the file names are found from the client folder, the daemon folder is not changed
+    assert(response['output'] == [daemon_cwd] + commands[:6] + [os.path.join(client_folder, 'pay.csv'), '--checkpoint', '/data/pay.checkpoint'])
+
+    response = daemon.process_request({'commands': ['balance', '@addresses.txt'], 'key_chain': key_chain_filename, 'cwd': client_folder})
+    assert(response['output'] == [daemon_cwd, 'balance', '@' + os.path.join(client_folder, 'addresses.txt')])
+
+    # a request without a folder keeps its file names
+    response = daemon.process_request({'commands': ['balance', '@addresses.txt'], 'key_chain': key_chain_filename})
+    assert(response['output'] == [daemon_cwd, 'balance', '@addresses.txt'])
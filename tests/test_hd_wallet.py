@@ -0,0 +1,142 @@
+"""
+
+Test hd_wallet module
+
+"""
+import hashlib
+import json
+import secrets
+
+from multiprocessing import Pool
+
+import pytest
+
+from wallet_manager.hd_wallet import (
+    DEFAULT_HD_NAME,
+    HARDENED_OFFSET,
+    HDWallet,
+    derive_path,
+    hd_seed_key,
+    parse_path,
+)
+from wallet_manager.metrics import metrics
+
+
+TEST_PASSWORD = 'hd wallet test password'
+TEST_PROCESS_COUNT = 3
+
+# the accounts of the mnemonic used by the hardhat and anvil test nodes
+TEST_MNEMONIC = b'test test test test test test test test test test test junk'
+TEST_MNEMONIC_ADDRESSES = [
+    '0xf39Fd6e51aad88F6F4ce6aB8827279cffFb92266',
+    '0x70997970C51812dc3A010C7d01b50e0d17dc79C8',
+]
+
+
+def test_parse_path():
+    assert(parse_path("m/44'/60'/0'/0") == [44 + HARDENED_OFFSET, 60 + HARDENED_OFFSET, HARDENED_OFFSET, 0])
+    assert(parse_path('m/0h/1') == [HARDENED_OFFSET, 1])
+    assert(parse_path('m') == [])
+    with pytest.raises(ValueError):
+        parse_path("44'/60'")
+    with pytest.raises(ValueError):
+        parse_path('m/a')
+
+
+def test_derive_path():
+    pytest.importorskip('eth_keys')
+    # BIP32 test vector 1
+    raw_key, chain_code = derive_path(bytes.fromhex('000102030405060708090a0b0c0d0e0f'), "m/0'/1")
+    assert(raw_key.hex() == '3c6cb8d0f6a264c91ea8b5030fadaa8e538b020f0a387421a12de9319dc93368')
+    assert(chain_code.hex() == '2a7857631386ba23dacac34180dd1983734e444fdbf774041578e9b6adb37c19')
+
+    # BIP39 seed of the mnemonic, derived with the BIP44 ethereum path
+    seed = hashlib.pbkdf2_hmac('sha512', TEST_MNEMONIC, b'mnemonic', 2048)
+    hd_wallet = HDWallet(seed)
+    assert([hd_wallet.derive_account(index)[0] for index in range(2)] == TEST_MNEMONIC_ADDRESSES)
+
+
+def test_new_hd_accounts(tmp_path):
+    pytest.importorskip('eth_account')
+    from wallet_manager.wallet_manager import WalletManager
+
+    filename = str(tmp_path / 'key_chain.json')
+    wallet = WalletManager(filename, crypto_workers=1)
+    password = secrets.token_hex(32)
+    metrics.reset()
+    metrics.enable()
+    try:
+        results = wallet.new_accounts(5, password, hd_name=DEFAULT_HD_NAME)
+        keys = metrics.as_dict()['counters']
+    finally:
+        metrics.disable()
+        metrics.reset()
+    # only the seed is encrypted
+    assert([item for item in keys if item['name'] == 'crypto.keys'][0]['value'] == 1)
+    addresses = [item.address for item in results]
+    assert(len(set(addresses)) == 5)
+
+    # the seed is not listed as an account, and the next accounts carry on from the last index
+    results = wallet.new_accounts(2, password, hd_name=DEFAULT_HD_NAME)
+    addresses += [item.address for item in results]
+    wallet = WalletManager(filename)
+    assert(sorted(wallet.list_accounts()) == sorted(addresses))
+    with open(filename, 'r') as fp:
+        assert(json.load(fp)[hd_seed_key(DEFAULT_HD_NAME)]['next_index'] == 7)
+
+    raw_keys = [item.result for item in wallet.export_accounts_key(addresses, password)]
+    from eth_account import Account as EthAccount
+    assert([EthAccount.privateKeyToAccount(raw_key).address for raw_key in raw_keys] == addresses)
+    assert(wallet.export_account_key(addresses[3], password) == raw_keys[3])
+
+    # an exported HD account is a keystore of its key
+    key_json = wallet.export_account_json(addresses[0], password)
+    assert(EthAccount.decrypt(key_json, password) == raw_keys[0])
+
+    results = wallet.export_accounts_key(addresses[:1], 'bad password')
+    assert(results[0].error)
+
+    # the keystores in a list with HD accounts are still decrypted by the crypto pool
+    plain_address = wallet.new_account(password)
+    unknown_address = '0x' + '12' * 20
+    metrics.reset()
+    metrics.enable()
+    try:
+        results = wallet.export_accounts_key([addresses[0], plain_address, unknown_address], password)
+        keys = metrics.as_dict()['counters']
+    finally:
+        metrics.disable()
+        metrics.reset()
+    assert(sum(item['value'] for item in keys if item['name'] == 'crypto.keys' and item['labels'] == {'func': 'decrypt_key'}) == 2)
+    assert(results[0].result == raw_keys[0])
+    assert(EthAccount.privateKeyToAccount(results[1].result).address == plain_address)
+    assert(results[2].error == f'Cannot find account {unknown_address}')
+    with pytest.raises(ValueError, match=unknown_address):
+        wallet.export_account_key(unknown_address, password)
+    wallet.close()
+
+
+def add_hd_accounts(filename, count):
+    from wallet_manager.wallet_manager import WalletManager
+    wallet = WalletManager(filename, crypto_workers=1)
+    addresses = []
+    for _ in range(count):
+        addresses += [item.address for item in wallet.new_accounts(2, TEST_PASSWORD, hd_name=DEFAULT_HD_NAME)]
+    wallet.close()
+    return addresses
+
+
+@pytest.mark.parametrize('extension', ['json', 'jsonl', 'db'])
+def test_new_hd_accounts_many_processes(tmp_path, extension):
+    pytest.importorskip('eth_account')
+    from wallet_manager.key_chain import KeyChain
+
+    filename = str(tmp_path / f'key_chain.{extension}')
+    with Pool(TEST_PROCESS_COUNT) as pool:
+        results = pool.starmap(add_hd_accounts, [(filename, 3)] * TEST_PROCESS_COUNT)
+    addresses = [address for result in results for address in result]
+    # each process has taken its own indexes of the one seed
+    assert(len(set(addresses)) == len(addresses) == TEST_PROCESS_COUNT * 3 * 2)
+    key_chain = KeyChain(filename)
+    assert(key_chain.get_key(hd_seed_key(DEFAULT_HD_NAME))['next_index'] == len(addresses))
+    assert(sorted(key_chain.address_list) == sorted(addresses))
@@ -0,0 +1,67 @@
+"""
+
+Test the import time of the command line for commands that only use the local key chain
+
+"""
+import json
+import os
+import subprocess
+import sys
+
+from wallet_manager.key_chain import KeyChain
+
+PROJECT_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# budget in seconds to import the command processor and run a local only command
+LOCAL_COMMAND_BUDGET = 0.5
+
+HEAVY_MODULES = ['web3', 'eth_account', 'eth_utils', 'starfish', 'squid_py', 'requests', 'asyncio']
+
+IMPORT_SCRIPT = """
+import json
+import sys
+import time
+
+# only the modules imported by the command, not the ones the interpreter has already loaded
+start_modules = set(sys.modules)
+start_time = time.perf_counter()
+from wallet_manager.command_processor import CommandProcessor
+processor = CommandProcessor(key_chain_filename=sys.argv[1])
+processor.process(sys.argv[2:])
+processor.command_document_list('wallet_manager.py')
+elapsed = time.perf_counter() - start_time
+print(json.dumps({
+    'elapsed': elapsed,
+    'output': processor.output,
+    'modules': sorted(set(name.split('.')[0] for name in sys.modules if name not in start_modules)),
+}))
+"""
+
+
+def run_local_command(key_chain_filename, commands):
+    result = subprocess.run(
+        [sys.executable, '-c', IMPORT_SCRIPT, key_chain_filename] + commands,
+        cwd=PROJECT_PATH,
+        stdout=subprocess.PIPE,
+        check=True,
+    )
+    return json.loads(result.stdout.decode('utf-8').strip().split('\n')[-1])
+
+
+def test_local_command_import_time(tmp_path):
+    key_chain_filename = str(tmp_path / 'key_chain.jsonl')
+    key_chain = KeyChain(key_chain_filename)
+    addresses = [f'0x{index:040x}' for index in range(100)]
+    for address in addresses:
+        key_chain.set_key(address, {'address': address[2:], 'version': 3})
+    key_chain.save()
+
+    result = run_local_command(key_chain_filename, ['list', 'local'])
+    assert(result['output'] == addresses)
+    assert([name for name in HEAVY_MODULES if name in result['modules']] == [])
+    assert(result['elapsed'] < LOCAL_COMMAND_BUDGET)
+
+    result = run_local_command(key_chain_filename, ['delete', addresses[0], 'password', 'local'])
+    assert([name for name in HEAVY_MODULES if name in result['modules']] == [])
+    assert(result['elapsed'] < LOCAL_COMMAND_BUDGET)
+    assert(addresses[0] not in KeyChain(key_chain_filename).address_list)
@@ -0,0 +1,48 @@
+"""
+
+Test key_cache module
+
+"""
+import secrets
+import time
+
+from wallet_manager.key_cache import UnlockedKeyCache
+
+TEST_ADDRESS = '0x068Ed00cF0441e4829D9784fCBe7b9e26D4BD8d0'
+
+
+def test_key_cache_unlock_lock():
+    cache = UnlockedKeyCache()
+    raw_key = secrets.token_bytes(32)
+    cache.unlock(TEST_ADDRESS, raw_key, 'secret')
+    assert(cache.get(TEST_ADDRESS, 'secret') == raw_key)
+    assert(cache.get(TEST_ADDRESS, 'wrong') is None)
+
+    key_data = cache._items[TEST_ADDRESS][0]
+    assert(cache.lock(TEST_ADDRESS))
+    assert(cache.get(TEST_ADDRESS, 'secret') is None)
+    # the key material is zeroed when it is removed
+    assert(key_data == bytearray(32))
+
+
+def test_key_cache_expire():
+    cache = UnlockedKeyCache(duration=0.1)
+    cache.unlock(TEST_ADDRESS, secrets.token_bytes(32), 'secret')
+    assert(cache.is_unlocked(TEST_ADDRESS))
+    time.sleep(0.2)
+    assert(not cache.is_unlocked(TEST_ADDRESS))
+    assert(cache.get(TEST_ADDRESS, 'secret') is None)
+    assert(len(cache) == 0)
+
+
+def test_key_cache_max_size():
+    cache = UnlockedKeyCache(max_size=2)
+    addresses = [f'0x{index:040x}' for index in range(3)]
+    for address in addresses[:2]:
+        cache.unlock(address, secrets.token_bytes(32), 'secret')
+    # reading the first key makes the second key the least recently used
+    assert(cache.get(addresses[0], 'secret'))
+    cache.unlock(addresses[2], secrets.token_bytes(32), 'secret')
+    assert(cache.is_unlocked(addresses[0]))
+    assert(not cache.is_unlocked(addresses[1]))
+    assert(cache.is_unlocked(addresses[2]))
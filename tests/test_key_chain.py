@@ -0,0 +1,337 @@
+"""
+
+Test key_chain module
+
+"""
+import json
+import os
+
+from multiprocessing import Pool
+
+import pytest
+
+from wallet_manager.key_chain import KeyChain
+from wallet_manager.storage import (
+    JSONStorage,
+    LogStorage,
+    SQLiteStorage,
+)
+from wallet_manager.storage.log_storage import LOG_HEADER
+
+TEST_KEY_COUNT = 20
+
+
+def make_key_item(index):
+    return {
+        'address': f'{index:040x}',
+        'crypto': {'ciphertext': f'{index:064x}'},
+        'version': 3,
+    }
+
+
+def make_address(index):
+    return f'0x{index:040X}'
+
+
+def test_storage_type_by_extension(tmp_path):
+    key_chain = KeyChain(str(tmp_path / 'key_chain.json'))
+    assert(isinstance(key_chain.storage, JSONStorage))
+    key_chain = KeyChain(str(tmp_path / 'key_chain.jsonl'))
+    assert(isinstance(key_chain.storage, LogStorage))
+    key_chain = KeyChain(str(tmp_path / 'key_chain.data'), storage_type='log')
+    assert(isinstance(key_chain.storage, LogStorage))
+    key_chain = KeyChain(str(tmp_path / 'key_chain.db'))
+    assert(isinstance(key_chain.storage, SQLiteStorage))
+    key_chain = KeyChain(f'sqlite://{tmp_path}/key_chain')
+    assert(isinstance(key_chain.storage, SQLiteStorage))
+    assert(key_chain.storage.filename == f'{tmp_path}/key_chain')
+
+
+def test_log_storage_append(tmp_path):
+    filename = str(tmp_path / 'key_chain.jsonl')
+    key_chain = KeyChain(filename)
+    for index in range(TEST_KEY_COUNT):
+        key_chain.set_key(make_address(index), make_key_item(index))
+    key_chain.save()
+    size = os.path.getsize(filename)
+
+    # a single change only appends a single record
+    key_chain.delete_key(make_address(0))
+    key_chain.save()
+    with open(filename, 'rb') as fp:
+        data = fp.read()
+    assert(data.startswith(LOG_HEADER))
+    assert(data[size:].count(b'\n') == 1)
+
+    key_chain = KeyChain(filename)
+    assert(not key_chain.is_key(make_address(0)))
+    assert(len(key_chain.address_list) == TEST_KEY_COUNT - 1)
+    for index in range(1, TEST_KEY_COUNT):
+        assert(key_chain.get_key(make_address(index)) == make_key_item(index))
+
+
+def test_log_storage_compact(tmp_path):
+    filename = str(tmp_path / 'key_chain.jsonl')
+    key_chain = KeyChain(filename, compact_min_records=10)
+    address = make_address(1)
+    for index in range(TEST_KEY_COUNT):
+        key_chain.set_key(address, make_key_item(index))
+        key_chain.save()
+
+    # the log is compacted down once the dead records outnumber the live records
+    with open(filename, 'rb') as fp:
+        assert(fp.read().count(b'\n') < 12)
+    key_chain = KeyChain(filename)
+    assert(key_chain.get_key(address) == make_key_item(TEST_KEY_COUNT - 1))
+
+    key_chain.compact()
+    with open(filename, 'rb') as fp:
+        assert(fp.read().count(b'\n') == 2)
+    assert(not [name for name in os.listdir(tmp_path) if name.endswith('.tmp')])
+
+
+def test_log_storage_torn_write(tmp_path):
+    filename = str(tmp_path / 'key_chain.jsonl')
+    key_chain = KeyChain(filename)
+    key_chain.set_key(make_address(1), make_key_item(1))
+    key_chain.save()
+
+    # simulate a crash half way through writing a record
+    with open(filename, 'ab') as fp:
+        fp.write(b'S 0x0000 1234abcd {"address":')
+
+    key_chain = KeyChain(filename)
+    assert(key_chain.address_list == [make_address(1)])
+    key_chain.set_key(make_address(2), make_key_item(2))
+    key_chain.save()
+
+    key_chain = KeyChain(filename)
+    assert(key_chain.address_list == [make_address(1), make_address(2)])
+
+
+def test_log_storage_corrupt(tmp_path):
+    filename = str(tmp_path / 'key_chain.jsonl')
+    key_chain = KeyChain(filename)
+    key_chain.set_key(make_address(1), make_key_item(1))
+    key_chain.set_key(make_address(2), make_key_item(2))
+    key_chain.save()
+
+    with open(filename, 'rb') as fp:
+        data = fp.read()
+    with open(filename, 'wb') as fp:
+        fp.write(data.replace(b'"version":3', b'"version":4', 1))
+
+    with pytest.raises(ValueError):
+        KeyChain(filename)
+
+
+def test_migrate_json_key_chain(tmp_path):
+    json_filename = str(tmp_path / 'key_chain.json')
+    key_list = {make_address(index): make_key_item(index) for index in range(TEST_KEY_COUNT)}
+    with open(json_filename, 'w') as fp:
+        json.dump(key_list, fp)
+
+    key_chain = KeyChain(str(tmp_path / 'key_chain.jsonl'))
+    assert(key_chain.migrate(json_filename) == TEST_KEY_COUNT)
+    key_chain = KeyChain(str(tmp_path / 'key_chain.jsonl'))
+    assert(key_chain.address_list == list(key_list.keys()))
+
+    # the log storage can also read and convert a JSON key chain in place
+    key_chain = KeyChain(json_filename, storage_type='log')
+    assert(key_chain.get_key(make_address(3)) == make_key_item(3))
+    key_chain.delete_key(make_address(3))
+    key_chain.save()
+    with open(json_filename, 'rb') as fp:
+        assert(fp.read().startswith(LOG_HEADER))
+    key_chain = KeyChain(json_filename, storage_type='log')
+    assert(len(key_chain.address_list) == TEST_KEY_COUNT - 1)
+
+
+def test_log_storage_lazy(tmp_path):
+    filename = str(tmp_path / 'key_chain.jsonl')
+    key_chain = KeyChain(filename)
+    for index in range(TEST_KEY_COUNT):
+        key_chain.set_key(make_address(index), make_key_item(index))
+    key_chain.save()
+
+    key_chain = KeyChain(filename, lazy=True, compact_min_records=10)
+    assert(len(key_chain.address_list) == TEST_KEY_COUNT)
+    # only the record location is held until the key is read
+    assert(all(isinstance(value, tuple) for value in key_chain.storage._index.values()))
+    assert(key_chain.get_key(make_address(5)) == make_key_item(5))
+
+    key_chain.set_key(make_address(TEST_KEY_COUNT), make_key_item(TEST_KEY_COUNT))
+    key_chain.delete_key(make_address(0))
+    key_chain.save()
+    assert(key_chain.get_key(make_address(TEST_KEY_COUNT)) == make_key_item(TEST_KEY_COUNT))
+    assert(key_chain.get_key(make_address(0)) is None)
+
+    for index in range(1, TEST_KEY_COUNT):
+        key_chain.delete_key(make_address(index))
+        key_chain.save()
+    assert(key_chain.address_list == [make_address(TEST_KEY_COUNT)])
+    assert(key_chain.get_key(make_address(TEST_KEY_COUNT)) == make_key_item(TEST_KEY_COUNT))
+
+    key_chain = KeyChain(filename, lazy=True)
+    assert(key_chain.address_list == [make_address(TEST_KEY_COUNT)])
+    assert(key_chain.get_key(make_address(TEST_KEY_COUNT)) == make_key_item(TEST_KEY_COUNT))
+
+
+def test_log_storage_lazy_corrupt(tmp_path):
+    filename = str(tmp_path / 'key_chain.jsonl')
+    key_chain = KeyChain(filename)
+    key_chain.set_key(make_address(1), make_key_item(1))
+    key_chain.set_key(make_address(2), make_key_item(2))
+    key_chain.save()
+
+    with open(filename, 'rb') as fp:
+        data = fp.read()
+    with open(filename, 'wb') as fp:
+        fp.write(data.replace(b'"version":3', b'"version":4', 1))
+
+    # the checksum is only checked when the key is read
+    key_chain = KeyChain(filename, lazy=True)
+    assert(key_chain.get_key(make_address(2)) == make_key_item(2))
+    with pytest.raises(ValueError):
+        key_chain.get_key(make_address(1))
+
+
+def add_keys(filename, start, count):
+    key_chain = KeyChain(filename)
+    for index in range(start, start + count):
+        key_chain.set_key(make_address(index), make_key_item(index))
+        key_chain.save()
+
+
+@pytest.mark.parametrize('extension', ['json', 'jsonl'])
+def test_key_chain_many_processes(tmp_path, extension):
+    filename = str(tmp_path / f'key_chain.{extension}')
+    with Pool(4) as pool:
+        pool.starmap(add_keys, [(filename, start, TEST_KEY_COUNT) for start in range(0, TEST_KEY_COUNT * 4, TEST_KEY_COUNT)])
+    key_chain = KeyChain(filename)
+    # no process has lost the keys saved by the others
+    assert(len(key_chain.address_list) == TEST_KEY_COUNT * 4)
+    assert(key_chain.get_key(make_address(TEST_KEY_COUNT * 4 - 1)) == make_key_item(TEST_KEY_COUNT * 4 - 1))
+
+
+@pytest.mark.parametrize('extension', ['json', 'jsonl'])
+def test_key_chain_missing_file(tmp_path, extension):
+    key_chain = KeyChain(str(tmp_path / f'key_chain.{extension}'))
+    assert(key_chain.address_list == [])
+    assert(key_chain.get_key(make_address(1)) is None)
+    # reading a key chain that does not exist makes no files
+    assert(list(tmp_path.iterdir()) == [])
+
+
+@pytest.mark.parametrize('extension', ['json', 'jsonl'])
+def test_key_chain_refresh(tmp_path, extension):
+    filename = str(tmp_path / f'key_chain.{extension}')
+    first = KeyChain(filename)
+    second = KeyChain(filename)
+    first.set_key(make_address(1), make_key_item(1))
+    first.save()
+    second.set_key(make_address(2), make_key_item(2))
+    # the reads see the key saved by the other key chain, and keep the change not yet saved
+    assert(second.is_key(make_address(1)))
+    assert(second.is_key(make_address(2)))
+
+    second.delete_key(make_address(1))
+    second.save()
+    assert(sorted(first.address_list) == [make_address(2)])
+
+    fixed = KeyChain(filename, auto_refresh=False)
+    first.set_key(make_address(3), make_key_item(3))
+    first.save()
+    assert(not fixed.is_key(make_address(3)))
+    fixed.refresh()
+    assert(fixed.is_key(make_address(3)))
+
+
+def test_key_chain_batch(tmp_path):
+    filename = str(tmp_path / 'key_chain.jsonl')
+    key_chain = KeyChain(filename)
+    with key_chain.batch():
+        for index in range(TEST_KEY_COUNT):
+            key_chain.set_key(make_address(index), make_key_item(index))
+            key_chain.save()
+        # the saves are deferred to the end of the batch
+        assert(not os.path.exists(filename))
+    with open(filename, 'rb') as fp:
+        assert(fp.read().count(b'\n') == TEST_KEY_COUNT + 1)
+
+    with pytest.raises(ValueError):
+        with key_chain.batch():
+            key_chain.delete_key(make_address(0))
+            key_chain.set_key(make_address(TEST_KEY_COUNT), make_key_item(TEST_KEY_COUNT))
+            key_chain.save()
+            raise ValueError('failed')
+    assert(key_chain.is_key(make_address(0)))
+    assert(not key_chain.is_key(make_address(TEST_KEY_COUNT)))
+    assert(len(KeyChain(filename).address_list) == TEST_KEY_COUNT)
+
+
+def test_sqlite_storage(tmp_path):
+    filename = str(tmp_path / 'key_chain.db')
+    key_chain = KeyChain(filename)
+    with key_chain.batch():
+        for index in range(TEST_KEY_COUNT):
+            key_chain.set_key(make_address(index), make_key_item(index))
+            key_chain.save()
+    key_chain.delete_key(make_address(0))
+    key_chain.set_key(make_address(1), make_key_item(100))
+    key_chain.save()
+
+    other = KeyChain(filename)
+    assert(len(other.storage) == TEST_KEY_COUNT - 1)
+    assert(other.address_list == sorted(make_address(index) for index in range(1, TEST_KEY_COUNT)))
+    assert(other.get_key(make_address(1)) == make_key_item(100))
+    assert(other.get_key(make_address(0)) is None)
+
+    # the other key chain sees the keys saved after it was opened
+    other.account_index.page(limit=1)
+    key_chain.set_key(make_address(0), make_key_item(0))
+    key_chain.save()
+    assert(other.account_index.count() == TEST_KEY_COUNT)
+
+    with pytest.raises(ValueError):
+        with key_chain.batch():
+            key_chain.delete_key(make_address(0))
+            raise ValueError('failed')
+    assert(other.is_key(make_address(0)))
+
+
+def test_sqlite_storage_details(tmp_path):
+    key_chain = KeyChain(str(tmp_path / 'key_chain.db'))
+    for index in range(3):
+        key_chain.set_key(make_address(index), make_key_item(index))
+    key_chain.set_label(make_address(0), 'faucet')
+    key_chain.add_tags(make_address(0), ['nile', 'local'])
+    key_chain.add_tags(make_address(1), ['nile'])
+    key_chain.save()
+    key_chain.mark_used(make_address(0))
+
+    info = key_chain.get_info(make_address(0))
+    assert(info['label'] == 'faucet')
+    assert(info['tags'] == ['local', 'nile'])
+    assert(info['created_time'] and info['last_used_time'])
+    assert(key_chain.get_info(make_address(2))['last_used_time'] is None)
+    assert(key_chain.find_addresses(tag='nile') == [make_address(0), make_address(1)])
+    assert(key_chain.find_addresses(tag='nile', label='faucet') == [make_address(0)])
+
+    key_chain.remove_tags(make_address(0), ['nile'])
+    key_chain.save()
+    assert(key_chain.find_addresses(tag='nile') == [make_address(1)])
+    with pytest.raises(ValueError):
+        key_chain.set_label(make_address(5), 'missing')
+
+    # an HD seed is kept in the keys table, but is not an account
+    key_chain.set_key('hd:default', {'next_index': 0})
+    key_chain.save()
+    assert(len(key_chain.storage) == 3)
+    assert(key_chain.account_index.count() == 3)
+    assert(key_chain.find_addresses() == [make_address(index) for index in range(3)])
+    key_chain.close()
+
+    json_key_chain = KeyChain(str(tmp_path / 'key_chain.json'))
+    with pytest.raises(ValueError):
+        json_key_chain.set_label(make_address(0), 'faucet')
@@ -0,0 +1,94 @@
+"""
+
+Test metrics module
+
+"""
+import json
+
+import pytest
+
+from wallet_manager.key_chain import KeyChain
+from wallet_manager.metrics import (
+    Metrics,
+    metrics,
+)
+from wallet_manager.wallet_manager import WalletManager
+
+
+@pytest.fixture
+def shared_metrics():
+    metrics.reset()
+    metrics.enable()
+    yield metrics
+    metrics.disable()
+    metrics.reset()
+
+
+def find_item(items, name, **labels):
+    for item in items:
+        if item['name'] == name and item['labels'] == labels:
+            return item
+    return None
+
+
+def test_metrics_disabled():
+    store = Metrics()
+    with store.timer('call'):
+        pass
+    store.add('count')
+    assert(store.as_dict() == {'counters': [], 'histograms': []})
+
+
+def test_metrics_timer_and_counter():
+    store = Metrics(enabled=True)
+    for _ in range(3):
+        with store.timer('call', method='eth_accounts'):
+            pass
+    with pytest.raises(ValueError):
+        with store.timer('call', method='eth_accounts'):
+            raise ValueError('failed')
+    store.add('bytes', 100)
+    store.add('bytes', 20)
+
+    values = store.as_dict()
+    histogram = find_item(values['histograms'], 'call', method='eth_accounts')
+    assert(histogram['count'] == 4)
+    assert(sum(histogram['buckets'].values()) == 4)
+    assert(find_item(values['counters'], 'call_errors', method='eth_accounts')['value'] == 1)
+    assert(find_item(values['counters'], 'bytes')['value'] == 120)
+    assert(json.loads(store.export_json()) == values)
+
+    report = store.format_report()
+    assert('call{method="eth_accounts"}' in report)
+
+    text = store.export_prometheus()
+    assert('# TYPE wallet_manager_call_seconds histogram' in text)
+    assert('wallet_manager_call_seconds_bucket{method="eth_accounts",le="+Inf"} 4' in text)
+    assert('wallet_manager_call_seconds_count{method="eth_accounts"} 4' in text)
+    assert('wallet_manager_bytes_total 120' in text)
+
+
+def test_key_chain_and_wallet_metrics(tmp_path, shared_metrics):
+    key_chain = KeyChain(str(tmp_path / 'key_chain.json'))
+    key_chain.save()
+    wallet = WalletManager(key_chain_filename=str(tmp_path / 'key_chain.json'))
+    wallet.list_accounts()
+
+    histograms = shared_metrics.as_dict()['histograms']
+    assert(find_item(histograms, 'key_chain.load')['count'] == 2)
+    assert(find_item(histograms, 'key_chain.save')['count'] == 1)
+    assert(find_item(histograms, 'wallet.list_accounts')['count'] == 1)
+
+
+def test_rpc_metrics(rpc_node, shared_metrics):
+    pytest.importorskip('web3')
+    rpc_node.methods['eth_accounts'] = lambda: []
+    wallet = WalletManager()
+    wallet.list_accounts(rpc_node.url)
+    wallet.balances_ether([], rpc_node.url)
+
+    values = shared_metrics.as_dict()
+    assert(find_item(values['histograms'], 'rpc.request', method='eth_accounts')['count'] == 1)
+    assert(find_item(values['counters'], 'rpc.bytes_sent')['value'] > 0)
+    assert(find_item(values['counters'], 'rpc.bytes_received')['value'] > 0)
+    assert(find_item(values['histograms'], 'wallet.balances_ether')['count'] == 1)
@@ -0,0 +1,99 @@
+"""
+
+Test network_registry module
+
+"""
+import json
+
+import pytest
+
+from wallet_manager.command_processor import (
+    CommandProcessor,
+    CommandProcessError,
+)
+from wallet_manager.network_registry import NetworkRegistry
+from wallet_manager.wallet_manager import WalletManager
+
+TEST_CONTRACTS = {'OceanToken': '0x' + 'ab' * 20}
+
+
+def test_network_config(tmp_path):
+    config_filename = tmp_path / 'networks.json'
+    config_filename.write_text(json.dumps({
+        'networks': {
+            'Test': {
+                'description': 'Test network',
+                'url': 'http://test-node:8545',
+                'contracts': TEST_CONTRACTS,
+            },
+            'nile': {
+                'url': 'https://nile-mirror.example.com',
+            },
+        }
+    }))
+    networks = NetworkRegistry(config_filename=str(config_filename))
+    assert(networks.get_value('test') == 'http://test-node:8545')
+    assert(networks.get_value('test', 'contracts') == TEST_CONTRACTS)
+    assert(networks.get_value('nile') == 'https://nile-mirror.example.com')
+    assert(networks.get_value('nile', 'faucet_url') == 'https://faucet.nile.dev-ocean.com/faucet')
+    assert(networks.get_value('spree', 'faucet_url') is None)
+    assert(networks.get_value('http://localhost:8545') == 'http://localhost:8545')
+    assert(networks.get_value('node.example.com:8545') == 'node.example.com:8545')
+    assert(networks.get_value('unknown') is None)
+    # the default networks are not changed by the config file
+    assert(NetworkRegistry().get_value('nile') == 'https://nile.dev-ocean.com')
+
+    processor = CommandProcessor(networks=networks)
+    assert(processor._validate_network_name_to_value('TEST') == 'http://test-node:8545')
+    with pytest.raises(CommandProcessError):
+        processor._validate_network_name_to_value('unknown')
+
+    config_filename.write_text('[]')
+    with pytest.raises(ValueError):
+        NetworkRegistry(config_filename=str(config_filename))
+
+
+def test_chain_info_cache(tmp_path):
+    cache_filename = str(tmp_path / 'cache' / 'network_cache.json')
+    reads = []
+
+    def read_chain_info(url):
+        reads.append(url)
+        return {'chain_name': 'nile', 'chain_id': 8995}
+
+    networks = NetworkRegistry(cache_filename=cache_filename)
+    info = networks.get_chain_info('http://node', read_chain_info)
+    assert(info['faucet_url'] == 'https://faucet.nile.dev-ocean.com/faucet')
+    assert(networks.get_chain_info('http://node', read_chain_info)['chain_id'] == 8995)
+    assert(len(reads) == 1)
+
+    # a new registry reads the chain info from the cache file
+    networks = NetworkRegistry(cache_filename=cache_filename)
+    assert(networks.get_chain_info('http://node', read_chain_info)['chain_name'] == 'nile')
+    assert(len(reads) == 1)
+
+    # the contracts come from the current config, not from the cache
+    networks = NetworkRegistry({'nile': {'url': 'http://node', 'contracts': TEST_CONTRACTS}}, cache_filename=cache_filename)
+    info = networks.get_chain_info('http://node', read_chain_info)
+    assert(info['contracts'] == TEST_CONTRACTS)
+    assert(info['faucet_url'] is None)
+    assert(len(reads) == 1)
+
+    # expired entries are read again from the node
+    networks = NetworkRegistry(cache_filename=cache_filename, ttl=-1)
+    networks.get_chain_info('http://node', read_chain_info)
+    assert(len(reads) == 2)
+
+    networks.clear_cache()
+    networks = NetworkRegistry(cache_filename=cache_filename)
+    networks.get_chain_info('http://node', read_chain_info)
+    assert(len(reads) == 3)
+
+
+def test_wallet_chain_info(rpc_node):
+    rpc_node.methods['parity_chain'] = lambda: 'duero'
+    rpc_node.methods['eth_chainId'] = lambda: hex(2199)
+    wallet = WalletManager()
+    assert(wallet.get_chain_info(rpc_node.url) == {'chain_name': 'duero', 'chain_id': 2199})
+    assert(len(rpc_node.posts) == 1)
+    wallet.close()
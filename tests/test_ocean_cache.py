@@ -0,0 +1,39 @@
+"""
+
+Test ocean_cache module
+
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from wallet_manager.command_processor import CommandProcessor
+from wallet_manager.ocean_cache import (
+    OceanCache,
+    ocean_cache,
+)
+
+
+def test_ocean_cache(rpc_node):
+    pytest.importorskip('starfish')
+    rpc_node.methods['net_version'] = lambda: '8995'
+    cache = OceanCache()
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        oceans = list(executor.map(cache.get_ocean, [rpc_node.url] * 8))
+    assert(all(ocean is oceans[0] for ocean in oceans))
+    # the node is only asked for its network once
+    assert(len(rpc_node.posts) == 1)
+    assert(len(cache) == 1)
+
+    account = cache.get_account(rpc_node.url, '0x068Ed00cF0441e4829D9784fCBe7b9e26D4BD8d0')
+    assert(account.address == '0x068Ed00cF0441e4829D9784fCBe7b9e26D4BD8d0')
+
+    cache.remove(rpc_node.url)
+    assert(rpc_node.url not in cache)
+
+
+def test_shared_ocean_cache():
+    # command processors share the process wide cache, unless they are given their own
+    assert(CommandProcessor()._ocean_cache is ocean_cache)
+    cache = OceanCache()
+    assert(CommandProcessor(ocean_cache=cache)._ocean_cache is cache)
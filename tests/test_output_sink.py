@@ -0,0 +1,72 @@
+"""
+
+Test output_sink module
+
+"""
+import io
+import json
+
+from wallet_manager.command_processor import CommandProcessor
+from wallet_manager.key_chain import KeyChain
+from wallet_manager.output_sink import (
+    CallbackOutput,
+    JSONLinesOutput,
+    ListOutput,
+    StreamOutput,
+)
+
+
+def test_output_sinks():
+    output = ListOutput()
+    output.write('one')
+    output.write('two')
+    assert(output.lines == ['one', 'two'])
+
+    stream = io.StringIO()
+    output = StreamOutput(stream)
+    output.write('one')
+    output.write(2)
+    assert(stream.getvalue() == 'one\n2\n')
+    assert(output.lines == [])
+
+    stream = io.StringIO()
+    output = JSONLinesOutput(stream)
+    output.start('list')
+    output.write('0x01')
+    assert(json.loads(stream.getvalue()) == {'command': 'list', 'output': '0x01'})
+
+    stream = io.StringIO()
+    output = StreamOutput(stream)
+    output.write_error('bad password', 'bad password\n\nuse --help')
+    assert(stream.getvalue() == 'bad password\n\nuse --help\n')
+
+    stream = io.StringIO()
+    output = JSONLinesOutput(stream)
+    output.start('send')
+    output.write_error('bad password', 'bad password\n\nuse --help')
+    assert(json.loads(stream.getvalue()) == {'command': 'send', 'error': 'bad password'})
+
+    values = []
+    output = CallbackOutput(values.append)
+    output.write('one')
+    assert(values == ['one'])
+
+
+def test_command_processor_output(tmp_path):
+    key_chain_filename = str(tmp_path / 'key_chain.jsonl')
+    addresses = [f'0x{index:040x}' for index in range(100)]
+    key_chain = KeyChain(key_chain_filename)
+    for address in addresses:
+        key_chain.set_key(address, {'address': address[2:], 'version': 3})
+    key_chain.save()
+
+    # default output is kept for each call to process
+    processor = CommandProcessor(key_chain_filename)
+    processor.process(['list', 'local'])
+    assert(processor.output == addresses)
+
+    values = []
+    processor = CommandProcessor(key_chain_filename, output=CallbackOutput(values.append))
+    processor.process(['list', 'local'])
+    assert(values == addresses)
+    assert(processor.output == [])
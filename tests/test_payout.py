@@ -0,0 +1,217 @@
+"""
+
+Test payout module
+
+"""
+import json
+import os
+import secrets
+from decimal import Decimal
+
+import pytest
+import rlp
+
+from eth_utils import keccak
+
+from wallet_manager.command_processor import (
+    CommandProcessor,
+    CommandProcessError,
+)
+from wallet_manager.key_cache import UnlockedKeyCache
+from wallet_manager.output_sink import CallbackOutput
+from wallet_manager.payout import (
+    Payout,
+    PayoutCheckpoint,
+    Recipient,
+    read_recipients,
+)
+from wallet_manager.wallet_manager import WalletManager
+
+TEST_RECIPIENT_COUNT = 30
+
+
+def make_address(index):
+    return f'0x{index:040x}'
+
+
+def add_node_methods(rpc_node, reject_nonce=None):
+    sent = []
+    block = {'number': 1}
+
+    def send_raw_transaction(raw_transaction):
+        nonce = int.from_bytes(rlp.decode(bytes.fromhex(raw_transaction[2:]))[0], 'big')
+        if nonce == reject_nonce:
+            raise ValueError('insufficient funds')
+        sent.append(raw_transaction)
+        return '0x' + keccak(hexstr=raw_transaction).hex()
+
+    def block_number():
+        block['number'] += 1
+        return hex(block['number'])
+
+    rpc_node.methods['eth_getTransactionCount'] = lambda address, block: hex(0)
+    rpc_node.methods['eth_gasPrice'] = lambda: hex(10 ** 9)
+    rpc_node.methods['eth_sendRawTransaction'] = send_raw_transaction
+    rpc_node.methods['eth_blockNumber'] = block_number
+    rpc_node.methods['eth_getTransactionReceipt'] = lambda tx_hash: {'transactionHash': tx_hash, 'status': '0x1'}
+    return sent
+
+
+def write_recipients(tmp_path, count):
+    filename = tmp_path / 'recipients.csv'
+    lines = ['address,amount'] + [f'{make_address(index)},0.{index}' for index in range(1, count + 1)]
+    filename.write_text('\n'.join(lines))
+    return str(filename)
+
+
+def test_read_recipients(tmp_path):
+    filename = write_recipients(tmp_path, 3)
+    assert(list(read_recipients(filename)) == [
+        Recipient(2, make_address(1), Decimal('0.1')),
+        Recipient(3, make_address(2), Decimal('0.2')),
+        Recipient(4, make_address(3), Decimal('0.3')),
+    ])
+    with open(filename, 'a') as fp:
+        fp.write('\n' + make_address(4))
+    with pytest.raises(ValueError):
+        list(read_recipients(filename))
+
+    filename = write_recipients(tmp_path, 3)
+    with open(filename, 'a') as fp:
+        fp.write('\n0x1234,0.5')
+    with pytest.raises(ValueError, match='recipients.csv:5 "0x1234" is not a valid address'):
+        list(read_recipients(filename))
+
+
+def test_payout(tmp_path, rpc_node):
+    sent = add_node_methods(rpc_node)
+    wallet = WalletManager(str(tmp_path / 'key_chain.jsonl'), key_cache=UnlockedKeyCache())
+    password = secrets.token_hex(16)
+    from_address = wallet.new_account(password)
+    recipients_filename = write_recipients(tmp_path, TEST_RECIPIENT_COUNT)
+    checkpoint_filename = str(tmp_path / 'payout.checkpoint')
+
+    payout = Payout(wallet, rpc_node.url, from_address, password, checkpoint_filename, submit_batch_size=8, max_pending=10)
+    results = list(payout.run(read_recipients(recipients_filename)))
+    assert(len(results) == TEST_RECIPIENT_COUNT)
+    assert(all(result.status == 'mined' for result in results))
+    assert(sorted(result.address for result in results) == [make_address(index) for index in range(1, TEST_RECIPIENT_COUNT + 1)])
+    nonces = sorted(int.from_bytes(rlp.decode(bytes.fromhex(item[2:]))[0], 'big') for item in sent)
+    assert(nonces == list(range(TEST_RECIPIENT_COUNT)))
+    # the transactions are sent in batches, not one request each
+    send_requests = [post for post in rpc_node.posts if isinstance(post, list) and post[0]['method'] == 'eth_sendRawTransaction']
+    assert(len(send_requests) == 4)
+    assert(payout.summary.mined == TEST_RECIPIENT_COUNT)
+
+    # a second run with the same checkpoint does not pay again
+    payout = Payout(wallet, rpc_node.url, from_address, password, checkpoint_filename)
+    assert(list(payout.run(read_recipients(recipients_filename))) == [])
+    assert(payout.summary.skipped == TEST_RECIPIENT_COUNT)
+    assert(len(sent) == TEST_RECIPIENT_COUNT)
+    wallet.close()
+
+
+def test_payout_resume(tmp_path, rpc_node):
+    sent = add_node_methods(rpc_node, reject_nonce=5)
+    wallet = WalletManager(str(tmp_path / 'key_chain.jsonl'), key_cache=UnlockedKeyCache())
+    password = secrets.token_hex(16)
+    from_address = wallet.new_account(password)
+    recipients_filename = write_recipients(tmp_path, 10)
+
+    checkpoint_filename = f'{recipients_filename}.checkpoint'
+    payout = Payout(wallet, rpc_node.url, from_address, password, checkpoint_filename, submit_batch_size=3)
+    results = list(payout.run(read_recipients(recipients_filename)))
+    # the payout stops after the batch with the rejected transaction
+    assert(len(sent) == 5)
+    assert([result.status for result in results].count('failed') == 1)
+    assert(payout.summary.mined == 5)
+
+    checkpoint = PayoutCheckpoint(f'{recipients_filename}.checkpoint')
+    assert(checkpoint.get(7)['status'] == 'failed')
+    assert(checkpoint.get(8) is None)
+
+    # a transaction signed before a crash is only waited for, not sent again
+    signed_record = dict(checkpoint.get(2), status='signed')
+    with open(checkpoint.filename, 'a') as fp:
+        fp.write(json.dumps(signed_record) + '\n')
+
+    add_node_methods(rpc_node)
+    rpc_node.methods['eth_getTransactionCount'] = lambda address, block: hex(5)
+    lines = []
+    processor = CommandProcessor(wallet=wallet, output=CallbackOutput(lines.append))
+    processor.process(['send', 'ether', from_address, password, rpc_node.url, '--from-file', recipients_filename])
+    assert(lines[-1].startswith('payout done: 6 mined, 0 reverted, 0 failed, 0 timeout, 4 already paid'))
+    wallet.close()
+
+
+def test_payout_invalid_address(tmp_path, rpc_node):
+    recipients_filename = write_recipients(tmp_path, 3)
+    with open(recipients_filename, 'a') as fp:
+        fp.write('\nnot-an-address,0.5')
+    processor = CommandProcessor(str(tmp_path / 'key_chain.jsonl'))
+    with pytest.raises(CommandProcessError, match='recipients.csv:5'):
+        processor.process(['send', 'ether', make_address(1), 'password', rpc_node.url, '--from-file', recipients_filename])
+    # nothing is signed or sent
+    assert(rpc_node.posts == [])
+    assert(not os.path.exists(f'{recipients_filename}.checkpoint'))
+
+
+def test_payout_resend_after_crash(tmp_path, rpc_node, monkeypatch):
+    sent = add_node_methods(rpc_node)
+    wallet = WalletManager(str(tmp_path / 'key_chain.jsonl'), key_cache=UnlockedKeyCache())
+    password = secrets.token_hex(16)
+    from_address = wallet.new_account(password)
+    recipients_filename = write_recipients(tmp_path, 5)
+    checkpoint_filename = f'{recipients_filename}.checkpoint'
+
+    def crash(*args, **kwargs):
+        raise KeyboardInterrupt()
+
+    # crash after the transactions are signed and saved, before they are sent
+    with monkeypatch.context() as patch:
+        patch.setattr(Payout, '_send', crash)
+        payout = Payout(wallet, rpc_node.url, from_address, password, checkpoint_filename)
+        with pytest.raises(KeyboardInterrupt):
+            list(payout.run(read_recipients(recipients_filename)))
+    assert(sent == [])
+    records = PayoutCheckpoint(checkpoint_filename).get_signed()
+    assert(len(records) == 5)
+
+    # the same transactions are sent again, one the node already has is waited for
+    send_raw_transaction = rpc_node.methods['eth_sendRawTransaction']
+
+    def send_known(raw_transaction):
+        if raw_transaction == records[0]['raw_transaction']:
+            raise ValueError('already known')
+        return send_raw_transaction(raw_transaction)
+
+    rpc_node.methods['eth_sendRawTransaction'] = send_known
+    payout = Payout(wallet, rpc_node.url, from_address, password, checkpoint_filename)
+    results = list(payout.run(read_recipients(recipients_filename)))
+    assert(sorted(result.tx_hash for result in results) == sorted(record['tx_hash'] for record in records))
+    assert(all(result.status == 'mined' for result in results))
+    assert(sent == [record['raw_transaction'] for record in records[1:]])
+    assert(payout.summary.mined == 5 and payout.summary.skipped == 0)
+    wallet.close()
+
+
+def test_payout_checkpoint_error(tmp_path, rpc_node, monkeypatch):
+    add_node_methods(rpc_node)
+    wallet = WalletManager(str(tmp_path / 'key_chain.jsonl'), key_cache=UnlockedKeyCache())
+    password = secrets.token_hex(16)
+    from_address = wallet.new_account(password)
+    recipients_filename = write_recipients(tmp_path, 3)
+    checkpoint_write = PayoutCheckpoint.write
+
+    def write(checkpoint, records):
+        if records[0]['status'] != 'signed':
+            raise OSError('No space left on device')
+        checkpoint_write(checkpoint, records)
+
+    monkeypatch.setattr(PayoutCheckpoint, 'write', write)
+    payout = Payout(wallet, rpc_node.url, from_address, password, f'{recipients_filename}.checkpoint')
+    # every transaction still gives a result, the payout does not wait forever
+    results = list(payout.run(read_recipients(recipients_filename)))
+    assert(len(results) == 3)
+    assert(all(result.error == 'No space left on device' for result in results))
+    wallet.close()
@@ -0,0 +1,76 @@
+"""
+
+Test receipt_tracker module
+
+"""
+import pytest
+
+from concurrent.futures import wait
+
+from wallet_manager.connection_pool import ConnectionPool
+from wallet_manager.receipt_tracker import ReceiptTracker
+
+
+def test_receipt_tracker(rpc_node):
+    block = {'number': 1}
+    mined = set()
+
+    def block_number():
+        block['number'] += 1
+        return hex(block['number'])
+
+    def get_receipt(tx_hash):
+        if tx_hash in mined:
+            return {'transactionHash': tx_hash, 'status': '0x1'}
+        return None
+
+    rpc_node.methods['eth_blockNumber'] = block_number
+    rpc_node.methods['eth_getTransactionReceipt'] = get_receipt
+
+    pool = ConnectionPool()
+    tracker = ReceiptTracker(pool.get_provider(rpc_node.url), poll_interval=0.05)
+    tx_hashes = [f'0x{index:064x}' for index in range(10)]
+    mined.update(tx_hashes[:9])
+    callback_hashes = []
+    futures = [
+        tracker.track(tx_hash, lambda future: callback_hashes.append(future.result()['transactionHash']), timeout=1)
+        for tx_hash in tx_hashes[:9]
+    ]
+    lost_future = tracker.track(tx_hashes[9], timeout=0.3)
+
+    done, _ = wait(futures, timeout=5)
+    assert(len(done) == 9)
+    assert([future.result()['transactionHash'] for future in futures] == tx_hashes[:9])
+    assert(sorted(callback_hashes) == tx_hashes[:9])
+
+    with pytest.raises(TimeoutError):
+        lost_future.result(timeout=5)
+    assert(tracker.pending_count == 0)
+
+    # receipts are requested in one batch per poll, not one request per transaction
+    receipt_posts = [post for post in rpc_node.posts if isinstance(post, list)]
+    assert(len(receipt_posts) < len(tx_hashes))
+
+    tracker.close()
+    pool.close()
+
+
+def test_receipt_tracker_idle_chain(rpc_node):
+    mined = set()
+    rpc_node.methods['eth_blockNumber'] = lambda: hex(1)
+    rpc_node.methods['eth_getTransactionReceipt'] = lambda tx_hash: {'transactionHash': tx_hash} if tx_hash in mined else None
+
+    pool = ConnectionPool()
+    tracker = ReceiptTracker(pool.get_provider(rpc_node.url), poll_interval=0.05)
+    waiting_future = tracker.track(f'0x{1:064x}', timeout=5)
+    wait([waiting_future], timeout=0.3)
+    assert(not waiting_future.done())
+
+    # tracked after the current block was polled, and no new block comes
+    tx_hash = f'0x{2:064x}'
+    mined.add(tx_hash)
+    future = tracker.track(tx_hash, timeout=5)
+    assert(future.result(timeout=2)['transactionHash'] == tx_hash)
+
+    tracker.close()
+    pool.close()
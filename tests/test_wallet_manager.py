@@ -3,9 +3,22 @@
 Test wallet_manager module
 
 """
+import json
 import secrets
 import time
 
+import pytest
+import rlp
+
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from eth_account import Account as EthAccount
+
+from wallet_manager.command_processor import (
+    CommandProcessor,
+    CommandProcessError,
+)
+from wallet_manager.key_cache import UnlockedKeyCache
 from wallet_manager.wallet_manager import WalletManager
 
 def test_accounts_local(resources):
@@ -146,3 +159,157 @@ def test_send_ether(resources):
 
     wallet.delete_account(local_address, password)
     wallet.delete_account(host_address, password, resources.host_url)
+
+
+def test_batch_accounts_host(rpc_node):
+    addresses = [
+        '0x068Ed00cF0441e4829D9784fCBe7b9e26D4BD8d0',
+        '0x00Bd138aBD70e2F00903268F3Db08f2D25677C9e',
+        '0x64ff0C9c3d7e2ac4a2A1D4a5F2D1f5C9aA2b3c4D',
+    ]
+    balances = {
+        addresses[0]: hex(10 ** 18),
+        addresses[1]: hex(5 * 10 ** 17),
+    }
+
+    def get_balance(address, block):
+        return balances[address]
+
+    def kill_account(address, password):
+        if password != 'secret':
+            raise ValueError('Invalid password')
+        return True
+
+    rpc_node.methods['eth_getBalance'] = get_balance
+    rpc_node.methods['parity_killAccount'] = kill_account
+    rpc_node.methods['parity_exportAccount'] = lambda address, password: {'address': address[2:].lower()}
+
+    wallet = WalletManager()
+    results = wallet.balances_ether(addresses, rpc_node.url)
+    assert([item.address for item in results] == addresses)
+    assert(results[0].result == 1)
+    assert(results[1].result == Decimal('0.5'))
+    assert(results[2].result is None and results[2].error)
+
+    results = wallet.export_accounts_json(addresses, 'secret', rpc_node.url)
+    assert(json.loads(results[1].result)['address'] == addresses[1][2:].lower())
+
+    results = wallet.delete_accounts(addresses, ['secret', 'bad', 'secret'], rpc_node.url)
+    assert([item.error is None for item in results] == [True, False, True])
+
+    # each batch call only posts one request
+    assert(len(rpc_node.posts) == 3)
+    wallet.close()
+
+
+def test_batch_accounts_key_local(resources):
+    wallet = WalletManager(resources.key_chain_filename, crypto_workers=2)
+    password = secrets.token_hex(32)
+    new_password = secrets.token_hex(32)
+    local_accounts = [EthAccount.create(password) for _ in range(3)]
+    addresses = [account.address for account in local_accounts]
+    raw_keys = [account.privateKey for account in local_accounts]
+
+    results = wallet.import_accounts_key(addresses, raw_keys, password)
+    assert([item.result for item in results] == addresses)
+
+    missing_address = EthAccount.create(password).address
+    results = wallet.change_accounts_password(addresses + [missing_address], password, new_password)
+    assert([item.error is None for item in results] == [True, True, True, False])
+
+    results = wallet.export_accounts_key(addresses, new_password)
+    assert([item.result for item in results] == raw_keys)
+
+    wallet.delete_accounts(addresses, new_password)
+    wallet.close()
+
+
+def test_new_accounts_batch(tmp_path, rpc_node):
+    filename = str(tmp_path / 'key_chain.json')
+    wallet = WalletManager(filename, crypto_workers=1)
+    password = secrets.token_hex(32)
+    results = wallet.new_accounts(3, password)
+    assert(all(item.error is None for item in results))
+    assert(sorted(WalletManager(filename).list_accounts()) == sorted(item.address for item in results))
+    with pytest.raises(ValueError):
+        wallet.new_accounts(0, password)
+    processor = CommandProcessor(wallet=wallet)
+    for count in ['0', '-1', 'hd']:
+        with pytest.raises(CommandProcessError):
+            processor.process(['new', password, 'local', count])
+    assert(len(wallet.list_accounts()) == 3)
+
+    # an error in the batch saves none of its changes
+    local_account = EthAccount.create(password)
+    with pytest.raises(ValueError):
+        with wallet.batch():
+            wallet.import_account_key(local_account.address, local_account.privateKey, password)
+            wallet.delete_account(results[0].address, password)
+            raise ValueError('failed')
+    assert(sorted(wallet.list_accounts()) == sorted(item.address for item in results))
+
+    rpc_node.methods['personal_newAccount'] = lambda password: '0x068Ed00cF0441e4829D9784fCBe7b9e26D4BD8d0'
+    results = wallet.new_accounts(2, password, rpc_node.url)
+    assert([item.address for item in results] == ['0x068Ed00cF0441e4829D9784fCBe7b9e26D4BD8d0'] * 2)
+    assert(len(rpc_node.posts) == 1)
+    wallet.close()
+
+
+def test_unlock_account_local(resources):
+    wallet = WalletManager(resources.key_chain_filename)
+    password = secrets.token_hex(32)
+    address = wallet.new_account(password)
+    raw_key = wallet.export_account_key(address, password)
+
+    assert(wallet.unlock_account(address, password))
+    assert(wallet.key_cache.is_unlocked(address))
+    assert(wallet.export_account_key(address, password) == raw_key)
+    assert(wallet.lock_account(address))
+    assert(not wallet.key_cache.is_unlocked(address))
+
+    wallet.delete_account(address, password)
+
+
+def test_local_nonce_send_ether(resources, rpc_node):
+    wallet = WalletManager(resources.key_chain_filename, key_cache=UnlockedKeyCache())
+    password = secrets.token_hex(32)
+    local_address = wallet.new_account(password)
+    to_address = resources.test_account.address
+
+    sent = []
+
+    def send_raw_transaction(raw_transaction):
+        sent.append(raw_transaction)
+        return '0x' + f'{len(sent):064x}'
+
+    rpc_node.methods['eth_getTransactionCount'] = lambda address, block: hex(5)
+    rpc_node.methods['eth_gasPrice'] = lambda: hex(10 ** 9)
+    rpc_node.methods['eth_sendRawTransaction'] = send_raw_transaction
+    rpc_node.methods['eth_getTransactionReceipt'] = lambda tx_hash: {'transactionHash': tx_hash, 'status': '0x1'}
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        futures = [
+            executor.submit(wallet.send_ether, local_address, password, to_address, 1, rpc_node.url, is_local=True)
+            for _ in range(8)
+        ]
+        for future in futures:
+            future.result()
+
+    nonces = sorted(rlp.decode(bytes.fromhex(item[2:]))[0] for item in sent)
+    assert(nonces == [bytes([nonce]) for nonce in range(5, 13)])
+    count_posts = [post for post in rpc_node.posts if post['method'] == 'eth_getTransactionCount']
+    assert(len(count_posts) == 1)
+
+    # a rejected transaction reads the nonce from the node again
+    def reject_transaction(raw_transaction):
+        raise ValueError('nonce too low')
+
+    rpc_node.methods['eth_sendRawTransaction'] = reject_transaction
+    with pytest.raises(ValueError):
+        wallet.send_ether(local_address, password, to_address, 1, rpc_node.url, is_local=True)
+    rpc_node.methods['eth_sendRawTransaction'] = send_raw_transaction
+    wallet.send_ether(local_address, password, to_address, 1, rpc_node.url, is_local=True)
+    assert(rlp.decode(bytes.fromhex(sent[-1][2:]))[0] == bytes([5]))
+
+    wallet.delete_account(local_address, password)
+    wallet.close()
@@ -2,6 +2,8 @@
 
 import argparse
 import logging
+import os.path
+import signal
 import sys
 import traceback
 
@@ -9,21 +11,167 @@ from wallet_manager.command_processor import (
     CommandProcessor,
     CommandProcessError,
 )
+from wallet_manager.batch_runner import BatchRunner
+from wallet_manager.daemon import (
+    CommandDaemon,
+    DaemonClient,
+    DEFAULT_SOCKET_FILENAME,
+    ERROR_TYPE_COMMAND,
+    ERROR_TYPE_KEY_CHAIN,
+    is_daemon_running,
+)
+from wallet_manager.key_cache import UnlockedKeyCache
+from wallet_manager.metrics import metrics
+from wallet_manager.network_registry import NetworkRegistry
+from wallet_manager.output_sink import (
+    JSONLinesOutput,
+    StreamOutput,
+)
+from wallet_manager.storage import absolute_storage_uri
+from wallet_manager.wallet_manager import WalletManager
 
 from wallet_manager import logger
 
 DEFAULT_KEY_CHAIN_FILENAME = 'key_chain.json'
+DEFAULT_NETWORK_CACHE_FILENAME = os.path.join(os.path.expanduser('~'), '.cache', 'wallet_manager', 'network_cache.json')
 
 APP_NAME = 'wallet_manager.py'
+PROFILE_LINE_COUNT = 30
+COMMAND_HELP_HINT = '\n--help-commands to view the full command list'
 
 def show_command_help(processor):
     items = processor.command_document_list(APP_NAME)
+    items.append('\nKeep the key chain and node connections loaded, and run the commands sent by this app')
+    items.append(f'    {APP_NAME} serve')
+    items.append('\nRun the commands in a file or stdin, one command per line as text or a JSON list')
+    items.append(f'    {APP_NAME} [--jobs <count>] batch <filename or ->')
     print('\nThe following commands can be used:\n')
     print("\n".join(items))
     print('\nPossible network names can be one of the following:\n')
-    for name, item in CommandProcessor.NETWORK_NAMES.items():
+    for name, item in processor.networks.items():
         print(f'{name:20}: {item["description"]}')
 
+def add_command_options(args):
+    # options that are passed on to the command, so they also work in a batch line or with the daemon
+    for name in ('from_file', 'checkpoint', 'token'):
+        value = getattr(args, name)
+        if value:
+            args.commands += ['--' + name.replace('_', '-'), value]
+
+def create_networks(args):
+    cache_filename = None if args.no_network_cache else DEFAULT_NETWORK_CACHE_FILENAME
+    return NetworkRegistry(
+        CommandProcessor.NETWORK_NAMES,
+        config_filename=args.network_config,
+        cache_filename=cache_filename,
+    )
+
+def create_output(args):
+    if args.output_format == 'jsonl':
+        return JSONLinesOutput()
+    return StreamOutput()
+
+def process_with_daemon(args, output):
+    # returns True if the daemon has processed the commands
+    if args.no_daemon or not is_daemon_running(args.socket):
+        return False
+    if args.network_config:
+        # the daemon has loaded its own network config
+        logger.debug('the network config is set, so the daemon is not used')
+        return False
+    client = DaemonClient(args.socket)
+    try:
+        response = client.process(args.commands, args.key_chain)
+    except OSError as e:
+        logger.debug(f'unable to use the daemon: {e}')
+        return False
+    error_type = response.get('error_type')
+    if error_type == ERROR_TYPE_KEY_CHAIN:
+        logger.debug(response['error'])
+        return False
+    output.start(args.commands[0])
+    if error_type == ERROR_TYPE_COMMAND:
+        output.write_error(response['error'], f'{response["error"]}\n{COMMAND_HELP_HINT}')
+    elif error_type:
+        output.write_error(response['error'])
+    else:
+        for value in response['output']:
+            output.write(value)
+    output.flush()
+    return True
+
+def run_batch(args, output, networks):
+    output.start(args.commands[0])
+    filename = args.commands[1] if len(args.commands) > 1 else '-'
+    try:
+        fp = sys.stdin if filename == '-' else open(filename, 'r')
+    except OSError as e:
+        output.write_error(str(e))
+        output.flush()
+        return
+    wallet = WalletManager(key_chain_filename=args.key_chain, lazy=True, key_cache=UnlockedKeyCache())
+    runner = BatchRunner(wallet, args.jobs, networks)
+    ok_count = 0
+    error_count = 0
+    try:
+        for result in runner.run(fp):
+            # only show the command name, the other values can be passwords
+            command = result.commands[0] if result.commands else ''
+            if result.error is None:
+                ok_count += 1
+                lines = [f'line {result.line_number} ok {command}']
+                lines += [f'    {text}' for text in result.output]
+            else:
+                error_count += 1
+                lines = [f'line {result.line_number} error {command}: {result.error}']
+            item = {
+                'line': result.line_number,
+                'command': command,
+                'output': result.output,
+                'error': result.error,
+            }
+            output.write_item(item, '\n'.join(lines))
+            output.flush()
+    finally:
+        if fp is not sys.stdin:
+            fp.close()
+        wallet.close()
+    item = {'done': True, 'ok': ok_count, 'failed': error_count}
+    output.write_item(item, f'batch done: {ok_count} ok, {error_count} failed')
+    output.flush()
+
+def start_profile(args):
+    if not args.profile:
+        return None
+    import cProfile
+    profiler = cProfile.Profile()
+    profiler.enable()
+    return profiler
+
+def show_metrics(args, profiler):
+    # written to stderr, so the report is not mixed with the command output
+    if profiler:
+        profiler.disable()
+        import pstats
+        pstats.Stats(profiler, stream=sys.stderr).sort_stats('cumulative').print_stats(PROFILE_LINE_COUNT)
+    if not args.metrics:
+        return
+    if args.metrics_format == 'json':
+        print(metrics.export_json(), file=sys.stderr)
+    elif args.metrics_format == 'prometheus':
+        print(metrics.export_prometheus(), end='', file=sys.stderr)
+    else:
+        print(metrics.format_report(), file=sys.stderr)
+
+def serve(args, processor):
+    daemon = CommandDaemon(processor, args.key_chain, args.socket)
+    # exit cleanly on a kill, so that the socket file is removed
+    signal.signal(signal.SIGTERM, lambda signal_number, frame: sys.exit(0))
+    try:
+        daemon.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
 def main():
     parser = argparse.ArgumentParser('Ocean Drop')
     parser.add_argument(
@@ -47,12 +195,83 @@ def main():
 
     parser.add_argument(
         '-k', '--key-chain',
-        help = f'Key chain file to save and read local keys. Default {DEFAULT_KEY_CHAIN_FILENAME}',
+        help = f'Key chain file or uri, such as sqlite:///path/key_chain, to save and read local keys. Default {DEFAULT_KEY_CHAIN_FILENAME}',
         default = DEFAULT_KEY_CHAIN_FILENAME
     )
 
+    parser.add_argument(
+        '-j', '--jobs',
+        type = int,
+        default = 1,
+        help = 'Number of batch commands to run at the same time. Default 1',
+    )
+
+    parser.add_argument(
+        '-o', '--output-format',
+        choices = ['text', 'jsonl'],
+        default = 'text',
+        help = 'Write the output as lines of text, or as one JSON object per line. Default text',
+    )
+
+    parser.add_argument(
+        '--from-file',
+        help = 'csv file of address,amount lines to pay with the send command',
+    )
+
+    parser.add_argument(
+        '--checkpoint',
+        help = 'checkpoint file of a send --from-file payout. Default the recipients file name with .checkpoint',
+    )
+
+    parser.add_argument(
+        '--token',
+        help = 'token contract address to pay with send tokens --from-file',
+    )
+
+    parser.add_argument(
+        '--network-config',
+        help = 'JSON file of more network names, with their url, faucet_url and contracts',
+    )
+
+    parser.add_argument(
+        '--no-network-cache',
+        action = 'store_true',
+        help = f'do not read or save the chain details of each node in {DEFAULT_NETWORK_CACHE_FILENAME}',
+    )
+
+    parser.add_argument(
+        '--socket',
+        help = f'Unix socket file of the daemon started with the "serve" command. Default {DEFAULT_SOCKET_FILENAME}',
+        default = DEFAULT_SOCKET_FILENAME
+    )
+
+    parser.add_argument(
+        '--no-daemon',
+        action = 'store_true',
+        help = 'do not send the commands to a running daemon',
+    )
+
+    parser.add_argument(
+        '--metrics',
+        action = 'store_true',
+        help = 'after the command, show the count and time of the wallet calls, key chain reads and writes, and RPC requests',
+    )
+
+    parser.add_argument(
+        '--metrics-format',
+        choices = ['text', 'json', 'prometheus'],
+        default = 'text',
+        help = 'format of the --metrics report. Default text',
+    )
+
+    parser.add_argument(
+        '--profile',
+        action = 'store_true',
+        help = f'after the command, show the {PROFILE_LINE_COUNT} functions with the most cumulative time',
+    )
+
     args = parser.parse_args()
-    processor = CommandProcessor(key_chain_filename=args.key_chain)
+    add_command_options(args)
 
     if args.debug:
         logging.basicConfig(stream=sys.stdout, level=logging.DEBUG)
@@ -63,25 +282,55 @@ def main():
         logging.getLogger('config').setLevel(logging.INFO)
         logger.debug('set to debug')
 
-    if args.help_commands:
-        show_command_help(processor)
+    if args.metrics:
+        metrics.enable()
+    if args.metrics or args.profile:
+        # only the calls made in this process can be measured
+        args.no_daemon = True
+    profiler = start_profile(args)
+    try:
+        run_commands(args)
+    finally:
+        show_metrics(args, profiler)
+
+def run_commands(args):
+    output = create_output(args)
+    try:
+        networks = create_networks(args)
+    except (OSError, ValueError) as e:
+        output.write_error(str(e))
+        output.flush()
+        return
+
+    if args.help_commands or len(args.commands) == 0:
+        show_command_help(CommandProcessor(networks=networks))
+        return
+
+    if args.commands[0] == 'batch':
+        run_batch(args, output, networks)
+        return
+
+    if args.commands[0] == 'serve':
+        # the daemon sends the output of each command back to the client
+        # the key chain is kept open while the commands of clients in other folders are run
+        args.key_chain = absolute_storage_uri(args.key_chain)
+        serve(args, CommandProcessor(key_chain_filename=args.key_chain, networks=networks))
         return
 
-    if len(args.commands) == 0:
-        show_command_help(processor)
+    if process_with_daemon(args, output):
         return
 
+    processor = CommandProcessor(key_chain_filename=args.key_chain, output=output, networks=networks)
     try:
         processor.process(args.commands)
     except CommandProcessError as e:
-        print(e)
-        print('\n--help-commands to view the full command list')
+        output.write_error(str(e), f'{e}\n{COMMAND_HELP_HINT}')
     except Exception as e:
-        print(e)
+        output.write_error(str(e))
         if args.debug:
             traceback.print_exc()
-    else:
-        print("\n".join(processor.output))
+    finally:
+        output.flush()
 
 if __name__ == '__main__':
     main()
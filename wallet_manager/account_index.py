@@ -0,0 +1,116 @@
+"""
+
+    Sorted index of account addresses, to list a large number of accounts a page at a time.
+
+"""
+import fnmatch
+import itertools
+import re
+
+from bisect import (
+    bisect_left,
+    bisect_right,
+    insort,
+)
+from collections import namedtuple
+
+
+AccountPage = namedtuple('AccountPage', ['addresses', 'cursor'])
+
+GLOB_PATTERN = re.compile(r'[*?\[]')
+
+
+def normalize_pattern(pattern):
+    """
+    Returns the lower case pattern to match against an address, a pattern without
+    a leading '0x' or wildcard is matched from the start of the hex address.
+    """
+    if not pattern:
+        return None
+    pattern = pattern.lower()
+    if not pattern.startswith('0x') and pattern[0] not in '*?[':
+        pattern = '0x' + pattern
+    return pattern
+
+
+class AccountIndex():
+    """
+    Addresses kept sorted by their lower case value, so a page after a cursor address or
+    the addresses that start with a prefix are found with a binary search, instead of
+    copying and scanning the full address list.
+
+    A glob pattern such as '0xab*ff' is searched from the range of its literal prefix.
+    """
+
+    def __init__(self, addresses=None):
+        self._addresses = {}
+        for address in addresses or []:
+            self._addresses[address.lower()] = address
+        self._keys = sorted(self._addresses.keys())
+
+    def add(self, address):
+        key = address.lower()
+        if key not in self._addresses:
+            insort(self._keys, key)
+        self._addresses[key] = address
+
+    def remove(self, address):
+        key = address.lower()
+        if self._addresses.pop(key, None) is not None:
+            position = bisect_left(self._keys, key)
+            del self._keys[position]
+
+    def addresses(self, after=None, pattern=None):
+        """
+        Yield each address in sorted order after the cursor address `after`, that match the pattern.
+        """
+        pattern = normalize_pattern(pattern)
+        prefix = pattern
+        match = None
+        if pattern and GLOB_PATTERN.search(pattern):
+            prefix = GLOB_PATTERN.split(pattern, 1)[0]
+            match = re.compile(fnmatch.translate(pattern)).match
+
+        start = 0
+        if prefix:
+            start = bisect_left(self._keys, prefix)
+        if after:
+            start = max(start, bisect_right(self._keys, after.lower()))
+
+        position = start
+        # read the length each time, the index can change while it is being read
+        while position < len(self._keys):
+            key = self._keys[position]
+            position += 1
+            if prefix and not key.startswith(prefix):
+                break
+            if match and not match(key):
+                continue
+            address = self._addresses.get(key)
+            if address:
+                yield address
+
+    def page(self, after=None, limit=None, pattern=None):
+        """
+        Returns an AccountPage with up to `limit` addresses, and the cursor to pass as `after`
+        for the next page, or None if this is the last page.
+        """
+        addresses = self.addresses(after, pattern)
+        if limit is None:
+            return AccountPage(list(addresses), None)
+        items = list(itertools.islice(addresses, limit + 1))
+        if len(items) > limit:
+            items = items[:limit]
+            return AccountPage(items, items[-1].lower())
+        return AccountPage(items, None)
+
+    def count(self, pattern=None):
+        pattern = normalize_pattern(pattern)
+        if not pattern:
+            return len(self._keys)
+        if not GLOB_PATTERN.search(pattern):
+            return bisect_left(self._keys, pattern + '\uffff') - bisect_left(self._keys, pattern)
+        return sum(1 for _ in self.addresses(pattern=pattern))
+
+    def __len__(self):
+        return len(self._keys)
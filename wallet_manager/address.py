@@ -0,0 +1,20 @@
+"""
+
+    Check account addresses without importing web3.
+
+"""
+import re
+
+
+ADDRESS_PATTERN = re.compile('^(0x)?[0-9a-fA-F]{40}$')
+
+
+def is_address(address):
+    # same rules as Web3.isAddress, without importing web3 for addresses that are not mixed case
+    if not isinstance(address, str) or not ADDRESS_PATTERN.match(address):
+        return False
+    hex_address = address[2:] if address.startswith('0x') else address
+    if hex_address.lower() == hex_address or hex_address.upper() == hex_address:
+        return True
+    from eth_utils import is_checksum_address
+    return is_checksum_address(address)
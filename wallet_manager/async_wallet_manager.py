@@ -0,0 +1,357 @@
+import asyncio
+import itertools
+import json
+import time
+
+from web3 import Web3
+from eth_account import Account as EthAccount
+
+from wallet_manager.account_index import AccountIndex
+from wallet_manager.crypto_pool import (
+    CryptoPool,
+    decrypt_key,
+    encrypt_key,
+)
+from wallet_manager.hd_wallet import (
+    HDWallet,
+    hd_seed_key,
+    is_hd_account,
+)
+from wallet_manager.key_chain import KeyChain
+from wallet_manager.metrics import metrics
+from wallet_manager.wallet_manager import BatchResult
+from wallet_manager import logger
+
+
+DEFAULT_POOL_SIZE = 100
+DEFAULT_KEEPALIVE_TIMEOUT = 300
+DEFAULT_REQUEST_TIMEOUT = 10
+DEFAULT_RECEIPT_POLL_INTERVAL = 1.0
+
+
+def import_aiohttp():
+    try:
+        import aiohttp
+    except ImportError:
+        raise ImportError('AsyncWalletManager needs the aiohttp package, install it with "pip install wallet-manager[async]"')
+    return aiohttp
+
+
+class AsyncRPCError(ValueError):
+    pass
+
+
+class AsyncNonceManager():
+    """
+    asyncio version of the NonceManager, `get_transaction_count` is a coroutine function
+    that returns the pending transaction count of the address. It is kept here so that
+    the sync wallet manager does not import asyncio.
+    """
+
+    def __init__(self):
+        self._nonces = {}
+        self._locks = {}
+
+    async def next_nonce(self, url, address, get_transaction_count):
+        key = (url, address)
+        async with self._get_lock(key):
+            nonce = self._nonces.get(key)
+            if nonce is None:
+                nonce = await get_transaction_count(address)
+                logger.debug(f'nonce for {address} at {url} starts at {nonce}')
+            self._nonces[key] = nonce + 1
+            return nonce
+
+    def resync(self, url, address):
+        self._nonces.pop((url, address), None)
+
+    def reset(self):
+        self._nonces = {}
+
+    def _get_lock(self, key):
+        if key not in self._locks:
+            self._locks[key] = asyncio.Lock()
+        return self._locks[key]
+
+
+class AsyncWalletManager():
+    """
+    asyncio version of the WalletManager.
+
+    All of the node requests go through one aiohttp session, so the keep-alive connections
+    in its pool of `pool_size` connections are shared by every node url and every task.
+    The keystore KDF runs in the process pool of the CryptoPool, to keep the event loop free.
+    """
+
+    def __init__(self, key_chain_filename=None, lazy=False, pool_size=DEFAULT_POOL_SIZE,
+                 keepalive_timeout=DEFAULT_KEEPALIVE_TIMEOUT, request_timeout=DEFAULT_REQUEST_TIMEOUT,
+                 crypto_workers=None, key_cache=None):
+        self._key_chain = None
+        if key_chain_filename:
+            self._key_chain = KeyChain(key_chain_filename, lazy=lazy)
+        self._pool_size = pool_size
+        self._keepalive_timeout = keepalive_timeout
+        self._request_timeout = request_timeout
+        self._crypto_pool = CryptoPool(crypto_workers)
+        self._key_cache = key_cache
+        self._nonce_manager = AsyncNonceManager()
+        self._request_counter = itertools.count()
+        self._session = None
+
+    async def new_account(self, password, url=None):
+        if url:
+            address = await self.request(url, 'personal_newAccount', [password])
+            accounts = await self.request(url, 'personal_listAccounts', [])
+            if not address in accounts:
+                raise NameError('Unable to create a new account')
+            return address
+        local_account = EthAccount.create(password)
+        key_value = await self._run_crypto(encrypt_key, local_account.privateKey, password)
+        await self._run_key_chain(self._save_key, local_account.address, key_value)
+        return local_account.address
+
+    async def get_chain_status(self, url):
+        return await self.request(url, 'parity_chainStatus', [])
+
+    async def get_chain_name(self, url):
+        return await self.request(url, 'parity_chain', [])
+
+    async def delete_account(self, address, password, url=None):
+        if url:
+            await self.request(url, 'parity_killAccount', [address, password])
+        else:
+            await self._run_key_chain(self._delete_key, address)
+
+    async def list_accounts(self, url=None):
+        if url:
+            return await self.request(url, 'eth_accounts', [])
+        return await self._run_key_chain(lambda: self._key_chain.address_list)
+
+    async def list_accounts_page(self, url=None, after=None, limit=100, pattern=None):
+        if url:
+            account_index = await self._get_host_account_index(url)
+            return account_index.page(after, limit, pattern)
+        return await self._run_key_chain(lambda: self._key_chain.account_index.page(after, limit, pattern))
+
+    async def count_accounts(self, url=None, pattern=None):
+        if url:
+            account_index = await self._get_host_account_index(url)
+            return account_index.count(pattern)
+        return await self._run_key_chain(lambda: self._key_chain.account_index.count(pattern))
+
+    async def export_account_json(self, address, password, url=None):
+        if url:
+            raw_data = await self.request(url, 'parity_exportAccount', [address, password])
+            return json.dumps(raw_data)
+        key_item = await self._run_key_chain(self._key_chain.get_key, address)
+        if is_hd_account(key_item):
+            # an HD account is exported as a keystore of its derived key
+            raw_key = await self._get_local_key(address, password)
+            key_item = await self._run_crypto(encrypt_key, raw_key, password)
+        return json.dumps(key_item)
+
+    async def export_account_key(self, address, password, url=None):
+        if url:
+            key_json = await self.export_account_json(address, password, url)
+            return await self._run_crypto(decrypt_key, key_json, password)
+        return await self._get_local_key(address, password)
+
+    async def import_account_json(self, json_text, password, url=None):
+        if url:
+            await self.request(url, 'parity_newAccountFromWallet', [json_text, password])
+        else:
+            data = json.loads(json_text)
+            address = Web3.toChecksumAddress(data['address'])
+            await self._run_key_chain(self._save_key, address, data)
+
+    async def import_account_key(self, address, raw_key, password, url=None):
+        if url:
+            return await self.request(url, 'parity_newAccountFromSecret', [raw_key, password])
+        address = Web3.toChecksumAddress(address)
+        key_value = await self._run_crypto(encrypt_key, raw_key, password)
+        await self._run_key_chain(self._save_key, address, key_value)
+        return address
+
+    async def balance_ether(self, address, url):
+        balance = await self.request(url, 'eth_getBalance', [address, 'latest'])
+        return Web3.fromWei(int(balance, 16), 'ether')
+
+    async def balances_ether(self, addresses, url):
+        calls = [('eth_getBalance', [address, 'latest']) for address in addresses]
+        results = []
+        for address, response in zip(addresses, await self.batch_request(url, calls)):
+            if 'error' in response:
+                results.append(BatchResult(address, None, response['error'].get('message')))
+            else:
+                results.append(BatchResult(address, Web3.fromWei(int(response['result'], 16), 'ether'), None))
+        return results
+
+    async def send_ether(self, from_address, password, to_address, amount, url=None, timeout=120, is_local=False):
+        tx_hash = await self.submit_ether(from_address, password, to_address, amount, url, is_local)
+        try:
+            return await self.wait_for_receipt(tx_hash, url, timeout)
+        except asyncio.TimeoutError:
+            if is_local:
+                self._nonce_manager.resync(url, Web3.toChecksumAddress(from_address))
+            raise
+
+    async def submit_ether(self, from_address, password, to_address, amount, url=None, is_local=False):
+        from_address = Web3.toChecksumAddress(from_address)
+        to_address = Web3.toChecksumAddress(to_address)
+        if not is_local:
+            return await self.request(url, 'personal_sendTransaction', [{
+                'from': from_address,
+                'to': to_address,
+                'value': hex(Web3.toWei(amount, 'ether')),
+            }, password])
+
+        async def get_transaction_count(address):
+            return int(await self.request(url, 'eth_getTransactionCount', [address, 'pending']), 16)
+
+        raw_key = await self._get_local_key(from_address, password)
+        gas_price = int(await self.request(url, 'eth_gasPrice', []), 16)
+        transaction = {
+            'to': to_address,
+            'value': Web3.toWei(amount, 'ether'),
+            'gasPrice': gas_price,
+            'gas': 30000,
+            'nonce': await self._nonce_manager.next_nonce(url, from_address, get_transaction_count),
+        }
+        signed = EthAccount.signTransaction(transaction, raw_key)
+        try:
+            return await self.request(url, 'eth_sendRawTransaction', ['0x' + bytes(signed.rawTransaction).hex()])
+        except AsyncRPCError:
+            self._nonce_manager.resync(url, from_address)
+            raise
+
+    async def wait_for_receipt(self, tx_hash, url, timeout=120, poll_interval=DEFAULT_RECEIPT_POLL_INTERVAL):
+        expire_time = time.monotonic() + timeout
+        while True:
+            receipt = await self.request(url, 'eth_getTransactionReceipt', [tx_hash])
+            if receipt is not None:
+                return receipt
+            if time.monotonic() >= expire_time:
+                raise asyncio.TimeoutError(f'Transaction {tx_hash} is not in the chain after {timeout} seconds')
+            await asyncio.sleep(poll_interval)
+
+    async def get_ether(self, address, url):
+        data = {
+            'address': address,
+            'agent': 'server',
+        }
+        headers = {
+            'Accept': 'application/json',
+            'Content-Type': 'application/json'
+        }
+        session = self._get_session()
+        async with session.post(url, json=data, headers=headers) as response:
+            text = await response.text()
+            logger.debug(f'response {text} {response.status}')
+            if response.status != 200:
+                raise ValueError(f'{response.status} {text}')
+
+    async def request(self, url, method, params):
+        response = await self._post(url, {
+            'jsonrpc': '2.0',
+            'method': method,
+            'params': params,
+            'id': next(self._request_counter),
+        }, method)
+        if 'error' in response:
+            raise AsyncRPCError(response['error'])
+        return response['result']
+
+    async def batch_request(self, url, calls):
+        request_list = [
+            {'jsonrpc': '2.0', 'method': method, 'params': params, 'id': next(self._request_counter)}
+            for method, params in calls
+        ]
+        response_list = await self._post(url, request_list, 'batch')
+        metrics.add('rpc.batch_calls', len(calls))
+        if not isinstance(response_list, list):
+            raise AsyncRPCError(response_list.get('error', response_list))
+        responses = {response.get('id'): response for response in response_list}
+        missing = {'error': {'code': -32603, 'message': 'no response for the request'}}
+        return [responses.get(request['id'], missing) for request in request_list]
+
+    async def close(self):
+        if self._session:
+            await self._session.close()
+            self._session = None
+        self._crypto_pool.close()
+        if self._key_cache:
+            self._key_cache.clear()
+        if self._key_chain:
+            self._key_chain.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    async def _post(self, url, data, method):
+        session = self._get_session()
+        body = json.dumps(data).encode('utf-8')
+        with metrics.timer('rpc.request', method=method):
+            async with session.post(url, data=body, headers={'Content-Type': 'application/json'}) as response:
+                response.raise_for_status()
+                content = await response.read()
+        metrics.add('rpc.bytes_sent', len(body))
+        metrics.add('rpc.bytes_received', len(content))
+        return json.loads(content)
+
+    async def _get_local_key(self, address, password):
+        if self._key_cache:
+            raw_key = self._key_cache.get(address, password)
+            if raw_key:
+                return raw_key
+        key_item = await self._run_key_chain(self._key_chain.get_key, address)
+        if is_hd_account(key_item):
+            raw_key = await self._derive_hd_key(address, key_item, password)
+        else:
+            raw_key = await self._run_crypto(decrypt_key, json.dumps(key_item), password)
+        await self._run_key_chain(self._key_chain.mark_used, address)
+        if self._key_cache:
+            self._key_cache.unlock(address, raw_key, password)
+        return raw_key
+
+    async def _derive_hd_key(self, address, key_item, password):
+        seed_item = await self._run_key_chain(self._key_chain.get_key, hd_seed_key(key_item['hd_seed']))
+        if seed_item is None:
+            raise ValueError(f'Cannot find the HD seed "{key_item["hd_seed"]}" of account {address}')
+        seed = await self._run_crypto(decrypt_key, json.dumps(seed_item['hd_seed']), password)
+        return HDWallet(seed, seed_item['path']).derive_key(key_item['hd_index'])
+
+    async def _get_host_account_index(self, url):
+        return AccountIndex(await self.request(url, 'eth_accounts', []))
+
+    async def _run_crypto(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._crypto_pool.executor, func, *args)
+
+    async def _run_key_chain(self, func, *args):
+        # the key chain reads and saves can take the file lock and read or sync the whole
+        # file, so they run in a thread and not on the event loop
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, func, *args)
+
+    def _save_key(self, address, key_value):
+        self._key_chain.set_key(address, key_value)
+        self._key_chain.save()
+
+    def _delete_key(self, address):
+        self._key_chain.delete_key(address)
+        self._key_chain.save()
+
+    def _get_session(self):
+        if self._session is None:
+            aiohttp = import_aiohttp()
+            connector = aiohttp.TCPConnector(limit=self._pool_size, keepalive_timeout=self._keepalive_timeout)
+            timeout = aiohttp.ClientTimeout(total=self._request_timeout)
+            self._session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+        return self._session
+
+    @property
+    def key_chain(self):
+        return self._key_chain
@@ -0,0 +1,134 @@
+"""
+
+    Read the ether and ERC20 token balances of many addresses on one or more networks.
+
+"""
+import itertools
+
+from collections import (
+    deque,
+    namedtuple,
+)
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from wallet_manager import logger
+
+
+DEFAULT_BATCH_SIZE = 200
+DEFAULT_WORKERS = 4
+ETHER_DECIMALS = 18
+
+# ERC20 function selectors
+BALANCE_OF_SELECTOR = '0x70a08231'
+DECIMALS_SELECTOR = '0x313ce567'
+
+BalanceResult = namedtuple('BalanceResult', ['address', 'url', 'ether', 'tokens', 'error'])
+
+
+def to_units(value, decimals):
+    return Decimal(value) / (Decimal(10) ** decimals)
+
+
+def encode_balance_of(address):
+    hex_address = address[2:] if address.startswith('0x') else address
+    return BALANCE_OF_SELECTOR + hex_address.lower().rjust(64, '0')
+
+
+def decode_uint(value):
+    if not value or value == '0x':
+        raise ValueError('empty result, the address is not a token contract')
+    return int(value, 16)
+
+
+class BalanceScanner():
+    """
+    Read the balances of many addresses, with one JSON-RPC batch request of `batch_size`
+    addresses for each network. Each batch has an `eth_getBalance` call and an `eth_call`
+    of `balanceOf` for each token, for every address in the batch.
+
+    Up to `workers` batch requests run at the same time, over the keep-alive connections of
+    the connection pool. The addresses are read as they are needed, and the results are
+    returned in the same order, so a long address list is scanned in constant memory.
+    """
+
+    def __init__(self, connection_pool, batch_size=DEFAULT_BATCH_SIZE, workers=DEFAULT_WORKERS):
+        self._connection_pool = connection_pool
+        self._batch_size = max(1, batch_size)
+        self._workers = max(1, workers)
+        self._token_decimals = {}
+
+    def scan(self, addresses, urls, token_addresses=None):
+        """
+        Yield a BalanceResult for each address on each url. The `tokens` of each result
+        maps each token address to the token balance.
+        """
+        token_addresses = list(token_addresses or [])
+        for url in urls:
+            self._read_token_decimals(url, token_addresses)
+
+        address_iter = iter(addresses)
+        with ThreadPoolExecutor(max_workers=self._workers) as executor:
+            futures = deque()
+            while True:
+                chunk = list(itertools.islice(address_iter, self._batch_size))
+                if not chunk:
+                    break
+                for url in urls:
+                    futures.append(executor.submit(self._scan_chunk, chunk, url, token_addresses))
+                # only read ahead a few batches of addresses
+                while len(futures) >= self._workers * 2:
+                    yield from futures.popleft().result()
+            while futures:
+                yield from futures.popleft().result()
+
+    def _scan_chunk(self, addresses, url, token_addresses):
+        calls = []
+        for address in addresses:
+            calls.append(('eth_getBalance', [address, 'latest']))
+            for token_address in token_addresses:
+                calls.append(('eth_call', [{'to': token_address, 'data': encode_balance_of(address)}, 'latest']))
+        try:
+            responses = self._connection_pool.get_provider(url).make_batch_request(calls, len(calls))
+        except (ValueError, OSError) as e:
+            logger.warning(f'balance request to {url} failed: {e}')
+            return [BalanceResult(address, url, None, {}, str(e)) for address in addresses]
+
+        results = []
+        call_count = 1 + len(token_addresses)
+        for index, address in enumerate(addresses):
+            address_responses = responses[index * call_count:(index + 1) * call_count]
+            errors = []
+            ether = self._decode_response(address_responses[0], ETHER_DECIMALS, errors)
+            tokens = {}
+            for token_address, response in zip(token_addresses, address_responses[1:]):
+                decimals = self._token_decimals.get((url, token_address), 0)
+                tokens[token_address] = self._decode_response(response, decimals, errors)
+            results.append(BalanceResult(address, url, ether, tokens, '; '.join(errors) or None))
+        return results
+
+    def _decode_response(self, response, decimals, errors):
+        error = response.get('error')
+        if error:
+            errors.append(error.get('message', str(error)))
+            return None
+        try:
+            return to_units(decode_uint(response.get('result')), decimals)
+        except ValueError as e:
+            errors.append(str(e))
+            return None
+
+    def _read_token_decimals(self, url, token_addresses):
+        token_addresses = [token_address for token_address in token_addresses if (url, token_address) not in self._token_decimals]
+        if not token_addresses:
+            return
+        calls = [('eth_call', [{'to': token_address, 'data': DECIMALS_SELECTOR}, 'latest']) for token_address in token_addresses]
+        responses = self._connection_pool.get_provider(url).make_batch_request(calls)
+        for token_address, response in zip(token_addresses, responses):
+            try:
+                decimals = decode_uint(response.get('result'))
+            except ValueError:
+                # without decimals the balance is shown in the smallest unit of the token
+                logger.warning(f'unable to read the decimals of token {token_address} on {url}')
+                decimals = 0
+            self._token_decimals[(url, token_address)] = decimals
@@ -0,0 +1,106 @@
+"""
+
+    Run many commands through one WalletManager, read from a file or stdin.
+
+"""
+import json
+import shlex
+import threading
+
+from collections import (
+    deque,
+    namedtuple,
+)
+from concurrent.futures import ThreadPoolExecutor
+
+from wallet_manager.command_processor import (
+    CommandProcessor,
+    CommandProcessError,
+)
+
+
+BatchLineResult = namedtuple('BatchLineResult', ['line_number', 'commands', 'output', 'error'])
+
+
+def parse_batch_line(line):
+    """
+    Returns the list of commands of one batch line, or None for a blank or comment line.
+    A line can be a JSON list of commands, a JSON object with a 'commands' list, or the
+    commands as they would be typed on the command line.
+    """
+    text = line.strip()
+    if not text or text.startswith('#'):
+        return None
+    if text[0] in '[{':
+        try:
+            data = json.loads(text)
+        except ValueError:
+            raise CommandProcessError('Invalid JSON batch line')
+        if isinstance(data, dict):
+            data = data.get('commands')
+        if not isinstance(data, list) or not data:
+            raise CommandProcessError('A JSON batch line must be a list of commands')
+        return [str(value) for value in data]
+    try:
+        return shlex.split(text)
+    except ValueError as e:
+        raise CommandProcessError(f'Invalid batch line: {e}')
+
+
+class BatchRunner():
+    """
+    Run each line of a batch through a CommandProcessor that shares one WalletManager,
+    so the key chain, node connections and key cache are shared by every command.
+
+    With `jobs` more than 1, up to `jobs` lines are run at the same time, each thread with
+    its own CommandProcessor. The results are still returned in the order of the lines.
+    """
+
+    def __init__(self, wallet, jobs=1, networks=None):
+        self._wallet = wallet
+        self._networks = networks
+        self._jobs = max(1, jobs)
+        self._local = threading.local()
+
+    def run(self, lines):
+        if self._jobs == 1:
+            for line_number, line in enumerate(lines, 1):
+                result = self._run_line(line_number, line)
+                if result:
+                    yield result
+            return
+
+        with ThreadPoolExecutor(max_workers=self._jobs) as executor:
+            futures = deque()
+            for line_number, line in enumerate(lines, 1):
+                futures.append(executor.submit(self._run_line, line_number, line))
+                # only read ahead a few lines, so a large batch is not held in memory
+                while len(futures) >= self._jobs * 2:
+                    result = futures.popleft().result()
+                    if result:
+                        yield result
+            while futures:
+                result = futures.popleft().result()
+                if result:
+                    yield result
+
+    def _run_line(self, line_number, line):
+        commands = None
+        try:
+            commands = parse_batch_line(line)
+            if commands is None:
+                return None
+            processor = self._get_processor()
+            processor.process(commands)
+            return BatchLineResult(line_number, commands, list(processor.output), None)
+        except CommandProcessError as e:
+            return BatchLineResult(line_number, commands, [], str(e))
+        except Exception as e:
+            return BatchLineResult(line_number, commands, [], str(e) or e.__class__.__name__)
+
+    def _get_processor(self):
+        processor = getattr(self._local, 'processor', None)
+        if processor is None:
+            processor = CommandProcessor(wallet=self._wallet, networks=self._networks)
+            self._local.processor = processor
+        return processor
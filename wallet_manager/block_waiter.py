@@ -0,0 +1,61 @@
+import time
+
+from wallet_manager.metrics import metrics
+from wallet_manager import logger
+
+
+DEFAULT_TIMEOUT = 120
+DEFAULT_MIN_INTERVAL = 0.1
+DEFAULT_MAX_INTERVAL = 2.0
+DEFAULT_BACKOFF = 2.0
+
+
+class BlockWaiter():
+    """
+    Wait for a condition that can only change when a new block arrives, such as a balance.
+
+    The condition is checked once, then only again after the block number of the node
+    changes. The block number is polled with an exponential backoff from `min_interval`
+    up to `max_interval` seconds, so a quick chain is seen quickly and a slow chain is not
+    flooded with requests.
+    """
+
+    def __init__(self, web3, min_interval=DEFAULT_MIN_INTERVAL, max_interval=DEFAULT_MAX_INTERVAL,
+                 backoff=DEFAULT_BACKOFF):
+        self._web3 = web3
+        self._min_interval = min_interval
+        self._max_interval = max_interval
+        self._backoff = backoff
+
+    def wait_until(self, condition, timeout=DEFAULT_TIMEOUT):
+        """
+        Wait until `condition()` returns a true value and return it, or raise TimeoutError
+        after `timeout` seconds.
+        """
+        deadline = time.monotonic() + timeout
+        block_number = self._web3.eth.blockNumber
+        while True:
+            result = condition()
+            if result:
+                return result
+            try:
+                block_number = self.wait_for_block(block_number, deadline)
+            except TimeoutError:
+                raise TimeoutError(f'Condition is not met after {timeout} seconds')
+
+    def wait_for_block(self, block_number, deadline):
+        """
+        Wait for a block after `block_number`, returns the new block number.
+        """
+        interval = self._min_interval
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError(f'No new block after block {block_number}')
+            with metrics.timer('block_waiter.sleep'):
+                time.sleep(min(interval, remaining))
+            new_block_number = self._web3.eth.blockNumber
+            if new_block_number != block_number:
+                logger.debug(f'new block {new_block_number}')
+                return new_block_number
+            interval = min(interval * self._backoff, self._max_interval)
@@ -3,70 +3,57 @@ import re
 import os.path
 import json
 import secrets
-import time
 import logging
 import sys
 
-from web3 import (
-    Web3,
-    HTTPProvider
+from wallet_manager.address import is_address
+from wallet_manager.hd_wallet import DEFAULT_HD_NAME
+from wallet_manager.network_registry import (
+    DEFAULT_NETWORK_NAMES,
+    NetworkRegistry,
+)
+from wallet_manager.ocean_cache import ocean_cache as shared_ocean_cache
+from wallet_manager.output_sink import ListOutput
+from wallet_manager.payout import (
+    Payout,
+    read_recipients,
 )
-from eth_account import Account as EthAccount
-from starfish import Ocean
-from starfish.account import Account as OceanAccount
-
 from wallet_manager.wallet_manager import WalletManager
 from wallet_manager import logger
 
 DEFAULT_REQUEST_TOKEN_AMOUNT = 10
+DEFAULT_WAIT_TIMEOUT = 120
+
 
 class CommandProcessError(Exception):
     pass
 
 class CommandProcessor():
 
-    NETWORK_NAMES = {
-        'local': {
-            'description': 'No network, only access to local account setup',
-        },
-        'spree': {
-            'description': 'Spree network running on a local barge',
-            'url': 'http://localhost:8545',
-            'faucet_account' : ['0x068Ed00cF0441e4829D9784fCBe7b9e26D4BD8d0', 'secret'],
-        },
-        'nile': {
-            'description': 'Nile network access to remote network node',
-            'url': 'https://nile.dev-ocean.com',
-            'faucet_url' : 'https://faucet.nile.dev-ocean.com/faucet',
-        },
-        'pacific': {
-            'description': 'Pacific network access to remote network node',
-            'url': 'https://pacific.oceanprotocol.com',
-            'faucet_url' : 'https://faucet.oceanprotocol.com/faucet',
-        },
-        'duero': {
-            'description': 'Duero network access to remote network node',
-            'url': 'https://duero.dev-ocean.com',
-            'faucet_url' : 'https://faucet.duero.dev-ocean.com/faucet',
-        },
-        'host': {
-            'description': 'Local node running on barge',
-            'url': 'http://localhost:8545',
-        }
-    }
+    NETWORK_NAMES = DEFAULT_NETWORK_NAMES
 
-    def __init__(self, key_chain_filename=None):
+    def __init__(self, key_chain_filename=None, wallet=None, output=None, networks=None, ocean_cache=None):
         self._commands = None
-        self._output = []
-        self._wallet = WalletManager(key_chain_filename=key_chain_filename)
+        if ocean_cache is None:
+            ocean_cache = shared_ocean_cache
+        self._ocean_cache = ocean_cache
+        if networks is None:
+            networks = NetworkRegistry(self.NETWORK_NAMES)
+        self._networks = networks
+        # sink that each command writes to as it runs, else the output is kept in a list
+        self._output_sink = output
+        self._output = ListOutput()
+        if wallet is None:
+            wallet = WalletManager(key_chain_filename=key_chain_filename, lazy=True)
+        self._wallet = wallet
 
 
     def document_new(sef):
         return {
             'description': 'Create account local and host',
             'params' :[
-                'new <password> [local]',
-                'new <password> <network_name or url>',
+                'new <password> [local] [count] [hd]',
+                'new <password> <network_name or url> [count]',
             ],
         }
 
@@ -74,11 +61,30 @@ class CommandProcessor():
         address = ''
         password = self._validate_password(1)
         network_name = self._validate_network_name_url(2, 'local')
-        if network_name == 'local':
-            address = self._wallet.new_account(password)
-        else:
+        count = 1
+        if len(self._commands) > 3:
+            if not self._commands[3].isdigit():
+                raise CommandProcessError(f'Please provide a count of accounts before "hd", not "{self._commands[3]}"')
+            count = int(self._commands[3])
+        if count < 1:
+            raise CommandProcessError('Please provide a count of 1 or more accounts')
+        hd_name = None
+        if len(self._commands) > 4:
+            self._validate_sub_command(4, ['hd'])
+            if network_name != 'local':
+                raise CommandProcessError('HD accounts can only be made in the local key chain')
+            # derive the accounts from the HD seed in the key chain, with one KDF for all of them
+            hd_name = DEFAULT_HD_NAME
+        node_url = None
+        if network_name != 'local':
             node_url = self._validate_network_name_to_value(network_name)
-            address = self._wallet.new_account(password, node_url)
+        if count > 1 or hd_name:
+            # the local keys are saved to the key chain once
+            for result in self._wallet.new_accounts(count, password, node_url, hd_name):
+                text = result.address if result.error is None else f'error: {result.error}'
+                self._output.write_item(dict(result._asdict()), text)
+            return
+        address = self._wallet.new_account(password, node_url)
         self._add_output(address)
 
     def document_delete(self):
@@ -120,23 +126,61 @@ class CommandProcessor():
         pass
 
     def document_list(self):
+        return [
+            {
+                'description': 'List accounts on local and host',
+                'params': [
+                    'list [local]',
+                    'list <network_name or url>',
+                ],
+            },
+            {
+                'description': 'List accounts in address order that match a prefix or glob pattern, a page at a time',
+                'params': [
+                    'list <network_name or url> <pattern or *> [limit] [after_address]',
+                ],
+            },
+        ]
+
+    def command_list(self):
+        result = None
+        network_name = self._validate_network_name_url(1, 'local')
+        node_url = None
+        if network_name != 'local':
+            node_url = self._validate_network_name_to_value(network_name)
+        if len(self._commands) <= 2:
+            if node_url:
+                self._add_output(self._wallet.list_accounts(node_url))
+            else:
+                # written as they are read from the account index, the full list is never copied
+                self._add_output(self._wallet.iter_accounts())
+            return
+        pattern = self._validate_pattern(2)
+        limit = self._validate_amount(3, 0)
+        after = self._commands[4] if len(self._commands) > 4 else None
+        if limit:
+            page = self._wallet.list_accounts_page(node_url, after, limit, pattern)
+            self._add_output(page.addresses)
+            if page.cursor:
+                self._add_output(f'next page after {page.cursor}')
+        else:
+            self._add_output(self._wallet.iter_accounts(node_url, after, pattern))
+
+    def document_count(self):
         return {
-            'description': 'List accounts on local and host',
+            'description': 'Count the accounts on local and host, that match an optional prefix or glob pattern',
             'params': [
-                'list [local]',
-                'list <network_name or url>',
+                'count <network_name or url> [pattern]',
             ],
         }
 
-    def command_list(self):
-        result = None
+    def command_count(self):
         network_name = self._validate_network_name_url(1, 'local')
-        if network_name == 'local':
-            result = self._wallet.list_accounts()
-        else:
+        node_url = None
+        if network_name != 'local':
             node_url = self._validate_network_name_to_value(network_name)
-            result = self._wallet.list_accounts(node_url)
-        self._add_output(result)
+        pattern = self._validate_pattern(2)
+        self._add_output(str(self._wallet.count_accounts(node_url, pattern)))
 
     def document_export(self):
         return {
@@ -226,34 +270,25 @@ class CommandProcessor():
                 return
 
             logger.info(f'created temp account {request_address}')
-            ocean = Ocean(keeper_url=node_url)
-            account = OceanAccount(ocean, request_address, password)
-            chain_name = self._wallet.get_chain_name(node_url)
-            logger.debug(f'chain name is {chain_name}')
-            faucet_url = self._validate_network_name_to_value(chain_name, False, 'faucet_url')
+            account = self._get_ocean_account(node_url, request_address, password)
+            chain_info = self._get_chain_info(node_url)
+            logger.debug(f'chain name is {chain_info["chain_name"]}')
+            faucet_url = chain_info['faucet_url']
             logger.debug(f'requesting ether from faucet at {faucet_url}')
             self._wallet.get_ether(request_address, faucet_url)
 
             logger.debug('wating for ether to be available in register account')
-            while True:
-                account = OceanAccount(ocean, request_address, password)
-                if account.ether_balance > 0:
-                    break
-                time.sleep(1)
-            logger.debug(f'{request_address} ether tokens: {account.ether_balance}')
+            ether_balance = self._wait_for_balance(lambda: self._wallet.balance_ether(request_address, node_url), node_url)
+            logger.debug(f'{request_address} ether tokens: {ether_balance}')
 
             logger.debug('requesting ocean tokens')
             account.unlock(password)
             account.request_tokens(amount)
 
             logger.debug('waiting for ocean tokens to be available in request account')
-            while True:
-                account = OceanAccount(ocean, request_address, password)
-                if account.ocean_balance > 0:
-                    break
-                time.sleep(1)
+            ocean_balance = self._wait_for_balance(lambda: account.ocean_balance, node_url)
 
-            logger.debug(f'{request_address} ocean tokens: {account.ocean_balance}')
+            logger.debug(f'{request_address} ocean tokens: {ocean_balance}')
             logger.debug(f'{request_address} ether: {account.ether_balance}')
 
             node_status = self._wallet.get_chain_status(node_url)
@@ -262,12 +297,12 @@ class CommandProcessor():
                 return
 
             logger.debug(f'transfer {amount} from {request_address} to {address}')
-            time.sleep(2)
             account.unlock(password)
             account.transfer_token(address, amount)
             ether_amount = 0
-            if account.ether_balance > 0:
-                ether_amount = float(account.ether_balance) - 0.0000000001
+            ether_balance = account.ether_balance
+            if ether_balance > 0:
+                ether_amount = float(ether_balance) - 0.0000000001
                 account.transfer_ether(address, ether_amount)
 
             # delete the request account
@@ -276,20 +311,24 @@ class CommandProcessor():
 
         elif sub_command == 'ether':
             node_url = self._validate_network_name_to_value(network_name)
-            chain_name = self._wallet.get_chain_name(node_url)
-            logger.debug(f'chain name is {chain_name}')
-            faucet_url = self._validate_network_name_to_value(chain_name, False, 'faucet_url')
+            chain_info = self._get_chain_info(node_url)
+            logger.debug(f'chain name is {chain_info["chain_name"]}')
+            faucet_url = chain_info['faucet_url']
             if faucet_url:
+                start_balance = self._wallet.balance_ether(address, node_url)
                 self._wallet.get_ether(address, faucet_url)
-                ocean = Ocean(keeper_url=node_url)
-                account = OceanAccount(ocean, address)
-                self._add_output(f'{address}  ether : {account.ether_balance}')
+                ether_balance = self._wait_for_balance(
+                    lambda: self._wallet.balance_ether(address, node_url),
+                    node_url,
+                    start_balance
+                )
+                self._add_output(f'{address}  ether : {ether_balance}')
                 return
             faucet_account = self._validate_network_name_to_value(network_name, False, 'faucet_account')
             if faucet_account:
                 # if list then it's a address/password of an account that has ether
                 self._wallet.send_ether(faucet_account[0], faucet_account[1], address, amount, node_url)
-                self._add_output(f'{address}  ether : {account.ether_balance}')
+                self._add_output(f'{address}  ether : {self._wallet.balance_ether(address, node_url)}')
                 return
             raise CommandProcessError(f'Warning: The network name {network_name} does not have a faucet')
 
@@ -309,29 +348,79 @@ class CommandProcessor():
         network_name = self._validate_network_name_url(4)
         amount = self._validate_amount(5, DEFAULT_REQUEST_TOKEN_AMOUNT)
         node_url = self._validate_network_name_to_value(network_name)
-        ocean = Ocean(keeper_url=node_url)
-        account = OceanAccount(ocean, address)
+        account = self._get_ocean_account(node_url, address)
+        start_balance = account.ocean_balance
         account.unlock(password)
         account.request_tokens(amount)
-        self._add_output(f'{address}  ocean tokens: {account.ocean_balance}')
+        ocean_balance = self._wait_for_balance(lambda: account.ocean_balance, node_url, start_balance)
+        self._add_output(f'{address}  ocean tokens: {ocean_balance}')
 
 
     def document_balance(self):
-        return {
-            'description': 'Show the ether and Ocean token balance',
-            'params': [
-                'balance <address> <network_name or faucet url>',
-            ],
-        }
+        return [
+            {
+                'description': 'Show the ether and Ocean token balance',
+                'params': [
+                    'balance <address> <network_name or faucet url>',
+                ],
+            },
+            {
+                'description': 'Show the ether and ERC20 token balances of many addresses on one or more networks. '
+                'Addresses are a comma separated list, @ and a file with one address per line, or all local accounts',
+                'params': [
+                    'balance <address,address..., @filename or all> <network_name or url>[,<network_name or url>...] [token_address,...]',
+                ],
+            },
+        ]
+
     def command_balance(self):
+        if self._is_balance_scan():
+            self._command_balance_scan()
+            return
         address = self._validate_address(1)
         network_name = self._validate_network_name_url(2)
         node_url = self._validate_network_name_to_value(network_name)
-        ocean = Ocean(keeper_url=node_url)
-        account = OceanAccount(ocean, address)
+        account = self._get_ocean_account(node_url, address)
         self._add_output(f'{address} ocean tokens: {account.ocean_balance}')
         self._add_output(f'{address} ether: {account.ether_balance}')
 
+    def _is_balance_scan(self):
+        if len(self._commands) > 3:
+            return True
+        for index in (1, 2):
+            if index < len(self._commands) and ',' in self._commands[index]:
+                return True
+        return len(self._commands) > 1 and (self._commands[1] == 'all' or self._commands[1].startswith('@'))
+
+    def _command_balance_scan(self):
+        addresses = self._validate_address_source(1)
+        network_names = self._validate_network_name_url(2).split(',')
+        network_urls = {}
+        for network_name in network_names:
+            network_urls[self._validate_network_name_to_value(network_name)] = network_name
+        token_addresses = []
+        if len(self._commands) > 3:
+            token_addresses = self._commands[3].split(',')
+            for token_address in token_addresses:
+                if not is_address(token_address):
+                    raise CommandProcessError(f'"{token_address}" is not a vaild token address')
+
+        for result in self._wallet.scan_balances(addresses, list(network_urls.keys()), token_addresses):
+            network_name = network_urls[result.url]
+            item = {
+                'address': result.address,
+                'network': network_name,
+                'ether': result.ether,
+                'tokens': result.tokens,
+                'error': result.error,
+            }
+            text = f'{result.address} {network_name:10} ether: {result.ether}'
+            for token_address, balance in result.tokens.items():
+                text += f'  {token_address}: {balance}'
+            if result.error:
+                text += f'  error: {result.error}'
+            self._output.write_item(item, text)
+
     def document_send(self):
         return [
             {
@@ -345,31 +434,83 @@ class CommandProcessor():
                 'params': [
                     'send ether <from_address> <password> <network_name or url> <to_address> <amount>',
                 ],
-            }
+            },
+            {
+                'description': 'Pay ether or tokens from a local account to each address,amount line of a csv file. '
+                'Tokens are sent from the OceanToken contract of the network, or the --token contract address. '
+                'Run again with the same checkpoint file to carry on after a failure',
+                'params': [
+                    'send ether <from_address> <password> <network_name or url> --from-file <recipients.csv> [--checkpoint <filename>]',
+                    'send tokens <from_address> <password> <network_name or url> --from-file <recipients.csv> [--checkpoint <filename>] [--token <token_address>]',
+                ],
+            },
         ]
     def command_send(self):
+        recipients_filename = self._pop_option('--from-file')
+        checkpoint_filename = self._pop_option('--checkpoint')
+        token_address = self._pop_option('--token')
         sub_command = self._validate_sub_command(1, ['ether', 'tokens'])
 
         from_address = self._validate_address(2, field_name='from_address')
         password = self._validate_password(3)
         network_name = self._validate_network_name_url(4)
         node_url = self._validate_network_name_to_value(network_name)
+        if recipients_filename:
+            if sub_command == 'tokens' and token_address is None:
+                token_address = self._get_chain_info(node_url)['contracts'].get('OceanToken')
+                if token_address is None:
+                    raise CommandProcessError(f'Please provide the --token address, network "{network_name}" has no OceanToken contract')
+            self._send_payout(node_url, from_address, password, recipients_filename, checkpoint_filename, token_address)
+            return
+
         to_address = self._validate_address(5, field_name='to_address')
         amount = self._validate_amount(6)
 
         if sub_command == 'tokens':
-            ocean = Ocean(keeper_url=node_url)
-            account = OceanAccount(ocean, from_address)
+            account = self._get_ocean_account(node_url, from_address)
             account.unlock(password)
             account.transfer_token(to_address, amount)
         elif sub_command == 'ether':
             self._wallet.send_ether(from_address, password, to_address, amount, node_url)
 
+    def _send_payout(self, node_url, from_address, password, recipients_filename, checkpoint_filename, token_address):
+        if not os.path.exists(recipients_filename):
+            raise CommandProcessError(f'Cannot find the recipients file "{recipients_filename}"')
+        if token_address and not is_address(token_address):
+            raise CommandProcessError(f'"{token_address}" is not a vaild token address')
+        if checkpoint_filename is None:
+            checkpoint_filename = f'{recipients_filename}.checkpoint'
+        try:
+            # check every line of the file before any transaction is signed
+            recipients = list(read_recipients(recipients_filename))
+        except ValueError as e:
+            raise CommandProcessError(str(e))
+        payout = Payout(self._wallet, node_url, from_address, password, checkpoint_filename, token_address)
+        try:
+            for result in payout.run(recipients):
+                text = f'line {result.line_number} {result.status} {result.address} {result.amount} {result.tx_hash}'
+                if result.error:
+                    text += f' {result.error}'
+                self._output.write_item(dict(result._asdict()), text)
+        except ValueError as e:
+            raise CommandProcessError(str(e))
+        summary = payout.summary
+        text = (
+            f'payout done: {summary.mined} mined, {summary.reverted} reverted, {summary.failed} failed, '
+            f'{summary.timeout} timeout, {summary.skipped} already paid, '
+            f'{summary.seconds:.1f} seconds, {payout.tx_per_second:.2f} tx/s'
+        )
+        item = dict(summary._asdict())
+        item['tx_per_second'] = payout.tx_per_second
+        self._output.write_item(item, text)
+
     def command_test(self):
         print(self._commands)
 
     def process(self, commands):
         self._commands = commands
+        self._output = self._output_sink if self._output_sink is not None else ListOutput()
+        self._output.start(commands[0])
         method_name = f'command_{commands[0]}'
         if hasattr(self, method_name):
             method = getattr(self, method_name)
@@ -390,6 +531,17 @@ class CommandProcessor():
                     items += self._expand_document_item(app_name, values)
         return items
 
+    def _pop_option(self, name):
+        # remove an option and its value from the commands, returns None if not given
+        if name not in self._commands:
+            return None
+        index = self._commands.index(name)
+        if index + 1 >= len(self._commands):
+            raise CommandProcessError(f'Please provide a value for {name}')
+        value = self._commands[index + 1]
+        self._commands = self._commands[:index] + self._commands[index + 2:]
+        return value
+
     def _validate_password(self, index,):
         password = None
         if index < len(self._commands):
@@ -411,13 +563,43 @@ class CommandProcessor():
             field_name = 'address'
         if index < len(self._commands):
             address = self._commands[index]
-            if Web3.isAddress(address):
+            if is_address(address):
                 return address
             else:
                 raise CommandProcessError(f'"{address}" is not a vaild account {field_name}')
         else:
             raise CommandProcessError(f'Please provide an address name')
 
+    def _validate_address_source(self, index):
+        if index >= len(self._commands):
+            raise CommandProcessError(f'Please provide an address list, @filename or all')
+        value = self._commands[index]
+        if value == 'all':
+            return self._wallet.iter_accounts()
+        if value.startswith('@'):
+            filename = value[1:]
+            if not os.path.exists(filename):
+                raise CommandProcessError(f'Cannot find the address file "{filename}"')
+            return self._read_address_file(filename)
+        addresses = [address for address in value.split(',') if address]
+        for address in addresses:
+            if not is_address(address):
+                raise CommandProcessError(f'"{address}" is not a vaild account address')
+        return addresses
+
+    def _read_address_file(self, filename):
+        # one address per line, or the first column of a csv file
+        with open(filename, 'r') as fp:
+            for line_number, line in enumerate(fp, 1):
+                address = line.split(',', 1)[0].strip()
+                if not address or address.startswith('#'):
+                    continue
+                if is_address(address):
+                    yield address
+                elif line_number > 1:
+                    # the first line can be a csv header
+                    logger.warning(f'{filename}:{line_number} "{address}" is not a valid address')
+
     def _validate_json_text(self, index):
         if index < len(self._commands):
             json_text = self._commands[index]
@@ -434,13 +616,9 @@ class CommandProcessor():
             raise CommandProcessError(f'Please provide json text or filename')
 
     def _validate_network_name_to_value(self, network_name, validate=True, name=None):
-        value = None
         if name is None:
             name = 'url'
-        if network_name.lower() in self.NETWORK_NAMES:
-            value = self.NETWORK_NAMES[network_name.lower()][name]
-        if re.match('^http', network_name) or re.match('^/w+\.', network_name):
-            value = network_name
+        value = self._networks.get_value(network_name, name)
         if value is None and validate:
             raise CommandProcessError(f'Cannot resolve network name "{network_name}" to a value')
         return value
@@ -455,6 +633,14 @@ class CommandProcessor():
         else:
             raise CommandProcessError(f'Please provide one of the following commands "{command_list_text}"')
 
+    def _validate_pattern(self, index):
+        pattern = None
+        if index < len(self._commands):
+            pattern = self._commands[index]
+        if pattern == '*':
+            return None
+        return pattern
+
     def _validate_amount(self, index, default_value=None):
         amount = default_value
         if index < len(self._commands):
@@ -464,6 +650,26 @@ class CommandProcessor():
             raise CommandProcessError(f'Please provide an amount')
         return amount
 
+    def _get_ocean_account(self, node_url, address, password=None):
+        return self._ocean_cache.get_account(node_url, address, password)
+
+    def _get_chain_info(self, node_url):
+        # the chain name, faucet url and contracts of a node are cached by the network registry
+        return self._networks.get_chain_info(node_url, self._wallet.get_chain_info)
+
+    def _wait_for_balance(self, get_balance, node_url, minimum_balance=0, timeout=DEFAULT_WAIT_TIMEOUT):
+        # re-check the balance on each new block, until it is more than the minimum balance
+        def check_balance():
+            balance = get_balance()
+            if balance > minimum_balance:
+                return balance
+            return None
+
+        try:
+            return self._wallet.wait_until(check_balance, node_url, timeout)
+        except TimeoutError:
+            raise CommandProcessError(f'Timeout: the balance is still {get_balance()} after {timeout} seconds')
+
     def _expand_document_item(self, app_name, value):
         items = []
         items.append(f'\n{value["description"]}')
@@ -473,11 +679,20 @@ class CommandProcessor():
 
     def _add_output(self, text):
         if isinstance(text, str):
-            self._output.append(text)
+            self._output.write(text)
         else:
+            # write each value as it is read, so a generator is never held in memory
             for value in text:
-                self._output.append(value)
+                self._output.write(value)
 
     @property
     def output(self):
-        return self._output
+        return self._output.lines
+
+    @property
+    def networks(self):
+        return self._networks
+
+    @property
+    def output_sink(self):
+        return self._output_sink
@@ -0,0 +1,183 @@
+import json
+import threading
+import time
+import requests
+
+from requests.adapters import HTTPAdapter
+from web3 import (
+    Web3,
+    HTTPProvider,
+)
+
+from wallet_manager.metrics import metrics
+from wallet_manager import logger
+
+
+DEFAULT_POOL_SIZE = 10
+DEFAULT_IDLE_TIMEOUT = 300
+DEFAULT_REQUEST_TIMEOUT = 10
+DEFAULT_BATCH_SIZE = 500
+
+
+class PooledHTTPProvider(HTTPProvider):
+    """
+    HTTPProvider that posts every request through a given `requests.Session`, so the
+    keep-alive connections of the session are reused between calls.
+    """
+
+    def __init__(self, endpoint_uri, session, request_kwargs=None):
+        HTTPProvider.__init__(self, endpoint_uri, request_kwargs)
+        self._session = session
+
+    def make_request(self, method, params):
+        self.logger.debug('Making request HTTP. URI: %s, Method: %s', self.endpoint_uri, method)
+        request_data = self.encode_rpc_request(method, params)
+        with metrics.timer('rpc.request', method=method):
+            response = self.decode_rpc_response(self.post(request_data))
+        self.logger.debug('Getting response HTTP. URI: %s, Method: %s, Response: %s', self.endpoint_uri, method, response)
+        return response
+
+    def make_batch_request(self, calls, batch_size=DEFAULT_BATCH_SIZE):
+        """
+        Send a list of (method, params) calls as JSON-RPC batch requests of up to `batch_size`
+        calls each. Returns the list of JSON-RPC responses, in the same order as the calls.
+        """
+        responses = []
+        for start in range(0, len(calls), batch_size):
+            responses += self._make_batch_request(calls[start:start + batch_size])
+        return responses
+
+    def _make_batch_request(self, calls):
+        self.logger.debug('Making batch request HTTP. URI: %s, Calls: %d', self.endpoint_uri, len(calls))
+        request_list = []
+        for method, params in calls:
+            request_list.append({
+                'jsonrpc': '2.0',
+                'method': method,
+                'params': params or [],
+                'id': next(self.request_counter),
+            })
+        with metrics.timer('rpc.request', method='batch'):
+            response_list = self.decode_rpc_response(self.post(json.dumps(request_list).encode('utf-8')))
+        metrics.add('rpc.batch_calls', len(calls))
+        if not isinstance(response_list, list):
+            # the node could not handle the batch at all
+            error = response_list.get('error', response_list)
+            raise ValueError(f'batch request failed: {error}')
+        responses = {response.get('id'): response for response in response_list}
+        missing = {'error': {'code': -32603, 'message': 'no response for the request'}}
+        return [responses.get(request['id'], missing) for request in request_list]
+
+    def post(self, data):
+        kwargs = self.get_request_kwargs()
+        kwargs.setdefault('timeout', DEFAULT_REQUEST_TIMEOUT)
+        response = self._session.post(self.endpoint_uri, data=data, **kwargs)
+        response.raise_for_status()
+        metrics.add('rpc.bytes_sent', len(data))
+        metrics.add('rpc.bytes_received', len(response.content))
+        return response.content
+
+    @property
+    def session(self):
+        return self._session
+
+
+class Connection():
+
+    def __init__(self, url, pool_size, request_kwargs=None):
+        self._url = url
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self._session.mount('http://', adapter)
+        self._session.mount('https://', adapter)
+        self._provider = None
+        self._web3 = None
+        self._request_kwargs = request_kwargs
+        self.last_used = time.monotonic()
+
+    @property
+    def session(self):
+        return self._session
+
+    @property
+    def provider(self):
+        if self._provider is None:
+            self._provider = PooledHTTPProvider(self._url, self._session, self._request_kwargs)
+        return self._provider
+
+    @property
+    def web3(self):
+        if self._web3 is None:
+            self._web3 = Web3(self.provider)
+        return self._web3
+
+    def close(self):
+        self._session.close()
+
+
+class ConnectionPool():
+    """
+    Cache of one HTTP session, provider and Web3 object per node url.
+
+    Each session keeps up to `pool_size` keep-alive connections to its node.
+    Connections not used for `idle_timeout` seconds are closed and removed.
+    """
+
+    def __init__(self, pool_size=DEFAULT_POOL_SIZE, idle_timeout=DEFAULT_IDLE_TIMEOUT, request_kwargs=None):
+        self._pool_size = pool_size
+        self._idle_timeout = idle_timeout
+        self._request_kwargs = request_kwargs
+        self._connections = {}
+        self._lock = threading.Lock()
+
+    def get_web3(self, url):
+        return self.get_connection(url).web3
+
+    def get_provider(self, url):
+        return self.get_connection(url).provider
+
+    def get_session(self, url):
+        return self.get_connection(url).session
+
+    def get_connection(self, url):
+        with self._lock:
+            self._evict_idle()
+            connection = self._connections.get(url)
+            if connection is None:
+                logger.debug(f'open connection pool to {url}')
+                connection = Connection(url, self._pool_size, self._request_kwargs)
+                self._connections[url] = connection
+            connection.last_used = time.monotonic()
+            return connection
+
+    def evict_idle(self):
+        with self._lock:
+            self._evict_idle()
+
+    def close(self, url=None):
+        with self._lock:
+            urls = list(self._connections.keys()) if url is None else [url]
+            for item in urls:
+                connection = self._connections.pop(item, None)
+                if connection:
+                    connection.close()
+
+    def _evict_idle(self):
+        if self._idle_timeout is None:
+            return
+        expire_time = time.monotonic() - self._idle_timeout
+        for url, connection in list(self._connections.items()):
+            if connection.last_used < expire_time:
+                logger.debug(f'close idle connection pool to {url}')
+                del self._connections[url]
+                connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @property
+    def urls(self):
+        return list(self._connections.keys())
@@ -0,0 +1,85 @@
+import os
+import threading
+
+from concurrent.futures import ProcessPoolExecutor
+
+from wallet_manager.metrics import metrics
+
+
+def decrypt_key(key_json, password):
+    from eth_account import Account as EthAccount
+    return bytes(EthAccount.decrypt(key_json, password))
+
+
+def encrypt_key(raw_key, password):
+    from eth_account import Account as EthAccount
+    return EthAccount.encrypt(raw_key, password)
+
+
+def reencrypt_key(key_json, old_password, new_password):
+    from eth_account import Account as EthAccount
+    return EthAccount.encrypt(EthAccount.decrypt(key_json, old_password), new_password)
+
+
+class CryptoPool():
+    """
+    Process pool to run the keystore KDF for many keys at once, one key per worker process.
+
+    The worker processes are only started when more than one key is processed at a time.
+    """
+
+    def __init__(self, workers=None):
+        self._workers = workers or os.cpu_count() or 1
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def decrypt(self, key_json_list, passwords):
+        return self.map(decrypt_key, key_json_list, passwords)
+
+    def encrypt(self, raw_key_list, passwords):
+        return self.map(encrypt_key, raw_key_list, passwords)
+
+    def reencrypt(self, key_json_list, old_passwords, new_passwords):
+        return self.map(reencrypt_key, key_json_list, old_passwords, new_passwords)
+
+    def map(self, func, *args):
+        """
+        Call `func` for each set of args, returns a list of (result, error) in the same order.
+        """
+        items = list(zip(*args))
+        metrics.add('crypto.keys', len(items), func=func.__name__)
+        with metrics.timer('crypto.map', func=func.__name__):
+            if len(items) < 2 or self._workers < 2:
+                return [self._call(func, item) for item in items]
+            executor = self.executor
+            futures = [executor.submit(func, *item) for item in items]
+            results = []
+            for future in futures:
+                try:
+                    results.append((future.result(), None))
+                except ValueError as e:
+                    results.append((None, str(e)))
+            return results
+
+    def close(self):
+        with self._lock:
+            if self._executor:
+                self._executor.shutdown()
+                self._executor = None
+
+    def _call(self, func, item):
+        try:
+            return (func(*item), None)
+        except ValueError as e:
+            return (None, str(e))
+
+    @property
+    def executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self._workers)
+            return self._executor
+
+    @property
+    def workers(self):
+        return self._workers
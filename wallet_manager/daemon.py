@@ -0,0 +1,169 @@
+"""
+
+    Daemon to keep a CommandProcessor loaded, with its key chain and node connections,
+    and run commands sent to it over a unix domain socket.
+
+    Each request and response is one line of JSON.
+
+"""
+import json
+import os
+import os.path
+import socket
+import socketserver
+import tempfile
+
+from wallet_manager.storage import absolute_storage_uri
+from wallet_manager import logger
+
+
+DEFAULT_SOCKET_FILENAME = os.path.join(tempfile.gettempdir(), f'wallet_manager-{os.getuid()}.sock')
+
+ERROR_TYPE_COMMAND = 'command'
+ERROR_TYPE_EXCEPTION = 'exception'
+ERROR_TYPE_KEY_CHAIN = 'key_chain'
+
+# options followed by a file name
+FILE_OPTIONS = ('--from-file', '--checkpoint')
+
+
+class DaemonError(Exception):
+    pass
+
+
+def resolve_file_arguments(commands, cwd):
+    """
+    Returns the commands with the relative file names of `@file` address lists, file options and
+    an imported key file joined to the folder `cwd` of the client.
+    """
+    resolved = []
+    for index, value in enumerate(commands):
+        if value.startswith('@'):
+            value = '@' + os.path.join(cwd, value[1:])
+        elif index > 0 and commands[index - 1] in FILE_OPTIONS:
+            value = os.path.join(cwd, value)
+        elif index == 1 and commands[0] == 'import' and os.path.isfile(os.path.join(cwd, value)):
+            value = os.path.join(cwd, value)
+        resolved.append(value)
+    return resolved
+
+
+class DaemonRequestHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        for line in self.rfile:
+            try:
+                request = json.loads(line.decode('utf-8'))
+            except ValueError:
+                self._send({'error': 'invalid request', 'error_type': ERROR_TYPE_EXCEPTION})
+                continue
+            self._send(self.server.daemon.process_request(request))
+
+    def _send(self, response):
+        self.wfile.write(json.dumps(response).encode('utf-8') + b'\n')
+        self.wfile.flush()
+
+
+class DaemonServer(socketserver.UnixStreamServer):
+    # commands are run one at a time by the single command processor
+    allow_reuse_address = True
+
+
+class CommandDaemon():
+    """
+    Run `processor.process` for each request sent to the socket.
+
+    Requests are only run when they are for the same key chain file that the daemon has loaded,
+    else the client needs to run the command itself. The file names in the commands of a request
+    are found from the folder of its client.
+    """
+
+    def __init__(self, processor, key_chain_filename, socket_filename=DEFAULT_SOCKET_FILENAME):
+        # avoid a circular import, the command processor is only needed to match the error type
+        from wallet_manager.command_processor import CommandProcessError
+        self._command_process_error = CommandProcessError
+        self._processor = processor
+        self._key_chain_filename = absolute_storage_uri(key_chain_filename)
+        self._socket_filename = socket_filename
+        self._server = None
+
+    def process_request(self, request):
+        if absolute_storage_uri(request.get('key_chain', '')) != self._key_chain_filename:
+            return {'error': f'daemon is using the key chain {self._key_chain_filename}', 'error_type': ERROR_TYPE_KEY_CHAIN}
+        commands = request.get('commands')
+        if not isinstance(commands, list) or not commands:
+            return {'error': 'no commands to process', 'error_type': ERROR_TYPE_COMMAND}
+        logger.debug(f'daemon process {commands[0]}')
+        commands = [str(command) for command in commands]
+        if request.get('cwd'):
+            commands = resolve_file_arguments(commands, request['cwd'])
+        try:
+            self._processor.process(commands)
+        except self._command_process_error as e:
+            return {'error': str(e), 'error_type': ERROR_TYPE_COMMAND}
+        except Exception as e:
+            logger.debug('daemon command failed', exc_info=True)
+            return {'error': str(e), 'error_type': ERROR_TYPE_EXCEPTION}
+        return {'output': self._processor.output}
+
+    def serve_forever(self):
+        if os.path.exists(self._socket_filename):
+            if is_daemon_running(self._socket_filename):
+                raise DaemonError(f'A daemon is already running on {self._socket_filename}')
+            # left behind by a daemon that did not shut down cleanly
+            os.remove(self._socket_filename)
+        old_umask = os.umask(0o077)
+        try:
+            self._server = DaemonServer(self._socket_filename, DaemonRequestHandler)
+        finally:
+            os.umask(old_umask)
+        self._server.daemon = self
+        logger.info(f'wallet manager daemon listening on {self._socket_filename}')
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+            if os.path.exists(self._socket_filename):
+                os.remove(self._socket_filename)
+
+    def shutdown(self):
+        if self._server:
+            self._server.shutdown()
+
+
+class DaemonClient():
+
+    def __init__(self, socket_filename=DEFAULT_SOCKET_FILENAME, timeout=None):
+        self._socket_filename = socket_filename
+        self._timeout = timeout
+
+    def process(self, commands, key_chain_filename):
+        """
+        Send the commands to the daemon, returns the daemon response dict with an 'output' list
+        or an 'error' and 'error_type'.
+        """
+        request = {
+            'commands': commands,
+            'key_chain': absolute_storage_uri(key_chain_filename),
+            'cwd': os.getcwd(),
+        }
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+            client.settimeout(self._timeout)
+            client.connect(self._socket_filename)
+            client.sendall(json.dumps(request).encode('utf-8') + b'\n')
+            with client.makefile('rb') as fp:
+                line = fp.readline()
+        if not line:
+            raise DaemonError('daemon closed the connection')
+        return json.loads(line.decode('utf-8'))
+
+
+def is_daemon_running(socket_filename=DEFAULT_SOCKET_FILENAME):
+    if not os.path.exists(socket_filename):
+        return False
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        try:
+            client.connect(socket_filename)
+        except OSError:
+            return False
+    return True
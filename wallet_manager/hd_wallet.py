@@ -0,0 +1,128 @@
+"""
+
+    BIP32 hierarchical deterministic derivation of account keys from one seed.
+
+"""
+import hashlib
+import hmac
+import secrets
+
+
+HD_SEED_PREFIX = 'hd:'
+DEFAULT_HD_NAME = 'default'
+# BIP44 path of the external ethereum accounts, the account index is added to the end
+BIP44_ETHEREUM_PATH = "m/44'/60'/0'/0"
+HD_SEED_SIZE = 32
+
+HARDENED_OFFSET = 0x80000000
+# order of the secp256k1 curve
+CURVE_ORDER = 0xFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFEBAAEDCE6AF48A03BBFD25E8CD0364141
+
+
+def hd_seed_key(name):
+    return HD_SEED_PREFIX + name
+
+
+def is_hd_seed_key(address):
+    return address.startswith(HD_SEED_PREFIX)
+
+
+def is_hd_account(key_item):
+    return isinstance(key_item, dict) and 'hd_index' in key_item
+
+
+def parse_path(path):
+    """
+    Returns the list of child indexes of a path such as "m/44'/60'/0'/0".
+    """
+    items = path.split('/')
+    if items[0] != 'm':
+        raise ValueError(f'HD path "{path}" must start with "m"')
+    indexes = []
+    for item in items[1:]:
+        is_hardened = item.endswith("'") or item.endswith('h') or item.endswith('H')
+        text = item[:-1] if is_hardened else item
+        if not text.isdigit() or int(text) >= HARDENED_OFFSET:
+            raise ValueError(f'Invalid index "{item}" in the HD path "{path}"')
+        indexes.append(int(text) + (HARDENED_OFFSET if is_hardened else 0))
+    return indexes
+
+
+def public_key_compressed(raw_key):
+    from eth_keys import keys
+    public_key = keys.PrivateKey(raw_key).public_key.to_bytes()
+    return bytes([2 + (public_key[-1] & 1)]) + public_key[:32]
+
+
+def derive_master(seed):
+    """
+    Returns the (key, chain_code) of the master node of a seed.
+    """
+    data = hmac.new(b'Bitcoin seed', seed, hashlib.sha512).digest()
+    key_value = int.from_bytes(data[:32], 'big')
+    if key_value == 0 or key_value >= CURVE_ORDER:
+        raise ValueError('The HD seed does not make a valid master key')
+    return data[:32], data[32:]
+
+
+def derive_child(raw_key, chain_code, index, public_key=None):
+    """
+    Returns the (key, chain_code) of a child node. For a normal child `public_key` is the
+    compressed public key of the parent, if it is already known.
+    """
+    if index >= HARDENED_OFFSET:
+        data = b'\x00' + raw_key + index.to_bytes(4, 'big')
+    else:
+        data = (public_key or public_key_compressed(raw_key)) + index.to_bytes(4, 'big')
+    digest = hmac.new(chain_code, data, hashlib.sha512).digest()
+    offset = int.from_bytes(digest[:32], 'big')
+    key_value = (offset + int.from_bytes(raw_key, 'big')) % CURVE_ORDER
+    if offset >= CURVE_ORDER or key_value == 0:
+        # less than 1 in 2**127, BIP32 moves on to the next index
+        raise ValueError(f'The HD index {index} does not make a valid key')
+    return key_value.to_bytes(32, 'big'), digest[32:]
+
+
+def derive_path(seed, path):
+    raw_key, chain_code = derive_master(seed)
+    for index in parse_path(path):
+        raw_key, chain_code = derive_child(raw_key, chain_code, index)
+    return raw_key, chain_code
+
+
+def make_hd_seed():
+    while True:
+        seed = secrets.token_bytes(HD_SEED_SIZE)
+        # the seed is saved as a keystore, so it must also be a valid private key
+        if 0 < int.from_bytes(seed, 'big') < CURVE_ORDER:
+            return seed
+
+
+class HDWallet():
+    """
+    Derive the account keys of a seed by their index under `path`.
+
+    The node of `path` is derived once, so each account only costs one HMAC and
+    the public key multiplication for its address.
+    """
+
+    def __init__(self, seed, path=BIP44_ETHEREUM_PATH):
+        self._path = path
+        self._raw_key, self._chain_code = derive_path(seed, path)
+        self._public_key = public_key_compressed(self._raw_key)
+
+    def derive_key(self, index):
+        raw_key, _ = derive_child(self._raw_key, self._chain_code, index, self._public_key)
+        return raw_key
+
+    def derive_account(self, index):
+        """
+        Returns the (address, raw_key) of the account at `index`.
+        """
+        from eth_keys import keys
+        raw_key = self.derive_key(index)
+        return keys.PrivateKey(raw_key).public_key.to_checksum_address(), raw_key
+
+    @property
+    def path(self):
+        return self._path
@@ -0,0 +1,92 @@
+import hashlib
+import hmac
+import secrets
+import threading
+import time
+
+from collections import OrderedDict
+
+
+DEFAULT_DURATION = 300
+DEFAULT_MAX_SIZE = 128
+
+
+def zero_bytes(data):
+    data[:] = bytes(len(data))
+
+
+class UnlockedKeyCache():
+    """
+    Cache of decrypted private keys by address, so that signing with a local account
+    does not need to run the keystore KDF each time.
+
+    Each key is held for `duration` seconds after it is unlocked, and at most `max_size`
+    keys are held, dropping the least recently used key first. A key is only returned
+    for the same password that unlocked it. The cached key bytes are zeroed when the key
+    is locked, expires or is evicted. Copies of the key returned by `get` are not.
+    """
+
+    def __init__(self, duration=DEFAULT_DURATION, max_size=DEFAULT_MAX_SIZE):
+        self._duration = duration
+        self._max_size = max_size
+        self._salt = secrets.token_bytes(16)
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def unlock(self, address, raw_key, password, duration=None):
+        if duration is None:
+            duration = self._duration
+        expire_time = time.monotonic() + duration
+        with self._lock:
+            self._remove(address)
+            self._items[address] = (bytearray(raw_key), self._password_digest(password), expire_time)
+            while len(self._items) > self._max_size:
+                self._remove(next(iter(self._items)))
+
+    def get(self, address, password):
+        with self._lock:
+            item = self._items.get(address)
+            if item is None:
+                return None
+            raw_key, password_digest, expire_time = item
+            if expire_time <= time.monotonic():
+                self._remove(address)
+                return None
+            if not hmac.compare_digest(password_digest, self._password_digest(password)):
+                return None
+            self._items.move_to_end(address)
+            return bytes(raw_key)
+
+    def lock(self, address):
+        with self._lock:
+            return self._remove(address)
+
+    def clear(self):
+        with self._lock:
+            for address in list(self._items.keys()):
+                self._remove(address)
+
+    def remove_expired(self):
+        now = time.monotonic()
+        with self._lock:
+            for address, item in list(self._items.items()):
+                if item[2] <= now:
+                    self._remove(address)
+
+    def is_unlocked(self, address):
+        with self._lock:
+            item = self._items.get(address)
+            return item is not None and item[2] > time.monotonic()
+
+    def _remove(self, address):
+        item = self._items.pop(address, None)
+        if item is None:
+            return False
+        zero_bytes(item[0])
+        return True
+
+    def _password_digest(self, password):
+        return hmac.new(self._salt, password.encode('utf-8'), hashlib.sha256).digest()
+
+    def __len__(self):
+        return len(self._items)
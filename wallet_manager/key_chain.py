@@ -1,34 +1,216 @@
-import os.path
-import json
+import contextlib
+import threading
+
+from wallet_manager.account_index import AccountIndex
+from wallet_manager.hd_wallet import is_hd_seed_key
+from wallet_manager.metrics import metrics
+from wallet_manager.storage import open_storage
 
 
 class KeyChain():
-    def __init__(self, filename):
+    """
+    Keys of the local accounts. Many processes can share one key chain file: each save
+    is merged with the changes saved by the other processes, and the reads see the
+    saved changes of the other processes, unless `auto_refresh` is False.
+    """
+    def __init__(self, filename, storage_type=None, lazy=False, auto_refresh=True, **kwargs):
         self._filename = filename
-        self._key_list = {}
+        self._auto_refresh = auto_refresh
+        self._storage = open_storage(filename, storage_type, lazy=lazy, **kwargs)
+        # the key chain can be shared by threads, e.g. in a batch run
+        self._lock = threading.RLock()
+        # sorted address index, only built when the accounts are listed a page at a time
+        self._account_index = None
+        # saves called inside a batch are deferred to the end of the batch
+        self._batch_depth = 0
+        self._is_save_needed = False
         self.load()
 
     def load(self):
-        if os.path.exists(self._filename):
-            with open(self._filename, 'r') as fp:
-                self._key_list = json.load(fp)
+        with self._lock, metrics.timer('key_chain.load'):
+            self._storage.load()
+            self._account_index = None
 
     def save(self):
-        with open(self._filename, 'w') as fp:
-            json.dump(self._key_list, fp)
+        with self._lock:
+            if self._batch_depth:
+                self._is_save_needed = True
+                return
+            self._save()
+
+    @contextlib.contextmanager
+    def batch(self):
+        """
+        Save the changes made in the block once, at the end of the block. A batch inside a
+        batch is part of the outer batch. If the block raises an error, the changes not yet
+        saved are thrown away and the keys are read again from the file.
+        Other threads wait for the key chain until the batch is done.
+        """
+        with self._lock:
+            self._batch_depth += 1
+            try:
+                yield self
+            except BaseException:
+                self._batch_depth -= 1
+                if self._batch_depth == 0:
+                    self.rollback()
+                raise
+            self._batch_depth -= 1
+            if self._batch_depth == 0 and self._is_save_needed:
+                self._save()
+
+    def rollback(self):
+        """
+        Throw away the changes not yet saved.
+        """
+        with self._lock:
+            self._is_save_needed = False
+            self.load()
+
+    def refresh(self):
+        """
+        Read the key chain file again if another process has saved it since.
+        """
+        with self._lock:
+            if self._storage.refresh():
+                metrics.add('key_chain.refresh')
+                self._account_index = None
+
+    def compact(self):
+        with self._lock:
+            if hasattr(self._storage, 'compact'):
+                self._storage.compact()
+            else:
+                self._storage.save()
+
+    def migrate(self, filename, storage_type=None):
+        """
+        Copy all of the keys from another key chain file into this key chain, e.g. to move
+        an original JSON key chain to the log format. Returns the number of keys copied.
+        """
+        source = open_storage(filename, storage_type)
+        source.load()
+        count = 0
+        with self._lock:
+            for address in source.addresses():
+                self._storage.set(address, source.get(address))
+                count += 1
+            source.close()
+            self._storage.save()
+            self._account_index = None
+        return count
+
+    def close(self):
+        """
+        Close the storage, e.g. the database connection of a sqlite key chain.
+        """
+        with self._lock:
+            self._storage.close()
 
     def get_key(self, address):
-        return self._key_list.get(address, None)
+        with self._lock:
+            self._refresh()
+            return self._storage.get(address)
 
     def set_key(self, address, key_item):
-        self._key_list[address] = key_item
+        with self._lock:
+            self._storage.set(address, key_item)
+            if self._account_index is not None and not is_hd_seed_key(address):
+                self._account_index.add(address)
+
+    def update_key(self, address, update):
+        """
+        Set the key item of `address` to `update(key_item)` and save it straight away, under the
+        file lock, so that no other process can change the item in between. Returns the new item.
+        Any other changes not yet saved are saved with it, even inside a batch.
+        """
+        with self._lock, self._storage.lock():
+            self.refresh()
+            key_item = update(self._storage.get(address))
+            self.set_key(address, key_item)
+            self._save()
+            return key_item
 
     def delete_key(self, address):
-        del self._key_list[address]
+        with self._lock:
+            self._storage.delete(address)
+            if self._account_index is not None:
+                self._account_index.remove(address)
 
     def is_key(self, address):
-        return address in self._key_list
-        
+        with self._lock:
+            self._refresh()
+            return self._storage.contains(address)
+
+    def mark_used(self, address):
+        with self._lock:
+            self._storage.mark_used(address)
+
+    def set_label(self, address, label):
+        """
+        Set the label of an account, saved with the next save. Labels and tags are only
+        kept by a sqlite key chain.
+        """
+        with self._lock:
+            self._storage.set_label(address, label)
+
+    def add_tags(self, address, tags):
+        with self._lock:
+            self._storage.add_tags(address, tags)
+
+    def remove_tags(self, address, tags):
+        with self._lock:
+            self._storage.remove_tags(address, tags)
+
+    def get_info(self, address):
+        """
+        Returns a dict of the label, tags, created_time and last_used_time of an account.
+        """
+        with self._lock:
+            return self._storage.get_info(address)
+
+    def find_addresses(self, tag=None, label=None):
+        with self._lock:
+            return self._storage.find_addresses(tag, label)
+
     @property
     def address_list(self):
-        return list(self._key_list.keys())
+        with self._lock:
+            self._refresh()
+            return list(self._account_addresses())
+
+    @property
+    def account_index(self):
+        with self._lock:
+            if hasattr(self._storage, 'account_index'):
+                # the database answers the page and count queries itself
+                return self._storage.account_index
+            self._refresh()
+            if self._account_index is None:
+                self._account_index = AccountIndex(self._account_addresses())
+            return self._account_index
+
+    def _account_addresses(self):
+        # the HD seeds are kept in the key chain with the accounts
+        return (address for address in self._storage.addresses() if not is_hd_seed_key(address))
+
+    def _save(self):
+        with metrics.timer('key_chain.save'):
+            self._is_save_needed = False
+            is_changed = self._storage.is_changed()
+            self._storage.save()
+            if is_changed:
+                # the save has read in the keys of other processes
+                self._account_index = None
+
+    def _refresh(self):
+        if self._auto_refresh:
+            self.refresh()
+
+    @property
+    def filename(self):
+        return self._filename
+
+    @property
+    def storage(self):
+        return self._storage
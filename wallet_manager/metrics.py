@@ -0,0 +1,241 @@
+"""
+
+    Counters, latency histograms and byte counts of the wallet manager calls.
+
+"""
+import functools
+import inspect
+import json
+import threading
+import time
+
+from bisect import bisect_left
+
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+METRIC_PREFIX = 'wallet_manager'
+
+
+def label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def prometheus_name(name, suffix):
+    return f'{METRIC_PREFIX}_{name.replace(".", "_")}_{suffix}'
+
+
+def format_labels(key):
+    if not key:
+        return ''
+    values = ','.join(f'{name}="{value}"' for name, value in key)
+    return '{' + values + '}'
+
+
+class Histogram():
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def as_dict(self):
+        return {
+            'count': self.count,
+            'total': self.total,
+            'mean': self.total / self.count if self.count else 0.0,
+            'max': self.max,
+            'buckets': dict(zip([str(bucket) for bucket in self.buckets] + ['+Inf'], self.counts)),
+        }
+
+
+class Timer():
+
+    def __init__(self, metrics, name, labels):
+        self._metrics = metrics
+        self._name = name
+        self._labels = labels
+        self._start_time = None
+
+    def __enter__(self):
+        self._start_time = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._metrics.observe(self._name, time.perf_counter() - self._start_time, **self._labels)
+        if exc_type is not None:
+            self._metrics.add(f'{self._name}_errors', **self._labels)
+
+
+class NullTimer():
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        pass
+
+
+NULL_TIMER = NullTimer()
+
+
+class Metrics():
+    """
+    Thread safe store of counters and latency histograms, each with optional labels.
+
+    Nothing is recorded until `enable` is called, so the instrumented calls only cost
+    a flag check when the metrics are not used.
+    """
+
+    def __init__(self, enabled=False, buckets=DEFAULT_BUCKETS):
+        self._enabled = enabled
+        self._buckets = buckets
+        self._counters = {}
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def enable(self):
+        self._enabled = True
+
+    def disable(self):
+        self._enabled = False
+
+    def reset(self):
+        with self._lock:
+            self._counters = {}
+            self._histograms = {}
+
+    def add(self, name, value=1, **labels):
+        if not self._enabled:
+            return
+        key = (name, label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, seconds, **labels):
+        if not self._enabled:
+            return
+        key = (name, label_key(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = Histogram(self._buckets)
+                self._histograms[key] = histogram
+            histogram.observe(seconds)
+
+    def timer(self, name, **labels):
+        """
+        Context manager that records the time of the block in the `name` histogram, and
+        counts `<name>_errors` if the block raises an exception.
+        """
+        if not self._enabled:
+            return NULL_TIMER
+        return Timer(self, name, labels)
+
+    def as_dict(self):
+        with self._lock:
+            return {
+                'counters': [
+                    {'name': name, 'labels': dict(key), 'value': value}
+                    for (name, key), value in sorted(self._counters.items())
+                ],
+                'histograms': [
+                    dict({'name': name, 'labels': dict(key)}, **histogram.as_dict())
+                    for (name, key), histogram in sorted(self._histograms.items())
+                ],
+            }
+
+    def export_json(self):
+        return json.dumps(self.as_dict(), indent=2)
+
+    def export_prometheus(self):
+        """
+        Returns the metrics in the Prometheus text format.
+        """
+        lines = []
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(self._histograms.items())
+        type_names = set()
+        for (name, key), value in counters:
+            metric_name = prometheus_name(name, 'total')
+            if metric_name not in type_names:
+                type_names.add(metric_name)
+                lines.append(f'# TYPE {metric_name} counter')
+            lines.append(f'{metric_name}{format_labels(key)} {value}')
+        for (name, key), histogram in histograms:
+            metric_name = prometheus_name(name, 'seconds')
+            if metric_name not in type_names:
+                type_names.add(metric_name)
+                lines.append(f'# TYPE {metric_name} histogram')
+            count = 0
+            for bucket, bucket_count in zip(list(histogram.buckets) + ['+Inf'], histogram.counts):
+                count += bucket_count
+                bucket_key = key + (('le', bucket),)
+                lines.append(f'{metric_name}_bucket{format_labels(bucket_key)} {count}')
+            lines.append(f'{metric_name}_sum{format_labels(key)} {histogram.total}')
+            lines.append(f'{metric_name}_count{format_labels(key)} {histogram.count}')
+        return '\n'.join(lines) + '\n'
+
+    def format_report(self):
+        """
+        Returns a text table of the timed calls, with the most total time first, and the counters.
+        """
+        lines = [f'{"call":50} {"count":>8} {"total ms":>12} {"mean ms":>10} {"max ms":>10}']
+        with self._lock:
+            histograms = sorted(self._histograms.items(), key=lambda item: -item[1].total)
+            counters = sorted(self._counters.items())
+        for (name, key), histogram in histograms:
+            label = name + format_labels(key)
+            lines.append(
+                f'{label:50} {histogram.count:8} {histogram.total * 1000:12.3f} '
+                f'{histogram.total * 1000 / histogram.count:10.3f} {histogram.max * 1000:10.3f}'
+            )
+        if counters:
+            lines.append('')
+            lines.append(f'{"counter":50} {"value":>12}')
+            for (name, key), value in counters:
+                lines.append(f'{name + format_labels(key):50} {value:12}')
+        return '\n'.join(lines)
+
+    @property
+    def is_enabled(self):
+        return self._enabled
+
+
+# shared by the wallet manager classes of the process
+metrics = Metrics()
+
+
+def timed(name):
+    """
+    Decorator to time each call of a function in the `name` histogram of the shared metrics.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with metrics.timer(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def instrument(prefix):
+    """
+    Class decorator to time every public method, in a histogram named `<prefix>.<method name>`.
+    For methods that return a generator only the creation of the generator is timed.
+    """
+    def decorator(cls):
+        for name, value in list(vars(cls).items()):
+            if name.startswith('_') or not inspect.isfunction(value):
+                continue
+            setattr(cls, name, timed(f'{prefix}.{name}')(value))
+        return cls
+    return decorator
@@ -0,0 +1,178 @@
+"""
+
+    Network names, and a cache of the chain details of each node url.
+
+"""
+import copy
+import json
+import os
+import os.path
+import re
+import threading
+import time
+
+from wallet_manager.storage.base import atomic_write
+from wallet_manager import logger
+
+
+DEFAULT_CACHE_TTL = 24 * 60 * 60
+CACHE_VERSION = 2
+
+URL_PATTERN = re.compile('^http')
+HOST_PATTERN = re.compile(r'^\w+\.')
+
+DEFAULT_NETWORK_NAMES = {
+    'local': {
+        'description': 'No network, only access to local account setup',
+    },
+    'spree': {
+        'description': 'Spree network running on a local barge',
+        'url': 'http://localhost:8545',
+        'faucet_account' : ['0x068Ed00cF0441e4829D9784fCBe7b9e26D4BD8d0', 'secret'],
+    },
+    'nile': {
+        'description': 'Nile network access to remote network node',
+        'url': 'https://nile.dev-ocean.com',
+        'faucet_url' : 'https://faucet.nile.dev-ocean.com/faucet',
+    },
+    'pacific': {
+        'description': 'Pacific network access to remote network node',
+        'url': 'https://pacific.oceanprotocol.com',
+        'faucet_url' : 'https://faucet.oceanprotocol.com/faucet',
+    },
+    'duero': {
+        'description': 'Duero network access to remote network node',
+        'url': 'https://duero.dev-ocean.com',
+        'faucet_url' : 'https://faucet.duero.dev-ocean.com/faucet',
+    },
+    'host': {
+        'description': 'Local node running on barge',
+        'url': 'http://localhost:8545',
+    }
+}
+
+
+class NetworkRegistry():
+    """
+    Resolve network names to urls, faucets and contract addresses, from the default networks
+    and any networks added from a JSON config file.
+
+    The chain name and id of each node url is read once and cached for `ttl` seconds.
+    If `cache_filename` is given the cache is saved to disk, so the next run does not need
+    to ask the node again.
+    """
+
+    def __init__(self, networks=None, config_filename=None, cache_filename=None, ttl=DEFAULT_CACHE_TTL):
+        if networks is None:
+            networks = DEFAULT_NETWORK_NAMES
+        self._networks = copy.deepcopy(networks)
+        self._cache_filename = cache_filename
+        self._ttl = ttl
+        self._cache = {}
+        self._lock = threading.RLock()
+        if config_filename:
+            self.load_config(config_filename)
+        if cache_filename:
+            self.load_cache()
+
+    def load_config(self, filename):
+        """
+        Add or update networks from a JSON file, as an object of network names, or an object
+        with a 'networks' item. Each network can have a 'url', 'faucet_url', 'faucet_account'
+        and 'contracts' object of contract name to address.
+        """
+        with open(filename, 'r') as fp:
+            try:
+                data = json.load(fp)
+            except ValueError as e:
+                raise ValueError(f'Invalid network config file {filename}: {e}')
+        if isinstance(data, dict) and isinstance(data.get('networks'), dict):
+            data = data['networks']
+        if not isinstance(data, dict):
+            raise ValueError(f'Network config file {filename} must be a JSON object of networks')
+        with self._lock:
+            for name, item in data.items():
+                if not isinstance(item, dict):
+                    raise ValueError(f'Network "{name}" in {filename} must be a JSON object')
+                network = self._networks.setdefault(name.lower(), {'description': name})
+                network.update(item)
+
+    def get_value(self, network_name, name='url'):
+        value = None
+        network = self._networks.get(network_name.lower())
+        if network:
+            value = network.get(name)
+        if URL_PATTERN.match(network_name) or HOST_PATTERN.match(network_name):
+            value = network_name
+        return value
+
+    def get_chain_info(self, url, read_chain_info):
+        """
+        Returns the cached chain details of the node at `url`, else calls `read_chain_info(url)`
+        for a dict with the 'chain_name' and 'chain_id', and caches it. The faucet url and
+        contracts of the chain are added from the current network config, they are not cached.
+        """
+        with self._lock:
+            info = self._cache.get(url)
+        if not info or self._is_expired(info):
+            chain_info = read_chain_info(url)
+            info = {
+                'chain_name': chain_info.get('chain_name'),
+                'chain_id': chain_info.get('chain_id'),
+                'time': time.time(),
+            }
+            with self._lock:
+                self._cache[url] = info
+                self.save_cache()
+        network = self._networks.get((info['chain_name'] or '').lower(), {})
+        return dict(info, faucet_url=network.get('faucet_url'), contracts=network.get('contracts', {}))
+
+    def clear_cache(self, url=None):
+        with self._lock:
+            if url is None:
+                self._cache = {}
+            else:
+                self._cache.pop(url, None)
+            self.save_cache()
+
+    def load_cache(self):
+        if not os.path.exists(self._cache_filename):
+            return
+        try:
+            with open(self._cache_filename, 'r') as fp:
+                data = json.load(fp)
+        except (OSError, ValueError) as e:
+            # the cache can always be read again from the nodes
+            logger.warning(f'unable to read the network cache {self._cache_filename}: {e}')
+            return
+        if data.get('version') != CACHE_VERSION:
+            return
+        with self._lock:
+            for url, info in data.get('urls', {}).items():
+                if not self._is_expired(info):
+                    self._cache[url] = info
+
+    def save_cache(self):
+        if not self._cache_filename:
+            return
+        data = {
+            'version': CACHE_VERSION,
+            'urls': self._cache,
+        }
+        try:
+            folder = os.path.dirname(self._cache_filename)
+            if folder:
+                os.makedirs(folder, exist_ok=True)
+            atomic_write(self._cache_filename, lambda fp: json.dump(data, fp))
+        except OSError as e:
+            logger.warning(f'unable to save the network cache {self._cache_filename}: {e}')
+
+    def items(self):
+        return self._networks.items()
+
+    def _is_expired(self, info):
+        return time.time() - info.get('time', 0) > self._ttl
+
+    @property
+    def names(self):
+        return list(self._networks.keys())
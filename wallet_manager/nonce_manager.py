@@ -0,0 +1,45 @@
+import threading
+
+from wallet_manager import logger
+
+
+class NonceManager():
+    """
+    Hands out transaction nonces for each (node url, address), so that many signed
+    transactions can be sent without waiting for the previous transaction to be mined.
+
+    The first nonce is read from the pending transaction count of the node, after that
+    nonces are counted locally. Call `resync` after a transaction is rejected or dropped
+    to read the count from the node again.
+    """
+
+    def __init__(self):
+        self._nonces = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def next_nonce(self, url, address, web3):
+        key = (url, address)
+        with self._get_lock(key):
+            nonce = self._nonces.get(key)
+            if nonce is None:
+                nonce = web3.eth.getTransactionCount(address, 'pending')
+                logger.debug(f'nonce for {address} at {url} starts at {nonce}')
+            self._nonces[key] = nonce + 1
+            return nonce
+
+    def resync(self, url, address):
+        key = (url, address)
+        with self._get_lock(key):
+            self._nonces.pop(key, None)
+
+    def reset(self):
+        with self._lock:
+            self._nonces = {}
+
+    def _get_lock(self, key):
+        with self._lock:
+            if key not in self._locks:
+                self._locks[key] = threading.Lock()
+            return self._locks[key]
+
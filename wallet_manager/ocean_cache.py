@@ -0,0 +1,65 @@
+"""
+
+    Process wide cache of starfish Ocean objects, one for each node url.
+
+"""
+import threading
+
+from wallet_manager.metrics import metrics
+from wallet_manager import logger
+
+
+class OceanCache():
+    """
+    Create the Ocean object of a node url once, the first time it is used, and return the
+    same object after that. Creating an Ocean object asks the node for its network and
+    finds the contract artifacts of that network, which only needs to be done once.
+
+    Each url has its own lock, so threads waiting on a new node do not block other urls.
+    """
+
+    def __init__(self):
+        self._items = {}
+        self._url_locks = {}
+        self._lock = threading.Lock()
+
+    def get_ocean(self, url):
+        ocean = self._items.get(url)
+        if ocean is not None:
+            return ocean
+        with self._lock:
+            url_lock = self._url_locks.setdefault(url, threading.Lock())
+        with url_lock:
+            ocean = self._items.get(url)
+            if ocean is None:
+                # starfish is only imported by the commands that use the Ocean network
+                with metrics.timer('import', module='starfish'):
+                    from starfish import Ocean
+                logger.debug(f'connect ocean to {url}')
+                ocean = Ocean(keeper_url=url)
+                self._items[url] = ocean
+            return ocean
+
+    def get_account(self, url, address, password=None):
+        from starfish.account import Account as OceanAccount
+        return OceanAccount(self.get_ocean(url), address, password)
+
+    def remove(self, url):
+        with self._lock:
+            self._items.pop(url, None)
+            self._url_locks.pop(url, None)
+
+    def clear(self):
+        with self._lock:
+            self._items = {}
+            self._url_locks = {}
+
+    def __contains__(self, url):
+        return url in self._items
+
+    def __len__(self):
+        return len(self._items)
+
+
+# shared by every CommandProcessor in the process, so batch and daemon runs reuse the objects
+ocean_cache = OceanCache()
@@ -0,0 +1,110 @@
+"""
+
+    Output sinks for the CommandProcessor.
+
+    Each output value is passed to the sink as soon as a command produces it, so a long
+    listing can be written out while it is read, without holding all of it in memory.
+
+"""
+import json
+import sys
+
+
+class OutputSink():
+
+    def start(self, command):
+        # called before each command is processed
+        pass
+
+    def write(self, value):
+        raise NotImplementedError('Output sink must implement this method')
+
+    def write_item(self, item, text=None):
+        """
+        Write a dict of values, such as a row of a table. Text sinks write `text` if given, else the values.
+        """
+        if text is None:
+            text = ' '.join(str(value) for value in item.values())
+        self.write(text)
+
+    def write_error(self, message, text=None):
+        # errors go to the same sink as the output, so a jsonl reader sees them in order
+        self.write_item({'error': message}, message if text is None else text)
+
+    def flush(self):
+        pass
+
+    @property
+    def lines(self):
+        # only the list output keeps the values that have been written
+        return []
+
+
+class ListOutput(OutputSink):
+    """
+    Keep all of the output values in a list, used when no other sink is given.
+    """
+
+    def __init__(self):
+        self._lines = []
+
+    def write(self, value):
+        self._lines.append(value)
+
+    @property
+    def lines(self):
+        return self._lines
+
+
+class StreamOutput(OutputSink):
+    """
+    Write each output value as a line of text to a stream, by default stdout.
+    """
+
+    def __init__(self, stream=None):
+        self._stream = stream
+
+    def write(self, value):
+        self.stream.write(f'{value}\n')
+
+    def flush(self):
+        self.stream.flush()
+
+    @property
+    def stream(self):
+        # resolve stdout on use, so a replaced sys.stdout is used
+        return self._stream or sys.stdout
+
+
+class JSONLinesOutput(StreamOutput):
+    """
+    Write each output value as one line of JSON, with the name of the command that produced it.
+    """
+
+    def __init__(self, stream=None):
+        StreamOutput.__init__(self, stream)
+        self._command = None
+
+    def start(self, command):
+        self._command = command
+
+    def write(self, value):
+        self.write_item({'command': self._command, 'output': value})
+
+    def write_item(self, item, text=None):
+        self.stream.write(json.dumps(item, default=str) + '\n')
+
+    def write_error(self, message, text=None):
+        self.write_item({'command': self._command, 'error': message})
+
+
+class CallbackOutput(OutputSink):
+    """
+    Call `callback(value)` for each output value.
+    """
+
+    def __init__(self, callback):
+        self._callback = callback
+
+    def write(self, value):
+        self._callback(value)
@@ -0,0 +1,378 @@
+"""
+
+    Pay ether or tokens from one local account to many recipients.
+
+"""
+import json
+import os
+import os.path
+import queue
+import threading
+import time
+
+from collections import namedtuple
+from concurrent.futures import CancelledError
+from decimal import (
+    Decimal,
+    InvalidOperation,
+)
+
+from wallet_manager.address import is_address
+from wallet_manager.balance_scanner import (
+    DECIMALS_SELECTOR,
+    decode_uint,
+)
+from wallet_manager import logger
+
+
+DEFAULT_SUBMIT_BATCH_SIZE = 50
+DEFAULT_MAX_PENDING = 500
+DEFAULT_RECEIPT_TIMEOUT = 600
+ETHER_GAS = 30000
+TOKEN_GAS = 100000
+
+# ERC20 transfer(address,uint256)
+TRANSFER_SELECTOR = '0xa9059cbb'
+
+STATUS_SIGNED = 'signed'
+STATUS_MINED = 'mined'
+STATUS_REVERTED = 'reverted'
+STATUS_FAILED = 'failed'
+STATUS_TIMEOUT = 'timeout'
+DONE_STATUS_LIST = (STATUS_MINED, STATUS_REVERTED)
+
+# errors of a transaction sent again, that mean the node already has it or has mined it
+SENT_ERROR_MESSAGES = ('already known', 'known transaction', 'already imported', 'nonce too low')
+
+Recipient = namedtuple('Recipient', ['line_number', 'address', 'amount'])
+PayoutResult = namedtuple('PayoutResult', ['line_number', 'address', 'amount', 'tx_hash', 'status', 'error'])
+PayoutSummary = namedtuple('PayoutSummary', ['submitted', 'mined', 'reverted', 'failed', 'timeout', 'skipped', 'seconds'])
+
+
+def read_recipients(filename):
+    """
+    Yield a Recipient for each line of a csv file of `address,amount`. The first line can be
+    a header, empty lines and lines starting with '#' are skipped.
+    """
+    with open(filename, 'r') as fp:
+        for line_number, line in enumerate(fp, 1):
+            text = line.strip()
+            if not text or text.startswith('#'):
+                continue
+            values = [value.strip() for value in text.split(',')]
+            try:
+                if len(values) < 2:
+                    raise InvalidOperation()
+                amount = Decimal(values[1])
+            except InvalidOperation:
+                if line_number == 1:
+                    continue
+                raise ValueError(f'{filename}:{line_number} must be an address and an amount')
+            if amount <= 0:
+                raise ValueError(f'{filename}:{line_number} amount must be more than zero')
+            if not is_address(values[0]):
+                raise ValueError(f'{filename}:{line_number} "{values[0]}" is not a valid address')
+            yield Recipient(line_number, values[0], amount)
+
+
+def is_sent_error(message):
+    message = message.lower()
+    return any(text in message for text in SENT_ERROR_MESSAGES)
+
+
+def encode_transfer(to_address, value):
+    hex_address = to_address[2:] if to_address.startswith('0x') else to_address
+    return TRANSFER_SELECTOR + hex_address.lower().rjust(64, '0') + f'{value:064x}'
+
+
+class PayoutCheckpoint():
+    """
+    Append-only JSON lines file with the state of each recipient line of a payout.
+
+    A transaction is written as 'signed', with its hash and raw transaction, before it is sent,
+    so after a crash the same transaction is sent again and never one with a new nonce.
+    """
+
+    def __init__(self, filename):
+        self._filename = filename
+        self._records = {}
+        self._lock = threading.Lock()
+        self._fp = None
+        self.load()
+
+    def load(self):
+        if not os.path.exists(self._filename):
+            return
+        with open(self._filename, 'r') as fp:
+            for line in fp:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # the last line can be torn by a crash
+                    logger.warning(f'skip invalid line in checkpoint {self._filename}')
+                    continue
+                self._records[record['line']] = record
+
+    def get(self, line_number):
+        return self._records.get(line_number)
+
+    def get_signed(self):
+        return [record for _, record in sorted(self._records.items()) if record['status'] == STATUS_SIGNED]
+
+    def write(self, records):
+        with self._lock:
+            if self._fp is None:
+                self._fp = open(self._filename, 'a')
+            for record in records:
+                self._records[record['line']] = record
+                self._fp.write(json.dumps(record) + '\n')
+            self._fp.flush()
+            os.fsync(self._fp.fileno())
+
+    def close(self):
+        with self._lock:
+            if self._fp:
+                self._fp.close()
+                self._fp = None
+
+    @property
+    def filename(self):
+        return self._filename
+
+
+class Payout():
+    """
+    Send ether, or tokens of an ERC20 contract, from one local account to many recipients.
+
+    The account key is decrypted once. Each transaction is signed locally with the next nonce
+    of the NonceManager, and sent with `submit_batch_size` transactions in each JSON-RPC batch
+    request, without waiting for the previous ones to be mined. Up to `max_pending`
+    transactions are waited for at a time, by the receipt tracker of the node.
+
+    If a transaction is rejected the payout stops, as the later nonces can not be mined.
+    Run it again with the same checkpoint file to carry on.
+    """
+
+    def __init__(self, wallet, url, from_address, password, checkpoint_filename=None,
+                 token_address=None, submit_batch_size=DEFAULT_SUBMIT_BATCH_SIZE,
+                 max_pending=DEFAULT_MAX_PENDING, receipt_timeout=DEFAULT_RECEIPT_TIMEOUT):
+        self._wallet = wallet
+        self._url = url
+        self._from_address = from_address
+        self._password = password
+        self._checkpoint = PayoutCheckpoint(checkpoint_filename) if checkpoint_filename else None
+        self._token_address = token_address
+        self._submit_batch_size = max(1, submit_batch_size)
+        self._max_pending = max(1, max_pending)
+        self._receipt_timeout = receipt_timeout
+        self._results = queue.Queue()
+        self._pending_count = 0
+        self._counts = {}
+        self._seconds = 0
+
+    def run(self, recipients):
+        """
+        Pay each Recipient, and yield a PayoutResult as each transaction is mined or fails.
+        Recipients already paid in the checkpoint file are skipped.
+        """
+        from web3 import Web3
+        self._from_address = Web3.toChecksumAddress(self._from_address)
+        self._counts = {}
+        start_time = time.monotonic()
+        web3 = self._wallet.connection_pool.get_web3(self._url)
+        provider = self._wallet.connection_pool.get_provider(self._url)
+        raw_key = self._wallet.export_account_key(self._from_address, self._password)
+        gas_price = web3.eth.gasPrice
+        decimals = self._read_token_decimals(provider)
+
+        batch = []
+        try:
+            # a transaction signed before a crash may not have been sent, so it is sent again
+            # before any new nonce is taken
+            signed_records = self._checkpoint.get_signed() if self._checkpoint else []
+            signed_lines = {record['line'] for record in signed_records}
+            is_stopped = not self._resend_signed(provider, signed_records)
+            for recipient in recipients:
+                if is_stopped:
+                    break
+                record = self._checkpoint.get(recipient.line_number) if self._checkpoint else None
+                if record:
+                    self._validate_record(record, recipient)
+                    if recipient.line_number in signed_lines:
+                        # sent again above, and waited for
+                        continue
+                    if record['status'] in DONE_STATUS_LIST:
+                        self._count('skipped')
+                        continue
+                batch.append(recipient)
+                if len(batch) >= self._submit_batch_size:
+                    is_stopped = not self._submit(web3, provider, batch, raw_key, gas_price, decimals)
+                    batch = []
+                    yield from self._read_results(self._max_pending)
+            if batch and not is_stopped:
+                self._submit(web3, provider, batch, raw_key, gas_price, decimals)
+            yield from self._read_results(0)
+        finally:
+            if self._checkpoint:
+                self._checkpoint.close()
+            self._seconds = time.monotonic() - start_time
+
+    def _submit(self, web3, provider, recipients, raw_key, gas_price, decimals):
+        # returns False if a transaction was rejected by the node
+        from web3 import Web3
+        # convert all of the addresses before any nonce is taken
+        to_addresses = [Web3.toChecksumAddress(recipient.address) for recipient in recipients]
+        transactions = []
+        for recipient, to_address in zip(recipients, to_addresses):
+            transaction = {
+                'to': to_address,
+                'value': Web3.toWei(recipient.amount, 'ether'),
+                'gasPrice': gas_price,
+                'gas': ETHER_GAS,
+                'nonce': self._wallet.nonce_manager.next_nonce(self._url, self._from_address, web3),
+            }
+            if self._token_address:
+                value = int(recipient.amount * (Decimal(10) ** decimals))
+                transaction.update({
+                    'to': Web3.toChecksumAddress(self._token_address),
+                    'value': 0,
+                    'gas': TOKEN_GAS,
+                    'data': encode_transfer(to_address, value),
+                })
+            signed = web3.eth.account.signTransaction(transaction, raw_key)
+            transactions.append((recipient, '0x' + bytes(signed.hash).hex(), '0x' + bytes(signed.rawTransaction).hex()))
+
+        if self._checkpoint:
+            self._checkpoint.write([
+                self._make_record(recipient, tx_hash, STATUS_SIGNED, raw_transaction=raw_transaction)
+                for recipient, tx_hash, raw_transaction in transactions
+            ])
+        return self._send(provider, transactions)
+
+    def _resend_signed(self, provider, records):
+        # returns False if a transaction was rejected by the node
+        transactions = []
+        for record in records:
+            recipient = Recipient(record['line'], record['address'], Decimal(record['amount']))
+            if record.get('raw_transaction'):
+                transactions.append((recipient, record['tx_hash'], record['raw_transaction']))
+            else:
+                # written by an older version, only wait for its receipt
+                self._track(recipient, record['tx_hash'])
+        is_ok = True
+        for start in range(0, len(transactions), self._submit_batch_size):
+            is_ok = self._send(provider, transactions[start:start + self._submit_batch_size], is_resend=True)
+            if not is_ok:
+                break
+        if transactions:
+            # the next nonce is read again from the node, after the transactions sent again
+            self._wallet.nonce_manager.resync(self._url, self._from_address)
+        return is_ok
+
+    def _send(self, provider, transactions, is_resend=False):
+        # returns False if a transaction was rejected by the node
+        calls = [('eth_sendRawTransaction', [raw_transaction]) for _, _, raw_transaction in transactions]
+        try:
+            responses = provider.make_batch_request(calls, len(calls))
+        except (ValueError, OSError) as e:
+            responses = [{'error': {'message': str(e)}}] * len(calls)
+
+        is_ok = True
+        failed_records = []
+        for (recipient, tx_hash, _), response in zip(transactions, responses):
+            error = response.get('error')
+            message = None if error is None else error.get('message', str(error))
+            if error is None or (is_resend and is_sent_error(message)):
+                self._count('submitted')
+                self._track(recipient, tx_hash)
+                continue
+            logger.warning(f'payout to {recipient.address} rejected: {message}')
+            failed_records.append(self._make_record(recipient, tx_hash, STATUS_FAILED, message))
+            self._count(STATUS_FAILED)
+            self._results.put(PayoutResult(recipient.line_number, recipient.address, recipient.amount, tx_hash, STATUS_FAILED, message))
+            is_ok = False
+        if not is_ok:
+            # the nonces after a rejected transaction are out of step with the node
+            self._wallet.nonce_manager.resync(self._url, self._from_address)
+            if self._checkpoint:
+                self._checkpoint.write(failed_records)
+        return is_ok
+
+    def _track(self, recipient, tx_hash):
+        def on_receipt(future):
+            status = STATUS_TIMEOUT
+            error = None
+            try:
+                receipt = future.result()
+                status = STATUS_REVERTED if receipt.get('status') in ('0x0', 0) else STATUS_MINED
+                if self._checkpoint:
+                    self._checkpoint.write([self._make_record(recipient, tx_hash, status)])
+            except (TimeoutError, CancelledError) as e:
+                error = str(e) or 'cancelled'
+            except Exception as e:
+                # the line is left as signed in the checkpoint, so the next run checks it again
+                logger.warning(f'payout to {recipient.address} not checked: {e}')
+                error = str(e)
+            finally:
+                # each tracked transaction must give one result, else the payout waits for it forever
+                self._results.put(PayoutResult(recipient.line_number, recipient.address, recipient.amount, tx_hash, status, error))
+
+        self._pending_count += 1
+        self._wallet.track_receipt(tx_hash, self._url, on_receipt, self._receipt_timeout)
+
+    def _read_results(self, max_pending):
+        # yield the finished results, and wait until no more than `max_pending` are left
+        while True:
+            try:
+                result = self._results.get(block=self._pending_count > max_pending)
+            except queue.Empty:
+                return
+            if result.status != STATUS_FAILED:
+                self._pending_count -= 1
+                self._count(result.status)
+            yield result
+
+    def _read_token_decimals(self, provider):
+        if not self._token_address:
+            return 0
+        response = provider.make_request('eth_call', [{'to': self._token_address, 'data': DECIMALS_SELECTOR}, 'latest'])
+        return decode_uint(response.get('result'))
+
+    def _validate_record(self, record, recipient):
+        if record['address'].lower() != recipient.address.lower() or Decimal(record['amount']) != recipient.amount:
+            raise ValueError(f'line {recipient.line_number} of the recipients is not the same as in the checkpoint file')
+
+    def _make_record(self, recipient, tx_hash, status, error=None, raw_transaction=None):
+        record = {
+            'line': recipient.line_number,
+            'address': recipient.address,
+            'amount': str(recipient.amount),
+            'tx_hash': tx_hash,
+            'status': status,
+        }
+        if error:
+            record['error'] = error
+        if raw_transaction:
+            record['raw_transaction'] = raw_transaction
+        return record
+
+    def _count(self, name):
+        self._counts[name] = self._counts.get(name, 0) + 1
+
+    @property
+    def summary(self):
+        return PayoutSummary(
+            self._counts.get('submitted', 0),
+            self._counts.get(STATUS_MINED, 0),
+            self._counts.get(STATUS_REVERTED, 0),
+            self._counts.get(STATUS_FAILED, 0),
+            self._counts.get(STATUS_TIMEOUT, 0),
+            self._counts.get('skipped', 0),
+            self._seconds,
+        )
+
+    @property
+    def tx_per_second(self):
+        if not self._seconds:
+            return 0
+        return self.summary.mined / self._seconds
@@ -0,0 +1,134 @@
+import threading
+import time
+
+from concurrent.futures import Future
+
+from wallet_manager import logger
+
+
+DEFAULT_POLL_INTERVAL = 1.0
+DEFAULT_TIMEOUT = 120
+
+
+class ReceiptTracker():
+    """
+    Wait for the receipts of many transactions on one node at once.
+
+    A background thread checks the block number every `poll_interval` seconds, and on each
+    new block asks for all of the pending receipts in one JSON-RPC batch request. A newly
+    tracked transaction is also checked once straight away, as it may be in the current block.
+    `track` returns a Future that is resolved with the receipt as returned by the node,
+    or fails with a TimeoutError if no receipt is found within the timeout.
+    """
+
+    def __init__(self, provider, poll_interval=DEFAULT_POLL_INTERVAL, timeout=DEFAULT_TIMEOUT):
+        self._provider = provider
+        self._poll_interval = poll_interval
+        self._timeout = timeout
+        self._pending = {}
+        # tracked since the last poll
+        self._new_hashes = set()
+        self._lock = threading.Lock()
+        self._wake_event = threading.Event()
+        self._thread = None
+        self._is_closed = False
+
+    def track(self, tx_hash, callback=None, timeout=None):
+        if timeout is None:
+            timeout = self._timeout
+        if isinstance(tx_hash, bytes):
+            tx_hash = '0x' + tx_hash.hex()
+        future = Future()
+        if callback:
+            future.add_done_callback(callback)
+        with self._lock:
+            if self._is_closed:
+                raise ValueError('receipt tracker is closed')
+            self._pending.setdefault(tx_hash, []).append((future, time.monotonic() + timeout))
+            self._new_hashes.add(tx_hash)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+        self._wake_event.set()
+        return future
+
+    def close(self):
+        with self._lock:
+            self._is_closed = True
+            pending = self._pending
+            self._pending = {}
+        self._wake_event.set()
+        for items in pending.values():
+            for future, _ in items:
+                future.cancel()
+
+    def _run(self):
+        last_block_number = None
+        while True:
+            with self._lock:
+                if not self._pending or self._is_closed:
+                    self._thread = None
+                    return
+            # cleared before the poll, so a hash tracked during the poll wakes the next one
+            self._wake_event.clear()
+            with self._lock:
+                new_hashes = self._new_hashes
+                self._new_hashes = set()
+            try:
+                block_number = self._provider.make_request('eth_blockNumber', []).get('result')
+                if block_number != last_block_number:
+                    self._poll_receipts()
+                    last_block_number = block_number
+                elif new_hashes:
+                    # no new block may come for a while on an idle or instant seal chain
+                    self._poll_receipts(new_hashes)
+            except Exception as e:
+                logger.debug(f'receipt poll failed: {e}')
+                with self._lock:
+                    self._new_hashes.update(new_hashes)
+            self._expire()
+            self._wake_event.wait(self._poll_interval)
+
+    def _poll_receipts(self, tx_hashes=None):
+        with self._lock:
+            if tx_hashes is None:
+                tx_hashes = list(self._pending.keys())
+            else:
+                tx_hashes = [tx_hash for tx_hash in tx_hashes if tx_hash in self._pending]
+        if not tx_hashes:
+            return
+        calls = [('eth_getTransactionReceipt', [tx_hash]) for tx_hash in tx_hashes]
+        responses = self._provider.make_batch_request(calls)
+        for tx_hash, response in zip(tx_hashes, responses):
+            receipt = response.get('result')
+            if receipt is None:
+                continue
+            with self._lock:
+                items = self._pending.pop(tx_hash, [])
+            for future, _ in items:
+                if not future.done():
+                    future.set_result(receipt)
+
+    def _expire(self):
+        now = time.monotonic()
+        expired = []
+        with self._lock:
+            for tx_hash, items in list(self._pending.items()):
+                waiting = []
+                for future, expire_time in items:
+                    if expire_time <= now or future.cancelled():
+                        expired.append((tx_hash, future))
+                    else:
+                        waiting.append((future, expire_time))
+                if waiting:
+                    self._pending[tx_hash] = waiting
+                else:
+                    del self._pending[tx_hash]
+        for tx_hash, future in expired:
+            if not future.done():
+                future.set_exception(TimeoutError(f'Transaction {tx_hash} is not in the chain after the timeout'))
+
+    @property
+    def pending_count(self):
+        with self._lock:
+            return len(self._pending)
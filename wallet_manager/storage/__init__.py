@@ -0,0 +1,64 @@
+"""
+
+    Key chain storage backends
+
+"""
+import os.path
+
+from wallet_manager.storage.json_storage import JSONStorage
+from wallet_manager.storage.log_storage import LogStorage
+from wallet_manager.storage.sqlite_storage import SQLiteStorage
+
+
+STORAGE_TYPES = {
+    'json': JSONStorage,
+    'log': LogStorage,
+    'sqlite': SQLiteStorage,
+}
+
+STORAGE_EXTENSIONS = {
+    '.json': 'json',
+    '.jsonl': 'log',
+    '.log': 'log',
+    '.db': 'sqlite',
+    '.sqlite': 'sqlite',
+    '.sqlite3': 'sqlite',
+}
+
+DEFAULT_STORAGE_TYPE = 'json'
+
+
+def storage_type_from_filename(filename):
+    _, extension = os.path.splitext(filename)
+    return STORAGE_EXTENSIONS.get(extension.lower(), DEFAULT_STORAGE_TYPE)
+
+
+def parse_storage_uri(filename):
+    """
+    Returns (storage_type, filename) of a key chain uri such as `sqlite:///data/key_chain`,
+    or (None, filename) of a plain file name.
+    """
+    scheme, separator, path = filename.partition('://')
+    if separator and scheme in STORAGE_TYPES:
+        return scheme, path
+    return None, filename
+
+
+def absolute_storage_uri(filename):
+    """
+    Returns the key chain file name or uri with an absolute path, so it names the same
+    file from any folder.
+    """
+    storage_type, path = parse_storage_uri(filename)
+    if storage_type:
+        return f'{storage_type}://{os.path.abspath(path)}'
+    return os.path.abspath(filename)
+
+
+def open_storage(filename, storage_type=None, **kwargs):
+    uri_storage_type, filename = parse_storage_uri(filename)
+    if storage_type is None:
+        storage_type = uri_storage_type or storage_type_from_filename(filename)
+    if storage_type not in STORAGE_TYPES:
+        raise ValueError(f'Unknown key chain storage type "{storage_type}"')
+    return STORAGE_TYPES[storage_type](filename, **kwargs)
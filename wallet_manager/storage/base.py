@@ -0,0 +1,188 @@
+import contextlib
+import os
+import tempfile
+
+try:
+    import fcntl
+except ImportError:
+    # no file locks on this platform, only one process can use a key chain at a time
+    fcntl = None
+
+
+LOCK_EXTENSION = '.lock'
+
+
+class BaseStorage():
+    """
+    A storage keeps the keys in memory. Other processes can change the same file, so each
+    save is done under an exclusive file lock: if the file has changed since it was read,
+    it is read again and the changes of this process are applied on top before writing.
+    """
+
+    def __init__(self, filename):
+        self._filename = filename
+        # (inode, size, mtime) of the file when it was last read or written by this process
+        self._file_state = None
+        # number of nested `lock` blocks of this storage
+        self._lock_depth = 0
+
+    @contextlib.contextmanager
+    def lock(self, shared=False):
+        """
+        Hold the file lock for the block. A lock inside the block of another lock of the same
+        storage keeps the outer lock, as a second flock would wait for the first one.
+        """
+        if shared and not os.path.exists(self._filename):
+            # there is nothing to read, and a read must not leave a lock file behind
+            yield
+            return
+        if self._lock_depth:
+            self._lock_depth += 1
+            try:
+                yield
+            finally:
+                self._lock_depth -= 1
+            return
+        with file_lock(self._filename + LOCK_EXTENSION, shared):
+            self._lock_depth = 1
+            try:
+                yield
+            finally:
+                self._lock_depth = 0
+
+    def is_changed(self):
+        return read_file_state(self._filename) != self._file_state
+
+    def refresh(self):
+        """
+        Read the file again if another process has changed it, keeping the changes not yet saved.
+        Returns True if the file was read again.
+        """
+        if not self.is_changed():
+            return False
+        with self.lock(shared=True):
+            self.reload()
+        return True
+
+    def reload(self):
+        raise NotImplementedError('Storage must implement this method')
+
+    def load(self):
+        raise NotImplementedError('Storage must implement this method')
+
+    def save(self):
+        raise NotImplementedError('Storage must implement this method')
+
+    def get(self, address):
+        raise NotImplementedError('Storage must implement this method')
+
+    def set(self, address, key_item):
+        raise NotImplementedError('Storage must implement this method')
+
+    def delete(self, address):
+        raise NotImplementedError('Storage must implement this method')
+
+    def contains(self, address):
+        raise NotImplementedError('Storage must implement this method')
+
+    def addresses(self):
+        raise NotImplementedError('Storage must implement this method')
+
+    def close(self):
+        pass
+
+    def mark_used(self, address, used_time=None):
+        # only kept by storages with account details
+        pass
+
+    def set_label(self, address, label):
+        self._raise_no_details()
+
+    def add_tags(self, address, tags):
+        self._raise_no_details()
+
+    def remove_tags(self, address, tags):
+        self._raise_no_details()
+
+    def get_info(self, address):
+        self._raise_no_details()
+
+    def find_addresses(self, tag=None, label=None):
+        self._raise_no_details()
+
+    def _raise_no_details(self):
+        raise ValueError(f'The key chain {self._filename} does not keep account labels and tags, use a sqlite key chain')
+
+    def __len__(self):
+        return sum(1 for _ in self.addresses())
+
+    @property
+    def filename(self):
+        return self._filename
+
+
+def read_file_state(filename):
+    try:
+        stat = os.stat(filename)
+    except FileNotFoundError:
+        return None
+    return (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+
+@contextlib.contextmanager
+def file_lock(filename, shared=False):
+    """
+    Hold an flock on `filename` for the block. The lock is kept on a separate file, as the
+    storage file itself is replaced by renames.
+    """
+    if fcntl is None:
+        yield
+        return
+    try:
+        fp = open(filename, 'a')
+    except OSError:
+        if not shared:
+            raise
+        # the lock file can not be made in a read only folder, so read without the lock
+        yield
+        return
+    with fp:
+        fcntl.flock(fp.fileno(), fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(fp.fileno(), fcntl.LOCK_UN)
+
+
+def atomic_write(filename, write_func, mode='w'):
+    """
+    Write a file by calling `write_func(fp)` on a temporary file in the same folder,
+    and then renaming it over `filename`. A crash leaves the old file untouched.
+    """
+    folder = os.path.dirname(os.path.abspath(filename))
+    handle, temp_filename = tempfile.mkstemp(dir=folder, prefix='.', suffix='.tmp')
+    try:
+        with os.fdopen(handle, mode) as fp:
+            write_func(fp)
+            fp.flush()
+            os.fsync(fp.fileno())
+        os.replace(temp_filename, filename)
+    except BaseException:
+        if os.path.exists(temp_filename):
+            os.remove(temp_filename)
+        raise
+    fsync_folder(folder)
+
+
+def fsync_folder(folder):
+    # make the rename durable, not supported on all platforms
+    try:
+        handle = os.open(folder, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(handle)
+    except OSError:
+        pass
+    finally:
+        os.close(handle)
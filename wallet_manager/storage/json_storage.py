@@ -0,0 +1,71 @@
+import os.path
+import json
+
+from wallet_manager.storage.base import (
+    BaseStorage,
+    atomic_write,
+    read_file_state,
+)
+
+
+class JSONStorage(BaseStorage):
+    """
+    Original key chain format, a single JSON dict of address -> keystore
+    that is read and written as a whole.
+    """
+
+    def __init__(self, filename, lazy=False):
+        # the JSON format has no index to read on its own, so `lazy` is ignored
+        # and the key chain is always loaded in full
+        BaseStorage.__init__(self, filename)
+        self._key_list = {}
+        # address -> keystore, or None if deleted, of the changes since the last save
+        self._changes = {}
+
+    def load(self):
+        with self.lock(shared=True):
+            self._changes = {}
+            self._read()
+
+    def reload(self):
+        self._read()
+        for address, key_item in self._changes.items():
+            if key_item is None:
+                self._key_list.pop(address, None)
+            else:
+                self._key_list[address] = key_item
+
+    def save(self):
+        with self.lock():
+            if self.is_changed():
+                self.reload()
+            atomic_write(self._filename, lambda fp: json.dump(self._key_list, fp))
+            self._file_state = read_file_state(self._filename)
+            self._changes = {}
+
+    def _read(self):
+        self._key_list = {}
+        self._file_state = read_file_state(self._filename)
+        if os.path.exists(self._filename):
+            with open(self._filename, 'r') as fp:
+                self._key_list = json.load(fp)
+
+    def get(self, address):
+        return self._key_list.get(address, None)
+
+    def set(self, address, key_item):
+        self._key_list[address] = key_item
+        self._changes[address] = key_item
+
+    def delete(self, address):
+        del self._key_list[address]
+        self._changes[address] = None
+
+    def contains(self, address):
+        return address in self._key_list
+
+    def addresses(self):
+        return iter(self._key_list.keys())
+
+    def __len__(self):
+        return len(self._key_list)
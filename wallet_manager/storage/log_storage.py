@@ -0,0 +1,286 @@
+import os
+import os.path
+import json
+import mmap
+import zlib
+
+from wallet_manager.storage.base import (
+    BaseStorage,
+    atomic_write,
+    read_file_state,
+)
+from wallet_manager import logger
+
+
+LOG_HEADER = b'# wallet_manager key chain log 1\n'
+
+RECORD_SET = 'S'
+RECORD_DELETE = 'D'
+
+DEFAULT_COMPACT_MIN_RECORDS = 1024
+DEFAULT_COMPACT_RATIO = 1.0
+
+
+def encode_record(op, address, key_item=None):
+    fields = [op, address]
+    if op == RECORD_SET:
+        fields.append(json.dumps(key_item, separators=(',', ':')))
+    crc = zlib.crc32(' '.join(fields).encode('utf-8'))
+    fields.insert(2, f'{crc:08x}')
+    return ' '.join(fields).encode('utf-8') + b'\n'
+
+
+def decode_record(line):
+    """
+    Decode a single log line, returns (op, address, payload_text) or raises ValueError
+    if the line is torn or fails the checksum.
+    """
+    if not line.endswith(b'\n'):
+        raise ValueError('incomplete record')
+    fields = line[:-1].decode('utf-8').split(' ', 3)
+    if len(fields) < 3 or fields[0] not in (RECORD_SET, RECORD_DELETE):
+        raise ValueError('invalid record')
+    crc_text = fields.pop(2)
+    if f'{zlib.crc32(" ".join(fields).encode("utf-8")):08x}' != crc_text:
+        raise ValueError('record checksum mismatch')
+    if fields[0] == RECORD_SET and len(fields) != 3:
+        raise ValueError('missing record payload')
+    payload = fields[2] if len(fields) == 3 else None
+    return fields[0], fields[1], payload
+
+
+class LogStorage(BaseStorage):
+    """
+    Append-only key chain storage.
+
+    Each change is appended as one checksummed line to the log, so saving costs
+    only the size of the change. An in memory index keyed by the account address
+    holds the current keys. Once the log holds more dead records than `compact_ratio`
+    times the live records it is rewritten with only the live records and atomically
+    renamed over the old log.
+
+    With `lazy` set, loading only builds an index of address -> record location, and
+    the keystore is decoded from a memory mapped view of the log when it is needed.
+
+    A file in the original single JSON format is read as is and converted to the log
+    format on the next save.
+    """
+
+    def __init__(self, filename, lazy=False, compact_min_records=DEFAULT_COMPACT_MIN_RECORDS,
+                 compact_ratio=DEFAULT_COMPACT_RATIO):
+        BaseStorage.__init__(self, filename)
+        self._lazy = lazy
+        self._compact_min_records = compact_min_records
+        self._compact_ratio = compact_ratio
+        self._index = {}
+        self._pending = []
+        self._record_count = 0
+        self._valid_size = 0
+        self._needs_compact = False
+        self._map = None
+
+    def load(self):
+        with self.lock(shared=True):
+            self._pending = []
+            self._read()
+
+    def reload(self):
+        pending = self._pending
+        self._read()
+        for item in pending:
+            if item[0] == RECORD_SET:
+                self._index[item[1]] = item[2]
+            else:
+                self._index.pop(item[1], None)
+        self._pending = pending
+
+    def _read(self):
+        self._close_map()
+        self._index = {}
+        self._record_count = 0
+        self._valid_size = 0
+        self._needs_compact = False
+        self._file_state = read_file_state(self._filename)
+        if not os.path.exists(self._filename) or os.path.getsize(self._filename) == 0:
+            return
+        if self._lazy:
+            data = self._open_map()
+        else:
+            with open(self._filename, 'rb') as fp:
+                data = fp.read()
+        if data[:64].lstrip()[:1] == b'{':
+            self._index = json.loads(data[:].decode('utf-8'))
+            self._needs_compact = True
+            self._close_map()
+            return
+        self._read_records(data)
+
+    def _read_records(self, data):
+        size = len(data)
+        if size <= len(LOG_HEADER) and LOG_HEADER.startswith(data[:size]):
+            # empty, or the header itself was torn
+            return
+        if data[:len(LOG_HEADER)] != LOG_HEADER:
+            raise ValueError(f'{self._filename} is not a key chain log file')
+        offset = len(LOG_HEADER)
+        self._valid_size = offset
+        while offset < size:
+            end = data.find(b'\n', offset)
+            end = size if end < 0 else end + 1
+            if self._lazy and end < size:
+                # only the op and address are read, the checksum is checked on access
+                op_end = offset + 1
+                address_end = data.find(b' ', op_end + 1, end)
+                op = data[offset:op_end].decode('utf-8')
+                address = data[op_end + 1:address_end].decode('utf-8')
+                if address_end < 0 or data[op_end:op_end + 1] != b' ' or op not in (RECORD_SET, RECORD_DELETE):
+                    raise ValueError(f'{self._filename} is corrupt at offset {offset}: invalid record')
+                payload = (offset, end)
+            else:
+                try:
+                    op, address, payload = decode_record(data[offset:end])
+                except ValueError as e:
+                    if end < size:
+                        raise ValueError(f'{self._filename} is corrupt at offset {offset}: {e}')
+                    # a torn write at the end of the log, this is dropped on the next save
+                    logger.warning(f'ignoring incomplete record at the end of {self._filename}')
+                    break
+                if op == RECORD_SET:
+                    payload = (offset, end) if self._lazy else json.loads(payload)
+            if op == RECORD_SET:
+                self._index[address] = payload
+            else:
+                self._index.pop(address, None)
+            self._record_count += 1
+            offset = end
+            self._valid_size = offset
+
+    def save(self):
+        with self.lock():
+            if self.is_changed():
+                self.reload()
+            if self._needs_compact or self._is_compact_needed():
+                self._compact()
+            elif self._pending:
+                self._append()
+
+    def compact(self):
+        with self.lock():
+            if self.is_changed():
+                self.reload()
+            self._compact()
+
+    def _append(self):
+        lines = []
+        offset = self._valid_size if self._valid_size else len(LOG_HEADER)
+        for item in self._pending:
+            line = encode_record(*item)
+            if self._lazy and item[0] == RECORD_SET and self._index.get(item[1]) is item[2]:
+                self._index[item[1]] = (offset, offset + len(line))
+            offset += len(line)
+            lines.append(line)
+        lines = b''.join(lines)
+        self._close_map()
+        mode = 'r+b' if os.path.exists(self._filename) else 'wb'
+        with open(self._filename, mode) as fp:
+            if self._valid_size == 0:
+                fp.write(LOG_HEADER)
+                self._valid_size = len(LOG_HEADER)
+            fp.seek(self._valid_size)
+            fp.truncate()
+            fp.write(lines)
+            fp.flush()
+            os.fsync(fp.fileno())
+        self._valid_size += len(lines)
+        self._record_count += len(self._pending)
+        self._pending = []
+        self._file_state = read_file_state(self._filename)
+
+    def _compact(self):
+        index = {}
+
+        def write_log(fp):
+            offset = len(LOG_HEADER)
+            fp.write(LOG_HEADER)
+            for address, key_item in self._index.items():
+                if isinstance(key_item, tuple):
+                    # copy the record as is, without decoding the keystore
+                    line = self._read_line(key_item)
+                    decode_record(line)
+                else:
+                    line = encode_record(RECORD_SET, address, key_item)
+                fp.write(line)
+                index[address] = (offset, offset + len(line)) if self._lazy else key_item
+                offset += len(line)
+
+        atomic_write(self._filename, write_log, 'wb')
+        self._close_map()
+        self._index = index
+        self._valid_size = os.path.getsize(self._filename)
+        self._record_count = len(self._index)
+        self._pending = []
+        self._needs_compact = False
+        self._file_state = read_file_state(self._filename)
+
+    def close(self):
+        self._close_map()
+
+    def _open_map(self):
+        if self._map is None:
+            with open(self._filename, 'rb') as fp:
+                self._map = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._map
+
+    def _close_map(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+
+    def _read_line(self, location):
+        offset, end = location
+        data = self._open_map()
+        if end > len(data):
+            self._close_map()
+            data = self._open_map()
+        return data[offset:end]
+
+    def _is_compact_needed(self):
+        record_count = self._record_count + len(self._pending)
+        if record_count < self._compact_min_records:
+            return False
+        dead_count = record_count - len(self._index)
+        return dead_count > len(self._index) * self._compact_ratio
+
+    def get(self, address):
+        key_item = self._index.get(address, None)
+        if isinstance(key_item, tuple):
+            try:
+                op, record_address, payload = decode_record(self._read_line(key_item))
+            except ValueError as e:
+                raise ValueError(f'{self._filename} is corrupt at offset {key_item[0]}: {e}')
+            if record_address != address:
+                raise ValueError(f'{self._filename} is corrupt at offset {key_item[0]}: address mismatch')
+            key_item = json.loads(payload)
+        return key_item
+
+    def set(self, address, key_item):
+        self._validate_address(address)
+        self._index[address] = key_item
+        self._pending.append((RECORD_SET, address, key_item))
+
+    def delete(self, address):
+        del self._index[address]
+        self._pending.append((RECORD_DELETE, address))
+
+    def contains(self, address):
+        return address in self._index
+
+    def addresses(self):
+        return iter(self._index.keys())
+
+    def __len__(self):
+        return len(self._index)
+
+    def _validate_address(self, address):
+        if not isinstance(address, str) or not address or any(c.isspace() for c in address):
+            raise ValueError(f'Invalid key chain address "{address}"')
@@ -0,0 +1,296 @@
+import fnmatch
+import itertools
+import json
+import re
+import time
+
+from wallet_manager.account_index import (
+    AccountPage,
+    GLOB_PATTERN,
+    normalize_pattern,
+)
+from wallet_manager.hd_wallet import HD_SEED_PREFIX
+from wallet_manager.storage.base import BaseStorage
+
+
+DEFAULT_BUSY_TIMEOUT = 30
+ADDRESS_PAGE_SIZE = 1000
+
+SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS keys (
+        address TEXT PRIMARY KEY,
+        key_json TEXT NOT NULL,
+        label TEXT,
+        created_time REAL NOT NULL,
+        last_used_time REAL
+    ) WITHOUT ROWID
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS tags (
+        address TEXT NOT NULL,
+        tag TEXT NOT NULL,
+        PRIMARY KEY (address, tag)
+    ) WITHOUT ROWID
+    """,
+    'CREATE INDEX IF NOT EXISTS tags_tag ON tags (tag, address)',
+    'CREATE INDEX IF NOT EXISTS keys_label ON keys (label)',
+    # the accounts are listed in the order of their lower case address
+    'CREATE INDEX IF NOT EXISTS keys_lower_address ON keys (lower(address))',
+]
+
+# the HD seeds are kept in the keys table with the accounts
+ACCOUNT_FILTER = f"address NOT GLOB '{HD_SEED_PREFIX}*'"
+
+
+def import_sqlite3():
+    try:
+        import sqlite3
+    except ImportError:
+        raise ImportError('The sqlite key chain storage needs python to be built with the sqlite3 module')
+    return sqlite3
+
+
+class SQLiteStorage(BaseStorage):
+    """
+    Key chain in a SQLite database, with the address as the primary key, so each
+    lookup and change only reads the index pages it needs and not the whole key chain.
+
+    Each account can also have a label, network tags, and its created and last used times.
+
+    Changes are made in a transaction that is committed by `save`. The database is in
+    WAL mode, so other processes can read the key chain while it is being written.
+    """
+
+    def __init__(self, filename, lazy=False, timeout=DEFAULT_BUSY_TIMEOUT):
+        # every read goes to the database, so `lazy` is ignored
+        BaseStorage.__init__(self, filename)
+        sqlite3 = import_sqlite3()
+        # the key chain lock makes sure that only one thread uses the connection at a time
+        self._connection = sqlite3.connect(filename, timeout=timeout, check_same_thread=False)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        for statement in SCHEMA:
+            self._connection.execute(statement)
+        self._connection.commit()
+        self._data_version = self._read_data_version()
+        self._account_index = SQLiteAccountIndex(self._connection)
+
+    def load(self):
+        # the database is always read as it is, so only throw away the changes not yet saved
+        self._connection.rollback()
+        self._data_version = self._read_data_version()
+
+    def reload(self):
+        self._data_version = self._read_data_version()
+
+    def is_changed(self):
+        # each read already sees the changes saved by other processes, the data version
+        # only tells the key chain to rebuild what it has cached from the addresses
+        return self._read_data_version() != self._data_version
+
+    def refresh(self):
+        # SQLite does its own locking
+        if not self.is_changed():
+            return False
+        self.reload()
+        return True
+
+    def save(self):
+        self._connection.commit()
+        self._data_version = self._read_data_version()
+
+    def get(self, address):
+        row = self._connection.execute('SELECT key_json FROM keys WHERE address = ?', (address,)).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0])
+
+    def set(self, address, key_item):
+        key_json = json.dumps(key_item)
+        cursor = self._connection.execute('UPDATE keys SET key_json = ? WHERE address = ?', (key_json, address))
+        if cursor.rowcount == 0:
+            self._connection.execute(
+                'INSERT INTO keys (address, key_json, created_time) VALUES (?, ?, ?)',
+                (address, key_json, time.time())
+            )
+
+    def delete(self, address):
+        cursor = self._connection.execute('DELETE FROM keys WHERE address = ?', (address,))
+        if cursor.rowcount == 0:
+            raise KeyError(address)
+        self._connection.execute('DELETE FROM tags WHERE address = ?', (address,))
+
+    def contains(self, address):
+        return self._connection.execute('SELECT 1 FROM keys WHERE address = ?', (address,)).fetchone() is not None
+
+    def addresses(self):
+        # read a page at a time in address order, so millions of addresses are never held at once
+        after = ''
+        while True:
+            rows = self._connection.execute(
+                'SELECT address FROM keys WHERE address > ? ORDER BY address LIMIT ?',
+                (after, ADDRESS_PAGE_SIZE)
+            ).fetchall()
+            for row in rows:
+                yield row[0]
+            if len(rows) < ADDRESS_PAGE_SIZE:
+                return
+            after = rows[-1][0]
+
+    def mark_used(self, address, used_time=None):
+        is_pending = self._connection.in_transaction
+        self._connection.execute(
+            'UPDATE keys SET last_used_time = ? WHERE address = ?',
+            (time.time() if used_time is None else used_time, address)
+        )
+        if not is_pending:
+            # not part of any unsaved changes, so save it straight away
+            self._connection.commit()
+
+    def set_label(self, address, label):
+        self._validate_account(address)
+        self._connection.execute('UPDATE keys SET label = ? WHERE address = ?', (label, address))
+
+    def add_tags(self, address, tags):
+        self._validate_account(address)
+        self._connection.executemany(
+            'INSERT OR IGNORE INTO tags (address, tag) VALUES (?, ?)',
+            [(address, tag) for tag in tags]
+        )
+
+    def remove_tags(self, address, tags):
+        self._connection.executemany(
+            'DELETE FROM tags WHERE address = ? AND tag = ?',
+            [(address, tag) for tag in tags]
+        )
+
+    def get_info(self, address):
+        row = self._connection.execute(
+            'SELECT label, created_time, last_used_time FROM keys WHERE address = ?', (address,)
+        ).fetchone()
+        if row is None:
+            return None
+        tags = self._connection.execute('SELECT tag FROM tags WHERE address = ? ORDER BY tag', (address,)).fetchall()
+        return {
+            'address': address,
+            'label': row[0],
+            'tags': [tag for tag, in tags],
+            'created_time': row[1],
+            'last_used_time': row[2],
+        }
+
+    def find_addresses(self, tag=None, label=None):
+        sql = 'SELECT keys.address FROM keys'
+        params = []
+        if tag is not None:
+            sql += ' JOIN tags ON tags.address = keys.address AND tags.tag = ?'
+            params.append(tag)
+        sql += f' WHERE keys.{ACCOUNT_FILTER}'
+        if label is not None:
+            sql += ' AND keys.label = ?'
+            params.append(label)
+        sql += ' ORDER BY keys.address'
+        return [row[0] for row in self._connection.execute(sql, params)]
+
+    def close(self):
+        self._connection.close()
+
+    @property
+    def account_index(self):
+        return self._account_index
+
+    def __len__(self):
+        # the number of accounts, without the HD seeds
+        return self._account_index.count()
+
+    def _read_data_version(self):
+        # changes each time another connection commits to the database
+        return self._connection.execute('PRAGMA data_version').fetchone()[0]
+
+    def _validate_account(self, address):
+        if not self.contains(address):
+            raise ValueError(f'Cannot find account {address}')
+
+
+class SQLiteAccountIndex():
+    """
+    Same queries as an AccountIndex, answered from the lower case address index of the
+    database, so the addresses are not all read into memory to list or count them.
+
+    The table is the index, so `add` and `remove` have nothing to do.
+    """
+
+    def __init__(self, connection):
+        self._connection = connection
+
+    def add(self, address):
+        pass
+
+    def remove(self, address):
+        pass
+
+    def addresses(self, after=None, pattern=None):
+        """
+        Yield each address in sorted order after the cursor address `after`, that match the pattern.
+        """
+        pattern = normalize_pattern(pattern)
+        prefix = pattern
+        match = None
+        if pattern and GLOB_PATTERN.search(pattern):
+            prefix = GLOB_PATTERN.split(pattern, 1)[0]
+            match = re.compile(fnmatch.translate(pattern)).match
+
+        start = prefix or ''
+        after = after.lower() if after else None
+        while True:
+            sql, params = self._select('address, lower(address)', prefix)
+            if after is None:
+                sql += ' AND lower(address) >= ?'
+                params.append(start)
+            else:
+                sql += ' AND lower(address) > ? AND lower(address) >= ?'
+                params += [after, start]
+            rows = self._connection.execute(
+                sql + ' ORDER BY lower(address) LIMIT ?', params + [ADDRESS_PAGE_SIZE]
+            ).fetchall()
+            for address, key in rows:
+                if match is None or match(key):
+                    yield address
+            if len(rows) < ADDRESS_PAGE_SIZE:
+                return
+            after = rows[-1][1]
+
+    def page(self, after=None, limit=None, pattern=None):
+        """
+        Returns an AccountPage with up to `limit` addresses, and the cursor to pass as `after`
+        for the next page, or None if this is the last page.
+        """
+        addresses = self.addresses(after, pattern)
+        if limit is None:
+            return AccountPage(list(addresses), None)
+        items = list(itertools.islice(addresses, limit + 1))
+        if len(items) > limit:
+            items = items[:limit]
+            return AccountPage(items, items[-1].lower())
+        return AccountPage(items, None)
+
+    def count(self, pattern=None):
+        pattern = normalize_pattern(pattern)
+        if pattern and GLOB_PATTERN.search(pattern):
+            return sum(1 for _ in self.addresses(pattern=pattern))
+        sql, params = self._select('COUNT(*)', pattern)
+        if pattern:
+            sql += ' AND lower(address) >= ?'
+            params.append(pattern)
+        return self._connection.execute(sql, params).fetchone()[0]
+
+    def __len__(self):
+        return self.count()
+
+    def _select(self, columns, prefix):
+        sql = f'SELECT {columns} FROM keys WHERE {ACCOUNT_FILTER}'
+        params = []
+        if prefix:
+            sql += ' AND lower(address) < ?'
+            params.append(prefix + '\uffff')
+        return sql, params
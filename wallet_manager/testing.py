@@ -0,0 +1,78 @@
+"""
+
+    In process JSON-RPC node for the tests and benchmarks
+
+"""
+import json
+import threading
+
+from http.server import (
+    BaseHTTPRequestHandler,
+    ThreadingHTTPServer,
+)
+
+
+class RPCNodeHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # the headers and body are written separately, so without this each response waits for a delayed ack
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        node = self.server.node
+        data = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        node.connections.add(self.client_address)
+        if node.keep_posts:
+            node.posts.append(data)
+        if isinstance(data, list):
+            result = [node.call(item) for item in data]
+        else:
+            result = node.call(data)
+        body = json.dumps(result).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class RPCNode():
+    """
+    In process stand-in for a JSON-RPC node, `methods` maps a method name to a function
+    that is called with the request params.
+
+    Each request body is kept in `posts` unless `keep_posts` is False, as for a benchmark
+    that sends many requests.
+    """
+    def __init__(self, methods=None, keep_posts=True):
+        self.methods = methods or {}
+        self.keep_posts = keep_posts
+        self.posts = []
+        self.connections = set()
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), RPCNodeHandler)
+        self._server.daemon_threads = True
+        self._server.node = self
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def call(self, request):
+        response = {'jsonrpc': '2.0', 'id': request.get('id')}
+        method = self.methods.get(request['method'])
+        if method is None:
+            response['error'] = {'code': -32601, 'message': f'Method {request["method"]} not found'}
+            return response
+        try:
+            response['result'] = method(*request.get('params', []))
+        except Exception as e:
+            response['error'] = {'code': -32000, 'message': str(e)}
+        return response
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self._server.server_address[1]}'
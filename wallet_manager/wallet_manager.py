@@ -1,33 +1,71 @@
 
+import contextlib
 import json
-import requests
 import logging
+import threading
 
-from web3 import (
-    Web3,
-    HTTPProvider,
-    gas_strategies,
-)
+from collections import namedtuple
 
-from eth_account import Account as EthAccount
+from wallet_manager.account_index import AccountIndex
+from wallet_manager.balance_scanner import (
+    BalanceScanner,
+    DEFAULT_BATCH_SIZE as DEFAULT_SCAN_BATCH_SIZE,
+    DEFAULT_WORKERS as DEFAULT_SCAN_WORKERS,
+)
+from wallet_manager.block_waiter import BlockWaiter
+from wallet_manager.crypto_pool import CryptoPool
+from wallet_manager.hd_wallet import (
+    BIP44_ETHEREUM_PATH,
+    HDWallet,
+    hd_seed_key,
+    is_hd_account,
+    make_hd_seed,
+)
+from wallet_manager.key_cache import UnlockedKeyCache
 from wallet_manager.key_chain import KeyChain
+from wallet_manager.metrics import (
+    instrument,
+    metrics,
+)
+from wallet_manager.nonce_manager import NonceManager
+from wallet_manager.receipt_tracker import ReceiptTracker
 from wallet_manager import logger
 
 
+BatchResult = namedtuple('BatchResult', ['address', 'result', 'error'])
+
+
 def as_attrdict(val):
     return dict(val)
 
+
+def as_password_list(password, count):
+    if isinstance(password, (list, tuple)):
+        if len(password) != count:
+            raise ValueError(f'Expected {count} passwords, got {len(password)}')
+        return list(password)
+    return [password] * count
+
+@instrument('wallet')
 class WalletManager():
 
-    def __init__(self, key_chain_filename=None):
+    def __init__(self, key_chain_filename=None, lazy=False, connection_pool=None, crypto_workers=None, key_cache=None):
+        self._key_chain = None
         if key_chain_filename:
-            self._key_chain = KeyChain(key_chain_filename)
+            self._key_chain = KeyChain(key_chain_filename, lazy=lazy)
+        self._connection_pool = connection_pool
+        self._crypto_pool = CryptoPool(crypto_workers)
+        self._key_cache = key_cache
+        self._nonce_manager = NonceManager()
+        self._receipt_trackers = {}
+        self._lock = threading.RLock()
 
 
     def new_account(self, password, url=None):
+        from eth_account import Account as EthAccount
         address = None
         if url:
-            web3 = Web3(HTTPProvider(url))
+            web3 = self.connection_pool.get_web3(url)
             address = web3.personal.newAccount(password)
             accounts = web3.personal.listAccounts
             if not address in accounts:
@@ -41,52 +79,306 @@ class WalletManager():
         return address
 
 
+    def new_accounts(self, count, password, url=None, hd_name=None):
+        """
+        Create `count` accounts, `password` is a single password or a list with one password
+        per account. Local keys are encrypted by the crypto pool and saved once, host accounts
+        are created with one batch request. Returns a list of BatchResult.
+
+        With `hd_name` the local accounts are the next accounts derived from the HD seed of
+        that name, which is made the first time. Only the seed is encrypted, with `password`,
+        so any number of accounts costs one KDF.
+        """
+        if count < 1:
+            raise ValueError(f'The count of accounts must be 1 or more, not {count}')
+        if hd_name:
+            if url:
+                raise ValueError('HD accounts can only be made in the local key chain')
+            return self._new_hd_accounts(count, password, hd_name)
+        passwords = as_password_list(password, count)
+        if url:
+            calls = [('personal_newAccount', [password]) for password in passwords]
+            return [
+                BatchResult(item.result, item.result, item.error)
+                for item in self._batch_request(url, [None] * count, calls)
+            ]
+        from eth_account import Account as EthAccount
+        local_accounts = [EthAccount.create() for _ in range(count)]
+        raw_keys = [local_account.privateKey for local_account in local_accounts]
+        results = []
+        with self.batch():
+            for local_account, (key_value, error) in zip(local_accounts, self._crypto_pool.encrypt(raw_keys, passwords)):
+                address = local_account.address
+                if error is None:
+                    self._key_chain.set_key(address, key_value)
+                results.append(BatchResult(address, address if error is None else None, error))
+            self._key_chain.save()
+        return results
+
+    def _new_hd_accounts(self, count, password, name):
+        seed_key = hd_seed_key(name)
+        seed_item = self._key_chain.get_key(seed_key)
+        # check the password before any index is taken
+        seed = None if seed_item is None else self._decrypt_hd_seed(name, seed_item, password)
+        new_seeds = []
+
+        def reserve_indexes(seed_item):
+            if seed_item is None:
+                new_seeds.append(make_hd_seed())
+                key_value, error = self._crypto_pool.encrypt(new_seeds, [password])[0]
+                if error:
+                    raise ValueError(error)
+                seed_item = {'hd_seed': key_value, 'path': BIP44_ETHEREUM_PATH, 'next_index': 0}
+            return dict(seed_item, next_index=seed_item['next_index'] + count)
+
+        # the indexes are saved as taken before the accounts are derived, so other processes
+        # using the same seed carry on after them
+        seed_item = self._key_chain.update_key(seed_key, reserve_indexes)
+        if new_seeds:
+            seed = new_seeds[0]
+        elif seed is None:
+            # another process has made the seed in the meantime
+            seed = self._decrypt_hd_seed(name, seed_item, password)
+        hd_wallet = HDWallet(seed, seed_item['path'])
+        results = []
+        with self.batch():
+            for index in range(seed_item['next_index'] - count, seed_item['next_index']):
+                try:
+                    address, _ = hd_wallet.derive_account(index)
+                except ValueError as e:
+                    logger.warning(str(e))
+                    continue
+                # only the index is saved, the key is derived again when it is used
+                self._key_chain.set_key(address, {'address': address[2:].lower(), 'hd_seed': name, 'hd_index': index})
+                results.append(BatchResult(address, address, None))
+            self._key_chain.save()
+        return results
+
+    @contextlib.contextmanager
+    def batch(self):
+        """
+        Save the local key changes made in the block to the key chain file once, at the end of the block.
+        If the block raises an error none of its local key changes are saved.
+
+            with wallet.batch():
+                for raw_key in raw_keys:
+                    wallet.import_account_key(address, raw_key, password)
+        """
+        with self._key_chain.batch():
+            yield self
+
     def get_chain_status(self, url):
-        web3 = Web3(HTTPProvider(url))
+        web3 = self.connection_pool.get_web3(url)
         return web3.manager.request_blocking('parity_chainStatus', [])
 
     def get_chain_name(self, url):
-        web3 = Web3(HTTPProvider(url))
+        web3 = self.connection_pool.get_web3(url)
         return web3.manager.request_blocking('parity_chain', [])
 
+    def get_chain_info(self, url):
+        """
+        Returns a dict with the 'chain_name' and 'chain_id' of the node, read in one batch request.
+        """
+        provider = self.connection_pool.get_provider(url)
+        chain_name, chain_id = provider.make_batch_request([('parity_chain', []), ('eth_chainId', [])])
+        if 'error' in chain_name:
+            raise ValueError(chain_name['error'])
+        return {
+            'chain_name': chain_name.get('result'),
+            # older nodes do not support eth_chainId
+            'chain_id': int(chain_id['result'], 16) if chain_id.get('result') else None,
+        }
+
     def delete_account(self, address, password, url=None):
         if url:
-            web3 = Web3(HTTPProvider(url))
+            web3 = self.connection_pool.get_web3(url)
             web3.manager.request_blocking('parity_killAccount', [address, password])
         else:
             self._key_chain.delete_key(address)
             self._key_chain.save()
 
+    def delete_accounts(self, addresses, password, url=None):
+        """
+        Delete a list of accounts, `password` is a single password or a list with one password
+        per address. Host accounts are deleted with one batch request. Returns a list of BatchResult.
+        """
+        passwords = as_password_list(password, len(addresses))
+        if url:
+            calls = [('parity_killAccount', [address, password]) for address, password in zip(addresses, passwords)]
+            return self._batch_request(url, addresses, calls)
+        results = []
+        for address in addresses:
+            if self._key_chain.is_key(address):
+                self._key_chain.delete_key(address)
+                results.append(BatchResult(address, True, None))
+            else:
+                results.append(BatchResult(address, None, f'Cannot find account {address}'))
+        self._key_chain.save()
+        return results
+
     def list_accounts(self, url=None):
         result = None
         if url:
-            web3 = Web3(HTTPProvider(url))
+            web3 = self.connection_pool.get_web3(url)
             result = web3.eth.accounts
         else:
             result = self._key_chain.address_list
         return result
 
+    def iter_accounts(self, url=None, after=None, pattern=None):
+        """
+        Yield the account addresses in sorted order, after the cursor address `after`
+        and matching the prefix or glob `pattern`.
+        """
+        return self._get_account_index(url).addresses(after, pattern)
+
+    def list_accounts_page(self, url=None, after=None, limit=100, pattern=None):
+        """
+        Returns an AccountPage of up to `limit` addresses, with the cursor for the next page.
+        """
+        return self._get_account_index(url).page(after, limit, pattern)
+
+    def count_accounts(self, url=None, pattern=None):
+        return self._get_account_index(url).count(pattern)
+
     def export_account_json(self, address, password, url=None):
         if url:
-            web3 = Web3(HTTPProvider(url))
+            web3 = self.connection_pool.get_web3(url)
             raw_data = web3.manager.request_blocking('parity_exportAccount', [address, password])
             result = json.dumps(raw_data, default=as_attrdict)
         else:
-            result = json.dumps(self._key_chain.get_key(address))
+            key_item = self._key_chain.get_key(address)
+            if is_hd_account(key_item):
+                key_item = self._export_hd_account(address, password)
+            result = json.dumps(key_item)
         return result
 
+    def export_accounts_json(self, addresses, password, url=None):
+        passwords = as_password_list(password, len(addresses))
+        if url:
+            calls = [('parity_exportAccount', [address, password]) for address, password in zip(addresses, passwords)]
+            results = []
+            for item in self._batch_request(url, addresses, calls):
+                if item.error is None:
+                    item = item._replace(result=json.dumps(item.result, default=as_attrdict))
+                results.append(item)
+            return results
+        results = []
+        hd_wallets = {}
+        for address, password in zip(addresses, passwords):
+            key_item = self._key_chain.get_key(address)
+            if key_item is None:
+                results.append(BatchResult(address, None, f'Cannot find account {address}'))
+                continue
+            if is_hd_account(key_item):
+                try:
+                    key_item = self._export_hd_account(address, password, hd_wallets)
+                except ValueError as e:
+                    results.append(BatchResult(address, None, str(e)))
+                    continue
+            results.append(BatchResult(address, json.dumps(key_item), None))
+        return results
+
     def export_account_key(self, address, password, url=None):
+        from eth_account import Account as EthAccount
         if url:
-            web3 = Web3(HTTPProvider(url))
+            web3 = self.connection_pool.get_web3(url)
             raw_data = web3.manager.request_blocking('parity_exportAccount', [address, password])
             key_json = json.dumps(raw_data, default=as_attrdict)
-        else:
-            key_json = json.dumps(self._key_chain.get_key(address))
-        return EthAccount.decrypt(key_json, password)
+            return EthAccount.decrypt(key_json, password)
+        return self._get_local_key(address, password)
+
+    def unlock_account(self, address, password, duration=None, url=None):
+        """
+        Unlock an account for `duration` seconds. For a local account the decrypted key is
+        held in the key cache, so that signing does not need to decrypt the keystore again.
+        """
+        if url:
+            web3 = self.connection_pool.get_web3(url)
+            return web3.personal.unlockAccount(address, password, duration)
+        if self._key_cache is None:
+            self._key_cache = UnlockedKeyCache()
+        raw_key = self._decrypt_local_key(address, password)
+        self._key_cache.unlock(address, raw_key, password, duration)
+        return True
+
+    def lock_account(self, address, url=None):
+        if url:
+            web3 = self.connection_pool.get_web3(url)
+            return web3.manager.request_blocking('personal_lockAccount', [address])
+        if self._key_cache:
+            return self._key_cache.lock(address)
+        return False
+
+    def export_accounts_key(self, addresses, password, url=None):
+        """
+        Export the private keys of a list of accounts, the keystores are decrypted
+        in parallel by the crypto pool. Returns a list of BatchResult.
+        """
+        passwords = as_password_list(password, len(addresses))
+        if url:
+            exported = self.export_accounts_json(addresses, passwords, url)
+            valid = [(item.result, password) for item, password in zip(exported, passwords) if item.error is None]
+            decrypted = iter(self._crypto_pool.decrypt(*zip(*valid)) if valid else [])
+            results = []
+            for item in exported:
+                if item.error is None:
+                    raw_key, error = next(decrypted)
+                    item = BatchResult(item.address, raw_key, error)
+                results.append(item)
+            return results
+        results = [None] * len(addresses)
+        keystores = []
+        hd_wallets = {}
+        for position, (address, password) in enumerate(zip(addresses, passwords)):
+            key_item = self._key_chain.get_key(address)
+            if key_item is None:
+                results[position] = BatchResult(address, None, f'Cannot find account {address}')
+            elif is_hd_account(key_item):
+                # derived after one decrypt of each seed, rather than encrypted and then decrypted again
+                try:
+                    results[position] = BatchResult(address, self._decrypt_local_key(address, password, hd_wallets), None)
+                except ValueError as e:
+                    results[position] = BatchResult(address, None, str(e))
+            else:
+                keystores.append((position, json.dumps(key_item), password))
+        if keystores:
+            positions, key_jsons, keystore_passwords = zip(*keystores)
+            for position, (raw_key, error) in zip(positions, self._crypto_pool.decrypt(key_jsons, keystore_passwords)):
+                results[position] = BatchResult(addresses[position], raw_key, error)
+        return results
+
+    def change_accounts_password(self, addresses, old_password, new_password, url=None):
+        old_passwords = as_password_list(old_password, len(addresses))
+        new_passwords = as_password_list(new_password, len(addresses))
+        if url:
+            calls = [
+                ('parity_changePassword', [address, old_password, new_password])
+                for address, old_password, new_password in zip(addresses, old_passwords, new_passwords)
+            ]
+            return self._batch_request(url, addresses, calls)
+        exported = self.export_accounts_json(addresses, old_passwords)
+        valid = [
+            (item.result, old_password, new_password)
+            for item, old_password, new_password in zip(exported, old_passwords, new_passwords)
+            if item.error is None
+        ]
+        encrypted = iter(self._crypto_pool.reencrypt(*zip(*valid)) if valid else [])
+        results = []
+        for item in exported:
+            if item.error is None:
+                key_value, error = next(encrypted)
+                if error is None:
+                    self._key_chain.set_key(item.address, key_value)
+                item = BatchResult(item.address, True if error is None else None, error)
+            results.append(item)
+        self._key_chain.save()
+        return results
 
     def import_account_json(self, json_text, password, url=None):
+        from web3 import Web3
         if url:
-            web3 = Web3(HTTPProvider(url))
+            web3 = self.connection_pool.get_web3(url)
             web3.manager.request_blocking('parity_newAccountFromWallet', [json_text, password])
         else:
             data = json.loads(json_text)
@@ -94,25 +386,100 @@ class WalletManager():
             self._key_chain.set_key(address, data)
             self._key_chain.save()
 
+    def import_accounts_json(self, json_text_list, password, url=None):
+        from web3 import Web3
+        passwords = as_password_list(password, len(json_text_list))
+        addresses = [Web3.toChecksumAddress(json.loads(json_text)['address']) for json_text in json_text_list]
+        if url:
+            calls = [
+                ('parity_newAccountFromWallet', [json_text, password])
+                for json_text, password in zip(json_text_list, passwords)
+            ]
+            return self._batch_request(url, addresses, calls)
+        for address, json_text in zip(addresses, json_text_list):
+            self._key_chain.set_key(address, json.loads(json_text))
+        self._key_chain.save()
+        return [BatchResult(address, address, None) for address in addresses]
+
     def import_account_key(self, address, raw_key, password, url=None):
+        from web3 import Web3
+        from eth_account import Account as EthAccount
         if url:
-            web3 = Web3(HTTPProvider(url))
+            web3 = self.connection_pool.get_web3(url)
             address = web3.manager.request_blocking('parity_newAccountFromSecret', [raw_key, password])
         else:
+            address = Web3.toChecksumAddress(address)
             self._key_chain.set_key(address, EthAccount.encrypt(raw_key, password))
             self._key_chain.save()
         return address
 
     def balance_ether(self, address, url):
-        web3 = Web3(HTTPProvider(url))
+        web3 = self.connection_pool.get_web3(url)
         return web3.fromWei(web3.eth.getBalance(address), 'ether')
 
+    def import_accounts_key(self, addresses, raw_keys, password, url=None):
+        from web3 import Web3
+        passwords = as_password_list(password, len(addresses))
+        if url:
+            calls = [
+                ('parity_newAccountFromSecret', [raw_key, password])
+                for raw_key, password in zip(raw_keys, passwords)
+            ]
+            return self._batch_request(url, addresses, calls)
+        addresses = [Web3.toChecksumAddress(address) for address in addresses]
+        results = []
+        for address, (key_value, error) in zip(addresses, self._crypto_pool.encrypt(raw_keys, passwords)):
+            if error is None:
+                self._key_chain.set_key(address, key_value)
+            results.append(BatchResult(address, address if error is None else None, error))
+        self._key_chain.save()
+        return results
+
+    def balances_ether(self, addresses, url):
+        from web3 import Web3
+        results = []
+        calls = [('eth_getBalance', [address, 'latest']) for address in addresses]
+        for item in self._batch_request(url, addresses, calls):
+            if item.error is None:
+                item = item._replace(result=Web3.fromWei(int(item.result, 16), 'ether'))
+            results.append(item)
+        return results
+
+    def scan_balances(self, addresses, urls, token_addresses=None, batch_size=DEFAULT_SCAN_BATCH_SIZE,
+                      workers=DEFAULT_SCAN_WORKERS):
+        """
+        Yield a BalanceResult with the ether and ERC20 token balances of each address on each url,
+        see BalanceScanner.
+        """
+        if isinstance(urls, str):
+            urls = [urls]
+        scanner = BalanceScanner(self.connection_pool, batch_size, workers)
+        return scanner.scan(addresses, urls, token_addresses)
+
     def send_ether(self, from_address, password, to_address, amount, url=None, timeout=120, is_local=False):
-        web3 = Web3(HTTPProvider(url))
+        from web3 import Web3
+        web3 = self.connection_pool.get_web3(url)
+        tx_hash = self.submit_ether(from_address, password, to_address, amount, url, is_local)
+        try:
+            return web3.eth.waitForTransactionReceipt(tx_hash, timeout=timeout)
+        except Exception:
+            if is_local:
+                # the transaction may have been dropped by the node
+                self._nonce_manager.resync(url, Web3.toChecksumAddress(from_address))
+            raise
+
+    def submit_ether(self, from_address, password, to_address, amount, url=None, is_local=False):
+        """
+        Send ether without waiting for the transaction to be mined, returns the transaction hash.
+        Use `track_receipt` to wait for the receipt.
+        """
+        from web3 import Web3
+        web3 = self.connection_pool.get_web3(url)
+        from_address = Web3.toChecksumAddress(from_address)
+        to_address = Web3.toChecksumAddress(to_address)
 
         if is_local:
-            key_json = json.dumps(self._key_chain.get_key(from_address))
-            raw_key = EthAccount.decrypt(key_json, password)
+            raw_key = self._get_local_key(from_address, password)
             gas_price = web3.manager.request_blocking('eth_gasPrice', [])
             transaction = {
                 'from': from_address,
@@ -120,14 +487,17 @@ class WalletManager():
                 'value': Web3.toWei(amount, 'ether'),
                 'gasPrice': gas_price,
                 'gas': 30000,
-                'nonce': 0,
+                'nonce': self._nonce_manager.next_nonce(url, from_address, web3),
             }
             signed = web3.eth.account.signTransaction(transaction, raw_key)
-            tx_hash = web3.eth.sendRawTransaction(signed.rawTransaction)
+            try:
+                tx_hash = web3.eth.sendRawTransaction(signed.rawTransaction)
+            except ValueError:
+                # the node rejected the transaction, so the local nonce may be out of step
+                self._nonce_manager.resync(url, from_address)
+                raise
 
         else:
-            from_address = Web3.toChecksumAddress(from_address)
-            to_address =  Web3.toChecksumAddress(to_address)
             web3.personal.unlockAccount(from_address, password)
             tx_hash = web3.personal.sendTransaction( {
                 'from': from_address,
@@ -135,7 +505,27 @@ class WalletManager():
                 'value': Web3.toWei(amount, 'ether'),
             }, password)
 
-        return web3.eth.waitForTransactionReceipt(tx_hash, timeout=timeout)
+        return tx_hash
+
+    def track_receipt(self, tx_hash, url, callback=None, timeout=None):
+        """
+        Returns a Future that resolves to the receipt of the transaction. All of the tracked
+        transactions on a node are polled together, once per block.
+        """
+        return self.get_receipt_tracker(url).track(tx_hash, callback, timeout)
+
+    def get_receipt_tracker(self, url):
+        with self._lock:
+            if url not in self._receipt_trackers:
+                provider = self.connection_pool.get_provider(url)
+                self._receipt_trackers[url] = ReceiptTracker(provider)
+            return self._receipt_trackers[url]
+
+    def wait_until(self, condition, url, timeout=120):
+        """
+        Wait until `condition()` returns a true value, checking it again only on each new block.
+        """
+        return BlockWaiter(self.connection_pool.get_web3(url)).wait_until(condition, timeout)
 
     def get_ether(self, address, url):
         data  = {
@@ -146,7 +536,104 @@ class WalletManager():
             'Accept': 'application/json',
             'Content-Type': 'application/json'
         }
-        response = requests.post(url, json = data, headers=headers)
+        session = self.connection_pool.get_session(url)
+        response = session.post(url, json = data, headers=headers)
         logger.debug(f'response {response.text} {response.status_code}')
         if response.status_code != 200:
             raise ValueError(f'{response.status_code} {response.text}')
+
+    def close(self):
+        for receipt_tracker in self._receipt_trackers.values():
+            receipt_tracker.close()
+        self._receipt_trackers = {}
+        if self._connection_pool:
+            self._connection_pool.close()
+        self._crypto_pool.close()
+        if self._key_cache:
+            self._key_cache.clear()
+        if self._key_chain:
+            self._key_chain.close()
+
+    def _get_local_key(self, address, password):
+        if self._key_cache:
+            raw_key = self._key_cache.get(address, password)
+            if raw_key:
+                return raw_key
+        raw_key = self._decrypt_local_key(address, password)
+        self._key_chain.mark_used(address)
+        if self._key_cache:
+            self._key_cache.unlock(address, raw_key, password)
+        return raw_key
+
+    def _decrypt_local_key(self, address, password, hd_wallets=None):
+        # `hd_wallets` keeps the HD wallet of each seed name, to derive many keys with one KDF
+        from eth_account import Account as EthAccount
+        key_item = self._key_chain.get_key(address)
+        if key_item is None:
+            raise ValueError(f'Cannot find account {address}')
+        if not is_hd_account(key_item):
+            return EthAccount.decrypt(json.dumps(key_item), password)
+        name = key_item['hd_seed']
+        hd_wallet = hd_wallets.get((name, password)) if hd_wallets is not None else None
+        if hd_wallet is None:
+            seed_item = self._key_chain.get_key(hd_seed_key(name))
+            if seed_item is None:
+                raise ValueError(f'Cannot find the HD seed "{name}" of account {address}')
+            hd_wallet = HDWallet(self._decrypt_hd_seed(name, seed_item, password), seed_item['path'])
+            if hd_wallets is not None:
+                hd_wallets[(name, password)] = hd_wallet
+        return hd_wallet.derive_key(key_item['hd_index'])
+
+    def _decrypt_hd_seed(self, name, seed_item, password):
+        seed_key = hd_seed_key(name)
+        if self._key_cache:
+            seed = self._key_cache.get(seed_key, password)
+            if seed:
+                return seed
+        seed, error = self._crypto_pool.decrypt([json.dumps(seed_item['hd_seed'])], [password])[0]
+        if error:
+            raise ValueError(error)
+        if self._key_cache:
+            self._key_cache.unlock(seed_key, seed, password)
+        return seed
+
+    def _export_hd_account(self, address, password, hd_wallets=None):
+        # an HD account is exported as a keystore of its derived key
+        from eth_account import Account as EthAccount
+        return EthAccount.encrypt(self._decrypt_local_key(address, password, hd_wallets), password)
+
+    def _get_account_index(self, url):
+        if url:
+            # the node can only return all of its accounts, so they are sorted on each call
+            web3 = self.connection_pool.get_web3(url)
+            return AccountIndex(web3.eth.accounts)
+        return self._key_chain.account_index
+
+    def _batch_request(self, url, addresses, calls):
+        provider = self.connection_pool.get_provider(url)
+        results = []
+        for address, response in zip(addresses, provider.make_batch_request(calls)):
+            error = response.get('error')
+            if error is None:
+                results.append(BatchResult(address, response.get('result'), None))
+            else:
+                results.append(BatchResult(address, None, error.get('message', str(error))))
+        return results
+
+    @property
+    def nonce_manager(self):
+        return self._nonce_manager
+
+    @property
+    def key_cache(self):
+        return self._key_cache
+
+    @property
+    def connection_pool(self):
+        with self._lock:
+            if self._connection_pool is None:
+                # web3 is only imported once a node is used
+                with metrics.timer('import', module='web3'):
+                    from wallet_manager.connection_pool import ConnectionPool
+                self._connection_pool = ConnectionPool()
+            return self._connection_pool